@@ -1,14 +1,64 @@
+import time
+_run_start = time.perf_counter()  # Start of this script run, for render timings
+
 import streamlit as st
-import pandas as pd
 import os
-import joblib
-import numpy as np
+import hashlib
+import json
+# App modules import pandas, matplotlib etc. only when first needed, so the
+# page starts rendering before any heavy import or data load
+from src.data.load_save_data import load_data
+from src.data.cache import cached_load, preload, read_bytes, cache_stats
+from src.pipeline.instrumentation import record, summary_table, timed
+from src.visualization.aggregates import (
+    compute_bin_counts,
+    compute_cluster_summary,
+    query_bins,
+)
+from src.models.predict import iter_predictions
+from src.models.profiles import cluster_table, overall_table
+from src.models.registry import (
+    list_models,
+    metadata_path,
+    profile_path,
+    read_model,
+    similarity_path,
+)
+from src.models.similarity import index_customers, load_similarity_index, similar_customers
+from src.pipeline.experiments import summarize_experiments
 
 # --- Configuration ---
 RAW_DATA_PATH = "data/raw/mall_customers.csv"
 PROCESSED_DATA_PATH = "data/processed/clustered_customers.csv"
 FIGURES_DIR = "reports/figures"  # Directory for saved plots
-MODEL_PATH = "models/kmeans_k5_2features.joblib" # Path to the saved model
+K_SELECTION_PATH = "reports/k_selection.json"  # k chosen by main.py
+EXPERIMENTS_PATH = "reports/experiments.csv"  # Written by run_experiments.py
+STABILITY_PATH = "reports/cluster_stability.json"  # Bootstrap stability from main.py
+CONFIDENCE_PATH = "data/processed/cluster_confidence.csv"  # Per-customer confidence
+# Used when main.py has not recorded its k selection
+DEFAULT_K_SELECTION = {
+    "2d": {"k": 5, "criterion": "silhouette", "model": "kmeans_k5_2features",
+           "cluster_col": "Cluster_2D_k5"},
+    "3d": {"k": 6, "criterion": "silhouette", "model": "kmeans_k6_3features"},
+}
+# Input widgets for model features: (label, min, max, default)
+FEATURE_INPUTS = {
+    "Age": ("Age", 18, 100, 35),
+    "Annual_Income": ("Annual Income (k$)", 0, None, 50),
+    "Spending_Score": ("Spending Score (1-100)", 1, 100, 50),
+}
+PRELOAD = True  # Warm every section's data in the background on startup
+FIGURE_FILES = [
+    "pairplot_features.png",
+    "scatter_clusters_2_features.png",
+    "elbow_plot_2_features.png",
+    "silhouette_plot_2_features.png",
+    "silhouette_plot_3_features.png",
+]
+BATCH_CHUNK_SIZE = 100_000  # Rows scored per vectorized predict call
+BATCH_OUTPUT_DIR = "data/interim/batch_predictions"  # Scored uploads, one file per upload and model
+SUMMARY_FEATURES = ["Age", "Annual_Income", "Spending_Score"]
+SIMILAR_CUSTOMERS = 5  # Existing customers shown next to a prediction by default
 
 # --- Helper Function ---
 def check_file(path):
@@ -18,6 +68,133 @@ def check_file(path):
         st.stop()
     return path
 
+def score_upload(model, uploaded_file):
+    """
+    Score an uploaded CSV into a file under BATCH_OUTPUT_DIR and return its path
+    and the number of rows scored (None when an earlier run is reused).
+
+    Outputs are keyed by the upload's contents and the model version, so
+    reruns and repeated uploads of the same file are not scored again.
+    """
+    digest = hashlib.sha256(f"{model.name}/v{model.version}/".encode())
+    for block in iter(lambda: uploaded_file.read(1 << 20), b""):
+        digest.update(block)
+    uploaded_file.seek(0)
+    output_path = os.path.join(BATCH_OUTPUT_DIR, f"{digest.hexdigest()}.csv")
+    if os.path.exists(output_path):
+        return output_path, None
+
+    # Score the file chunk by chunk, streaming results to disk as we go
+    os.makedirs(BATCH_OUTPUT_DIR, exist_ok=True)
+    tmp_path = f"{output_path}.tmp{os.getpid()}"
+    n_rows = 0
+    chunks = iter_predictions(
+        model, uploaded_file, model.features,
+        cluster_names=model.cluster_names or None, chunksize=BATCH_CHUNK_SIZE,
+    )
+    try:
+        with open(tmp_path, "w", newline="") as out, timed("batch_predict"):
+            for chunk in chunks:
+                chunk.to_csv(out, header=n_rows == 0, index=False)
+                n_rows += len(chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output_path, n_rows
+
+# --- Cached Loaders ---
+# Results are shared across reruns and sessions and reloaded only when the
+# underlying file changes (e.g. after main.py rewrites it).
+# Data files are read through load_data's memory-mapped columnar cache.
+def describe_data(path):
+    return load_data(path).describe()
+
+# Cluster profiles are precomputed by main.py and stored next to each model,
+# so summaries are read in O(k) instead of scanning the customer tables
+def load_overall_table(path):
+    return overall_table(read_json(path))
+
+def load_cluster_table(path):
+    return cluster_table(read_json(path))
+
+def model_profile_path(name, version=None):
+    # The model's profile file, or None if it has not been profiled
+    try:
+        path = profile_path(name, version)
+    except FileNotFoundError:
+        return None
+    return path if os.path.exists(path) else None
+
+# Explorer aggregates are computed once per version of the processed file
+def load_bin_counts(path):
+    return compute_bin_counts(path, "Annual_Income", "Spending_Score", CLUSTER_COL)
+
+def load_cluster_summary(path):
+    return compute_cluster_summary(path, CLUSTER_COL, SUMMARY_FEATURES)
+
+# Each model version's similarity index is built by main.py; versions
+# registered elsewhere are indexed from the processed file on first use
+def load_model_similarity_index(model):
+    path = similarity_path(model.name, model.version)
+    if not os.path.exists(path):
+        index_customers(model, check_file(PROCESSED_DATA_PATH), path)
+    return cached_load(path, load_similarity_index)
+
+# Customer attributes by ID, so matches are looked up rather than joined
+def load_customers_by_id(path):
+    customers = load_data(path).set_index("Customer_ID")
+    return customers.drop(columns=CLUSTER_COL, errors="ignore")
+
+def load_experiment_summary(path):
+    return summarize_experiments(load_data(path))
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def load_k_selection():
+    if not os.path.exists(K_SELECTION_PATH):
+        return DEFAULT_K_SELECTION
+    return cached_load(K_SELECTION_PATH, read_json)
+
+def selection_note(selection):
+    # How k was chosen, e.g. "silhouette, 6 of 13 values of k fitted"
+    note = selection["criterion"].replace("_", "-")
+    if "evaluated" in selection:
+        note += f", {len(selection['evaluated'])} values of k fitted"
+        if selection.get("stopped_early"):
+            note += " before the search stopped early"
+    return note
+
+def load_figure(filename):
+    return cached_load(check_file(os.path.join(FIGURES_DIR, filename)), read_bytes)
+
+# Everything the page loads, in page order. The first session of a new server
+# process starts these in a background thread so later sections are ready
+# (or already loading) by the time the script reaches them.
+def warm_up_jobs():
+    return [
+        (RAW_DATA_PATH, load_data),
+        *([(DEFAULT_PROFILE, load_overall_table), (DEFAULT_PROFILE, load_cluster_table)]
+          if DEFAULT_PROFILE else [(RAW_DATA_PATH, describe_data)]),
+        *[(os.path.join(FIGURES_DIR, filename), read_bytes) for filename in FIGURE_FILES],
+        (PROCESSED_DATA_PATH, load_data),
+        (PROCESSED_DATA_PATH, load_bin_counts),
+        (PROCESSED_DATA_PATH, load_customers_by_id),
+        *([] if DEFAULT_PROFILE else [(PROCESSED_DATA_PATH, load_cluster_summary)]),
+        *([(STABILITY_PATH, read_json), (CONFIDENCE_PATH, load_data)]
+          if os.path.exists(STABILITY_PATH) else []),
+        *([(EXPERIMENTS_PATH, load_experiment_summary)] if os.path.exists(EXPERIMENTS_PATH) else []),
+    ]
+
+# The k chosen by main.py decides the labels and default model shown
+k_selection = load_k_selection()
+K_2D, K_3D = k_selection["2d"]["k"], k_selection["3d"]["k"]
+CLUSTER_COL = k_selection["2d"]["cluster_col"]  # Cluster label column in the processed data
+DEFAULT_MODEL = k_selection["2d"]["model"]  # Registered model selected on startup
+DEFAULT_PROFILE = model_profile_path(DEFAULT_MODEL)  # Its cluster profile, if any
+
 # --- Page Setup ---
 st.set_page_config(page_title="Mall Customer Segmentation", layout="wide")
 
@@ -28,15 +205,21 @@ st.write(
     using K-Means clustering on mall customer data.
     """
 )
+record("app_first_render", time.perf_counter() - _run_start)
+if PRELOAD:
+    preload(warm_up_jobs())
 
 # --- Load and Display Raw Data ---
 st.header("1. Data Overview")
 try:
-    df_raw = pd.read_csv(check_file(RAW_DATA_PATH))
+    df_raw = cached_load(check_file(RAW_DATA_PATH), load_data)
     st.write("Sample of raw customer data:")
     st.dataframe(df_raw.head())
     st.write("Basic statistics of numerical features:")
-    st.dataframe(df_raw.describe())
+    if DEFAULT_PROFILE:
+        st.dataframe(cached_load(DEFAULT_PROFILE, load_overall_table))
+    else:
+        st.dataframe(cached_load(RAW_DATA_PATH, describe_data))
 except Exception as e:
     st.error(f"An error occurred while loading the raw data: {e}")
     st.stop()
@@ -44,8 +227,7 @@ except Exception as e:
 # --- Exploratory Visualization ---
 st.header("2. Exploratory Data Analysis")
 st.write("Pairplot showing relationships between key features:")
-pairplot_path = check_file(os.path.join(FIGURES_DIR, "pairplot_features.png"))
-st.image(pairplot_path, caption="Pairplot of Age, Annual Income, and Spending Score")
+st.image(load_figure("pairplot_features.png"), caption="Pairplot of Age, Annual Income, and Spending Score")
 st.write(
     """
     Observations:
@@ -56,10 +238,9 @@ st.write(
 
 # --- Clustering with 2 Features ---
 st.header("3. Clustering with 2 Features (Income & Spending Score)")
-st.write("K-Means clustering applied with 'Annual Income' and 'Spending Score' (k=5).")
-scatter_2d_path = check_file(os.path.join(FIGURES_DIR, "scatter_clusters_2_features.png"))
-st.image(scatter_2d_path, caption="Clusters based on Annual Income and Spending Score (k=5)")
-st.write("The scatter plot confirms 5 distinct customer segments.")
+st.write(f"K-Means clustering applied with 'Annual Income' and 'Spending Score' (k={K_2D}).")
+st.image(load_figure("scatter_clusters_2_features.png"), caption=f"Clusters based on Annual Income and Spending Score (k={K_2D})")
+st.write(f"The scatter plot confirms {K_2D} distinct customer segments.")
 
 # --- Finding Optimal K (2 Features) ---
 st.header("4. Finding the Optimal Number of Clusters (k) - 2 Features")
@@ -69,73 +250,230 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.subheader("Elbow Method")
-    elbow_path = check_file(os.path.join(FIGURES_DIR, "elbow_plot_2_features.png"))
-    st.image(elbow_path, caption="Elbow Plot for 2 Features")
-    st.write("The 'elbow' point suggests k=5.")
+    st.image(load_figure("elbow_plot_2_features.png"), caption="Elbow Plot for 2 Features")
+    st.write("The 'elbow' is where adding clusters stops reducing WCSS sharply.")
 
 with col2:
     st.subheader("Silhouette Method")
-    silhouette_2d_path = check_file(os.path.join(FIGURES_DIR, "silhouette_plot_2_features.png"))
-    st.image(silhouette_2d_path, caption="Silhouette Plot for 2 Features")
-    st.write("The highest Silhouette Score also suggests k=5.")
+    st.image(load_figure("silhouette_plot_2_features.png"), caption="Silhouette Plot for 2 Features")
+    st.write("Higher Silhouette Scores indicate better separated clusters.")
 
-st.write("**Conclusion:** Optimal k for 2 features is **k=5**.")
+st.write(f"**Conclusion:** Optimal k for 2 features is **k={K_2D}**, selected automatically "
+         f"({selection_note(k_selection['2d'])}).")
 
 # --- Finding Optimal K (3 Features) ---
 st.header("5. Finding the Optimal Number of Clusters (k) - 3 Features")
 st.write("Adding 'Age' to the analysis and evaluating clusters using the Silhouette Score.")
-silhouette_3d_path = check_file(os.path.join(FIGURES_DIR, "silhouette_plot_3_features.png"))
-st.image(silhouette_3d_path, caption="Silhouette Plot for 3 Features (Age, Income, Spending Score)")
-st.write("**Conclusion:** Optimal k for 3 features is **k=6**, based on Silhouette analysis.")
+st.image(load_figure("silhouette_plot_3_features.png"), caption="Silhouette Plot for 3 Features (Age, Income, Spending Score)")
+st.write(f"**Conclusion:** Optimal k for 3 features is **k={K_3D}**, selected automatically "
+         f"({selection_note(k_selection['3d'])}).")
 
 # --- Display Processed Data ---
 st.header("6. Final Clustered Data Sample")
-st.write("Processed data includes original information and cluster assignments (k=5, 2 features).")
+st.write(f"Processed data includes original information and cluster assignments (k={K_2D}, 2 features).")
 try:
-    df_processed = pd.read_csv(check_file(PROCESSED_DATA_PATH))
+    df_processed = cached_load(check_file(PROCESSED_DATA_PATH), load_data)
     st.write("Sample of processed data with cluster labels:")
     st.dataframe(df_processed.head())
 except Exception as e:
     st.error(f"An error occurred while loading the processed data: {e}")
     st.stop()
 
+# --- Interactive Cluster Explorer ---
+st.header("7. Interactive Cluster Explorer")
+st.write(
+    "Explore the 2-feature clusters live. The chart is drawn from binned customer "
+    "counts computed once on the server, so filtering and zooming only re-query "
+    "these aggregates."
+)
+try:
+    bin_counts = cached_load(PROCESSED_DATA_PATH, load_bin_counts)
+    if DEFAULT_PROFILE:
+        cluster_summary = cached_load(DEFAULT_PROFILE, load_cluster_table)
+    else:
+        cluster_summary = cached_load(PROCESSED_DATA_PATH, load_cluster_summary)
+except Exception as e:
+    st.error(f"An error occurred while aggregating the processed data: {e}")
+    st.stop()
+
+all_clusters = sorted(bin_counts[CLUSTER_COL].unique().tolist())
+income_min, income_max = int(bin_counts["Annual_Income"].min()), int(bin_counts["Annual_Income"].max())
+score_min, score_max = int(bin_counts["Spending_Score"].min()), int(bin_counts["Spending_Score"].max())
+
+filter_col, zoom_col = st.columns(2)
+with filter_col:
+    selected_clusters = st.multiselect("Clusters", all_clusters, default=all_clusters)
+    bin_size = st.select_slider("Bin size", options=[1, 2, 5, 10, 20], value=5)
+with zoom_col:
+    income_range = st.slider("Annual Income range (k$)", income_min, income_max, (income_min, income_max))
+    score_range = st.slider("Spending Score range", score_min, score_max, (score_min, score_max))
+
+bins = query_bins(
+    bin_counts, "Annual_Income", "Spending_Score", CLUSTER_COL,
+    x_range=income_range, y_range=score_range,
+    clusters=selected_clusters, bin_size=bin_size,
+)
+bins[CLUSTER_COL] = bins[CLUSTER_COL].astype(str)  # Categorical colours
+st.scatter_chart(bins, x="Annual_Income", y="Spending_Score", color=CLUSTER_COL, size="count")
+st.caption(f"{len(bins)} bins covering {int(bins['count'].sum())} customers.")
+
+st.subheader("Per-Cluster Summary")
+st.dataframe(cluster_summary.loc[cluster_summary.index.isin(selected_clusters)].round(2))
+
+# --- Segment Stability ---
+# Optional: only shown once main.py has written the stability analysis
+if os.path.exists(STABILITY_PATH):
+    st.header("8. Segment Stability")
+    try:
+        stability = cached_load(STABILITY_PATH, read_json)
+        confidence = cached_load(check_file(CONFIDENCE_PATH), load_data)["Confidence"]
+        st.write(
+            f"The {K_2D} segments were refitted on {stability['n_runs']} {stability['method']} "
+            "resamples of the customers and matched to the original clusters. A cluster's "
+            "Jaccard score is its average overlap with its match (above 0.75 is stable); a "
+            "customer's confidence is the share of refits that kept them in their cluster."
+        )
+        stab_col, conf_col = st.columns(2)
+        with stab_col:
+            clusters = [
+                {"Cluster": c["cluster"], "Customers": c["size"],
+                 "Jaccard": round(c["jaccard_mean"], 3), "Std": round(c["jaccard_std"], 3),
+                 "Stability": c["stability"]}
+                for c in stability["clusters"]
+            ]
+            st.dataframe(clusters, hide_index=True)
+        with conf_col:
+            st.metric("Mean assignment confidence", f"{stability['mean_confidence']:.1%}")
+            st.metric("Customers below 80% confidence", f"{stability['low_confidence_share']:.1%}")
+            bins = (confidence * 10).clip(upper=9.99).astype(int) / 10
+            st.bar_chart(bins.value_counts().sort_index().rename("customers"))
+            st.caption("Customers by assignment confidence (bins of 10%).")
+    except Exception as e:
+        st.error(f"An error occurred while loading the stability analysis: {e}")
+
+# --- Experiment Results ---
+# Optional: only shown once run_experiments.py has written its results table
+if os.path.exists(EXPERIMENTS_PATH):
+    st.header("9. Feature Set Experiments")
+    try:
+        experiments = cached_load(EXPERIMENTS_PATH, load_experiment_summary)
+        st.write(
+            f"Clustering quality of {experiments['features'].nunique()} feature sets across "
+            f"k and scaling, averaged over random seeds (best silhouette first)."
+        )
+        feature_options = ["All"] + sorted(experiments["features"].unique().tolist())
+        feature_choice = st.selectbox("Feature set", feature_options)
+        if feature_choice != "All":
+            experiments = experiments[experiments["features"] == feature_choice]
+        st.dataframe(experiments.round(3), hide_index=True)
+    except Exception as e:
+        st.error(f"An error occurred while loading the experiment results: {e}")
+
 st.success("Analysis presentation complete!")
 
 # --- Prediction Section ---
-st.header("7. Predict Cluster for a New Customer")
-st.write("Enter the details for a new customer to predict their cluster (based on the k=5, 2-feature model).")
+st.header("10. Predict Cluster for a New Customer")
 
-# Load the trained model
+# Pick a registered model; centroids are memory-mapped and scored with NumPy
+registered = list_models()
+if not registered:
+    st.error("Error: No registered models found. Please ensure the main script has been run.")
+    st.stop()
+names = list(registered)
+model_name = st.sidebar.selectbox(
+    "Model", names, index=names.index(DEFAULT_MODEL) if DEFAULT_MODEL in names else 0
+)
+versions = registered[model_name][::-1]  # Latest first
+model_version = st.sidebar.selectbox("Version", versions)
 try:
-    model = joblib.load(check_file(MODEL_PATH))
+    model = cached_load(metadata_path(model_name, model_version), read_model)
 except Exception as e:
     st.error(f"An error occurred while loading the clustering model: {e}")
     st.stop()
 
-# Input fields for the two features
-income = st.number_input("Annual Income (k$)", min_value=0, value=50, step=1)
-spending_score = st.number_input("Spending Score (1-100)", min_value=1, max_value=100, value=50, step=1)
+st.write(
+    f"Enter the details for a new customer to predict their cluster (based on the "
+    f"k={model.n_clusters} model using {', '.join(model.features)}, version {model.version})."
+)
+
+# Input fields for the model's features (one-hot encoded ones pick a category)
+categories = model.preprocessor["one_hot"] if model.preprocessor else {}
+inputs = {}
+for feature in model.features:
+    if feature in categories:
+        inputs[feature] = st.selectbox(feature, categories[feature])
+        continue
+    label, min_value, max_value, default = FEATURE_INPUTS.get(feature, (feature, None, None, 0))
+    inputs[feature] = st.number_input(label, min_value=min_value, max_value=max_value,
+                                      value=default, step=1)
+
+# How many look-alike customers to list with the prediction
+n_similar = st.number_input("Similar existing customers to show", min_value=0,
+                            max_value=50, value=SIMILAR_CUSTOMERS, step=1)
+same_cluster = st.checkbox("Only from the predicted cluster", value=True)
 
 # Prediction button
 if st.button("Predict Cluster"):
-    if model:
-        try:
-            # Prepare input data in the same format as training data
-            input_data = np.array([[income, spending_score]])
+    try:
+        # Prepare input data in the same format as training data
+        input_data = {feature: [value] for feature, value in inputs.items()}
+        with timed("predict", rows=1):
             prediction = model.predict(input_data)
-            # Map cluster index to a more descriptive name (optional, but good practice)
-            # These names are based on typical interpretations of the 2-feature clusters
-            cluster_names = {
-                0: "Careful Spenders (Low Income, Low Spending)",
-                1: "Standard (Average Income, Average Spending)",
-                2: "Target Group (High Income, High Spending)",
-                3: "Careless (Low Income, High Spending)",
-                4: "Sensible Savers (High Income, Low Spending)"
-            }
-            predicted_cluster_name = cluster_names.get(prediction[0], f"Cluster {prediction[0]}")
-
-            st.success(f"Predicted Cluster: **{predicted_cluster_name}**")
-        except Exception as e:
-            st.error(f"An error occurred during prediction: {e}")
+        st.success(f"Predicted Cluster: **{model.cluster_name(prediction[0])}**")
+        # Who else is in this cluster, from the model's precomputed profile
+        model_profile = model_profile_path(model.name, model.version)
+        if model_profile:
+            profile_row = cached_load(model_profile, load_cluster_table).loc[[int(prediction[0])]]
+            st.dataframe(profile_row.round(2))
+        # The nearest existing customers in the model's feature space
+        if n_similar:
+            index = load_model_similarity_index(model)
+            with timed("similar_customers", rows=1):
+                matches = similar_customers(index, model, input_data, int(n_similar),
+                                            same_cluster)
+            customers = cached_load(check_file(PROCESSED_DATA_PATH), load_customers_by_id)
+            details = customers.reindex(matches["Customer_ID"]).reset_index(drop=True)
+            matches = matches.join(details)
+            matches["Cluster"] = matches["Cluster"].map(model.cluster_name)
+            st.write(f"Most similar existing customers ({index['n_customers']} indexed):")
+            st.dataframe(matches.drop(columns="Query").round(2), hide_index=True)
+    except Exception as e:
+        st.error(f"An error occurred during prediction: {e}")
+
+# --- Batch Prediction ---
+st.subheader("Batch Prediction")
+st.write(
+    f"Upload a CSV file with {', '.join(repr(f) for f in model.features)} columns "
+    "to assign every customer to a cluster."
+)
+uploaded_file = st.file_uploader("Customer CSV file", type="csv")
+if uploaded_file is not None:
+    try:
+        output_path, n_rows = score_upload(model, uploaded_file)
+        if n_rows is None:
+            st.success("Predictions for this file are ready (scored earlier).")
+        else:
+            st.success(f"Scored {n_rows} customers.")
+        with open(output_path, "rb") as output:
+            st.download_button(
+                "Download predictions",
+                data=output,
+                file_name="predicted_clusters.csv",
+                mime="text/csv",
+            )
+    except Exception as e:
+        st.error(f"An error occurred during batch prediction: {e}")
+
+# --- Diagnostics ---
+record("app_full_render", time.perf_counter() - _run_start)
+stats = cache_stats()
+st.sidebar.caption(
+    f"Cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries"
+)
+with st.sidebar.expander("Diagnostics"):
+    # Timings of instrumented loads and predictions in this server process
+    summary = summary_table()
+    if summary.empty:
+        st.write("No stages recorded yet.")
     else:
-        st.warning("Model not loaded. Cannot perform prediction.")
+        st.dataframe(summary)
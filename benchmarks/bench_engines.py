@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import time
+import warnings
+from datetime import datetime
+import pandas as pd
+from benchmarks.synthetic_data import generate_customers
+from src.models.clustering import fit_full_batch, sweep_kmeans
+
+# --- Configuration ---
+RAW_DATA_PATH = "data/raw/mall_customers.csv"
+FEATURES = ["Annual_Income", "Spending_Score"]
+SIZES = [100_000, 1_000_000]  # Synthetic row counts, in addition to the real data
+N_CLUSTERS = 5
+MAX_K = 8
+RANDOM_STATE = 42
+RESULTS_DIR = "benchmarks/results"
+
+# Engine configurations compared against the current default
+ENGINES = {
+    "default (lloyd, k-means++, n_init=10)": {},
+    "elkan": {"engine": "elkan"},
+    "hamerly": {"engine": "hamerly"},
+    "lloyd, k-means||": {"init": "k-means||"},
+    "lloyd, early stop (patience=2)": {"patience": 2},
+    "elkan, k-means||, early stop": {"engine": "elkan", "init": "k-means||", "patience": 2},
+    "hamerly, k-means||, early stop": {"engine": "hamerly", "init": "k-means||", "patience": 2},
+}
+
+
+def bench_engine(data, options):
+    """
+    Time a single k=N_CLUSTERS fit and return (seconds, inertia, restarts run).
+    """
+    start = time.perf_counter()
+    model = fit_full_batch(data, N_CLUSTERS, RANDOM_STATE, options)
+    seconds = time.perf_counter() - start
+    return seconds, model.inertia_, getattr(model, "n_restarts_", options.get("n_init", 10))
+
+
+def bench_sweep(data, warm_start):
+    """
+    Time a k sweep from 3 to MAX_K (inertia only) and return (seconds, total inertia).
+    """
+    start = time.perf_counter()
+    sweep = sweep_kmeans({"data": data}, MAX_K, RANDOM_STATE, n_jobs=1,
+                         silhouette=False, warm_start=warm_start)
+    seconds = time.perf_counter() - start
+    return seconds, sum(result["inertia"] for result in sweep["data"].values())
+
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Compare KMeans engines for speed against inertia quality "
+        "(run from the repository root: python -m benchmarks.bench_engines)."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    args = parser.parse_args()
+
+    datasets = {"mall_customers": pd.read_csv(RAW_DATA_PATH)[FEATURES]}
+    for n_rows in args.sizes:
+        datasets[f"synthetic_{n_rows}"] = generate_customers(n_rows, RANDOM_STATE)[FEATURES]
+
+    rows = []
+    for dataset, data in datasets.items():
+        print(f"\n{dataset} ({len(data)} rows):")
+        results = {name: bench_engine(data, options) for name, options in ENGINES.items()}
+        best_inertia = min(inertia for _, inertia, _ in results.values())
+        baseline_seconds = results["default (lloyd, k-means++, n_init=10)"][0]
+        for name, (seconds, inertia, restarts) in results.items():
+            rows.append({
+                "dataset": dataset, "engine": name, "seconds": seconds,
+                "speedup": baseline_seconds / seconds, "inertia": inertia,
+                "inertia_vs_best": inertia / best_inertia - 1, "restarts": restarts,
+            })
+            print(f"  {name:<40} {seconds:8.3f}s  x{baseline_seconds / seconds:5.2f}  "
+                  f"inertia +{inertia / best_inertia - 1:.4%}  restarts={restarts}")
+        for warm_start in (False, True):
+            seconds, total = bench_sweep(data, warm_start)
+            name = f"sweep 3..{MAX_K}" + (" (warm start)" if warm_start else "")
+            rows.append({"dataset": dataset, "engine": name, "seconds": seconds,
+                         "inertia": total})
+            print(f"  {name:<40} {seconds:8.3f}s  total inertia {total:.1f}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, f"engines_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(results_path, "w") as f:
+        json.dump(rows, f, indent=2)
+    print(f"\nResults saved to: {results_path}")
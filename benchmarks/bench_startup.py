@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+# --- Configuration ---
+APP_PATH = "app_streamlit.py"
+# Entry points and the modules they import at startup
+IMPORT_TARGETS = {
+    "app modules": "import src.data.cache, src.data.load_save_data, src.pipeline.instrumentation, "
+                   "src.visualization.aggregates, src.models.predict, src.models.registry",
+    "main.py": "import main",
+    "serve.py": "import serve",
+    "predict_batch.py": "import predict_batch",
+    "src.visualization.visualize": "import src.visualization.visualize",
+    "src.models.clustering": "import src.models.clustering",
+}
+HEAVY_MODULES = ["pandas", "pyarrow", "sklearn", "matplotlib", "seaborn", "joblib"]
+RESULTS_DIR = "benchmarks/results"
+
+# Each measurement runs in a fresh interpreter so nothing is already imported
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+RENDER_SCRIPT = """
+import json, sys, tempfile, time, warnings
+warnings.filterwarnings("ignore")
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import src.data.load_save_data as load_save_data
+from src.data.load_save_data import csv_to_columnar
+from src.pipeline.instrumentation import get_records, reset_records
+harness_seconds = time.perf_counter() - start
+with tempfile.TemporaryDirectory() as cache_dir:
+    # A fresh replica has no columnar cache; warm_up.py builds it before traffic
+    load_save_data.COLUMNAR_CACHE_DIR = cache_dir
+    if {warm_up!r}:
+        for path in {data_files!r}:
+            csv_to_columnar(path)
+    runs = []
+    for _ in range({runs}):
+        reset_records()
+        at = AppTest.from_file({app!r}, default_timeout=120).run()
+        timings = {{r["stage"]: r["seconds"] for r in get_records()
+                    if r["stage"].startswith("app_")}}
+        runs.append({{"first_render_s": timings.get("app_first_render"),
+                      "full_render_s": timings.get("app_full_render"),
+                      "errors": len(at.exception)}})
+print(json.dumps({{"harness_seconds": harness_seconds, "runs": runs}}))
+"""
+
+
+def run_python(code):
+    # Run code in a new interpreter from the repository root and parse its JSON output
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def bench_imports(repeat):
+    """
+    Return the best-of-repeat cold import time of each entry point.
+    """
+    results = {}
+    for name, statement in IMPORT_TARGETS.items():
+        code = IMPORT_SCRIPT.format(statement=statement, heavy=HEAVY_MODULES)
+        samples = [run_python(code) for _ in range(repeat)]
+        results[name] = {
+            "seconds": min(sample["seconds"] for sample in samples),
+            "loaded": samples[0]["loaded"],
+        }
+    return results
+
+
+def bench_render(warm_up, runs):
+    """
+    Time the app's first and full render in a fresh process: the first script
+    run is a cold start, later runs reuse the process-wide cache.
+    """
+    from warm_up import DATA_FILES
+    code = RENDER_SCRIPT.format(warm_up=warm_up, data_files=DATA_FILES, runs=runs, app=APP_PATH)
+    return run_python(code)
+
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure import times and time-to-first-render of the app "
+        "(run from the repository root: python -m benchmarks.bench_startup)."
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Import samples per entry point")
+    parser.add_argument("--runs", type=int, default=2, help="App script runs per process")
+    args = parser.parse_args()
+
+    print("Cold import times (best of {}):".format(args.repeat))
+    imports = bench_imports(args.repeat)
+    for name, result in imports.items():
+        print(f"  {name:<30} {result['seconds']:7.3f}s  loads: {', '.join(result['loaded']) or '-'}")
+
+    render = {}
+    for label, warm_up in (("fresh replica", False), ("after warm_up.py", True)):
+        render[label] = bench_render(warm_up, args.runs)
+        print(f"\nApp render, {label} (test harness import "
+              f"{render[label]['harness_seconds']:.2f}s):")
+        for i, run in enumerate(render[label]["runs"]):
+            kind = "cold" if i == 0 else "warm"
+            print(f"  run {i + 1} ({kind}): first render {run['first_render_s']:.3f}s, "
+                  f"full render {run['full_render_s']:.3f}s, errors {run['errors']}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, f"startup_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(results_path, "w") as f:
+        json.dump({"imports": imports, "render": render}, f, indent=2)
+    print(f"\nResults saved to: {results_path}")
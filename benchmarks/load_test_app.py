@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import threading
+import time
+import warnings
+from datetime import datetime
+from statistics import quantiles
+
+# --- Configuration ---
+APP_PATH = "app_streamlit.py"
+SESSIONS = 8  # Simultaneous simulated browser sessions
+PREDICTIONS_PER_SESSION = 5  # "Predict Cluster" clicks after each page load
+SCRIPT_TIMEOUT = 300  # Seconds one script run may take before it counts as failed
+RESULTS_DIR = "benchmarks/results"
+BASELINE_PATH = "benchmarks/app_load_baseline.json"
+TOLERANCE = 0.25  # Allowed slowdown vs baseline before flagging a regression
+PERCENTILES = (50, 90, 95, 99)
+
+# Each session is a Streamlit AppTest driven from its own process: AppTest
+# is not thread-safe, so sessions cannot share one process the way a real
+# server's script threads do. Every session process first loads the page
+# once untimed, so its data cache is warm like a running server's, then
+# waits for the others before the timed session starts. Memory per session
+# is what a session adds on top of that warm process.
+
+
+def rss_mb():
+    """
+    Return the process's current resident set size in MB.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:  # Not Linux: fall back to the peak
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cpu_seconds():
+    # User + system CPU time of this process across all threads
+    times = os.times()
+    return times.user + times.system
+
+
+def latency_summary(seconds):
+    """
+    Return count, mean, max and percentiles (ms) of a list of latencies in seconds.
+    """
+    if not seconds:
+        return {"count": 0}
+    ms = sorted(s * 1000 for s in seconds)
+    cuts = quantiles(ms, n=100) if len(ms) > 1 else [ms[0]] * 99
+    summary = {"count": len(ms), "mean_ms": sum(ms) / len(ms), "max_ms": ms[-1]}
+    summary.update({f"p{p}_ms": cuts[p - 1] for p in PERCENTILES})
+    return summary
+
+
+def random_inputs(at, rng):
+    # Fill the customer inputs with random values within their limits
+    for widget in at.number_input:
+        low = widget.min if widget.min is not None else 0
+        high = widget.max if widget.max is not None else 150
+        widget.set_value(rng.randint(int(low), int(high)))
+    for widget in at.selectbox:
+        if widget.label not in ("Model", "Version", "Feature set"):
+            widget.select(rng.choice(widget.options))
+
+
+def run_session(app_path, n_predictions, seed, start_barrier, results):
+    """
+    Simulate one user in this process: warm the app, wait for the other
+    sessions, then load the page and predict n_predictions customers.
+
+    Puts {"seed", "timings", "cpu_s", "memory_mb", "error"} on results.
+    """
+    import warnings
+    from streamlit.testing.v1 import AppTest
+
+    warnings.filterwarnings("ignore")  # Suppress warnings
+    rng = random.Random(seed)
+    timings = {"page_load": [], "predict": []}
+    report = {"seed": seed, "timings": timings, "cpu_s": 0.0, "memory_mb": None, "error": None}
+    try:
+        AppTest.from_file(app_path, default_timeout=SCRIPT_TIMEOUT).run()
+        rss_before = rss_mb()
+        start_barrier.wait(timeout=SCRIPT_TIMEOUT)
+        cpu_before = cpu_seconds()
+        start = time.perf_counter()
+        at = AppTest.from_file(app_path, default_timeout=SCRIPT_TIMEOUT).run()
+        timings["page_load"].append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+        button = next(b for b in at.button if b.label == "Predict Cluster")
+        for _ in range(n_predictions):
+            random_inputs(at, rng)
+            start = time.perf_counter()
+            at = button.click().run()
+            timings["predict"].append(time.perf_counter() - start)
+            if at.exception:
+                raise RuntimeError(at.exception[0].message)
+            if not any("Predicted Cluster" in message.value for message in at.success):
+                raise RuntimeError("no prediction shown")
+            button = next(b for b in at.button if b.label == "Predict Cluster")
+        report["cpu_s"] = cpu_seconds() - cpu_before
+        report["memory_mb"] = rss_mb() - rss_before  # While the session is still alive
+    except Exception as e:
+        report["error"] = f"session {seed}: {type(e).__name__}: {e}"
+        start_barrier.abort()  # Don't leave the other sessions waiting
+    results.put(report)
+
+
+def _cold_start(app_path, results):
+    # Time the first page load of a fresh process
+    import warnings
+    from streamlit.testing.v1 import AppTest
+
+    warnings.filterwarnings("ignore")  # Suppress warnings
+    try:
+        start = time.perf_counter()
+        at = AppTest.from_file(app_path, default_timeout=SCRIPT_TIMEOUT).run()
+        results.put(None if at.exception else time.perf_counter() - start)
+    except Exception:
+        results.put(None)
+
+
+def run_load_test(app_path, n_sessions, n_predictions):
+    """
+    Load the app once in a fresh process (cold start), then drive n_sessions
+    concurrent sessions, one process each.
+
+    Returns latency percentiles per action, throughput, memory per session
+    and the CPU used by the sessions during the concurrent phase.
+    """
+    import multiprocessing
+
+    # AppTest resolves relative paths against the calling file, not the working directory
+    app_path = os.path.abspath(app_path)
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_cold_start, args=(app_path, results))
+    process.start()
+    cold_start = results.get(timeout=SCRIPT_TIMEOUT)
+    process.join()
+
+    start_barrier = context.Barrier(n_sessions + 1)
+    processes = [
+        context.Process(target=run_session,
+                        args=(app_path, n_predictions, seed, start_barrier, results))
+        for seed in range(n_sessions)
+    ]
+    for process in processes:
+        process.start()
+    errors = [] if cold_start is not None else ["cold start: app raised an exception"]
+    try:
+        start_barrier.wait(timeout=SCRIPT_TIMEOUT)
+    except threading.BrokenBarrierError:
+        errors.append("sessions did not all start")
+    start = time.perf_counter()
+    reports = []
+    for _ in processes:
+        try:
+            reports.append(results.get(timeout=SCRIPT_TIMEOUT * (n_predictions + 1)))
+        except Exception:
+            break
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join(timeout=SCRIPT_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+    if len(reports) < len(processes):
+        errors.append(f"{len(processes) - len(reports)} session(s) never reported")
+
+    timings = {"page_load": [], "predict": []}
+    for report in reports:
+        for action, values in report["timings"].items():
+            timings[action].extend(values)
+    errors += [report["error"] for report in reports if report["error"]]
+    completed = [report for report in reports if not report["error"]]
+    cpu_used = sum(report["cpu_s"] for report in reports)
+    n_actions = len(timings["page_load"]) + len(timings["predict"])
+    return {
+        "sessions": n_sessions,
+        "predictions_per_session": n_predictions,
+        "cold_start_s": cold_start,
+        "elapsed_s": elapsed,
+        "throughput_actions_per_s": n_actions / elapsed,
+        "throughput_sessions_per_s": len(completed) / elapsed,
+        "latency": {action: latency_summary(values) for action, values in timings.items()},
+        "errors": errors,
+        "session_cpu_s": cpu_used,
+        "session_cpu_cores": cpu_used / elapsed,
+        "memory_per_session_mb": (sum(report["memory_mb"] for report in completed)
+                                  / max(len(completed), 1)),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance=TOLERANCE):
+    """
+    Return the metrics that are worse than baseline by more than tolerance:
+    p95 latency of each action, memory per session and throughput.
+    """
+    checks = [
+        (f"{action} p95", results["latency"][action].get("p95_ms"),
+         baseline["latency"].get(action, {}).get("p95_ms"), True)
+        for action in results["latency"]
+    ] + [
+        ("memory per session", results["memory_per_session_mb"],
+         baseline.get("memory_per_session_mb"), True),
+        ("throughput", results["throughput_actions_per_s"],
+         baseline.get("throughput_actions_per_s"), False),
+    ]
+    regressions = []
+    for metric, value, base, lower_is_better in checks:
+        if not value or not base:
+            continue
+        ratio = value / base
+        if (ratio > 1 + tolerance) if lower_is_better else (ratio < 1 / (1 + tolerance)):
+            regressions.append({"metric": metric, "value": value, "baseline": base, "ratio": ratio})
+    return regressions
+
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Load test the Streamlit app with concurrent simulated sessions "
+        "(run from the repository root after main.py: python -m benchmarks.load_test_app)."
+    )
+    parser.add_argument("--sessions", type=int, default=SESSIONS)
+    parser.add_argument("--predictions", type=int, default=PREDICTIONS_PER_SESSION,
+                        help="Predict Cluster clicks per session")
+    parser.add_argument("--app", default=APP_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    print(f"Driving {args.sessions} concurrent sessions of {args.app} "
+          f"({args.predictions} predictions each)...")
+    results = run_load_test(args.app, args.sessions, args.predictions)
+    results.update({
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    })
+
+    if results["cold_start_s"] is not None:
+        print(f"Cold start: {results['cold_start_s']:.2f}s")
+    for action, summary in results["latency"].items():
+        if summary["count"]:
+            print(f"{action:<10} n={summary['count']:<5} mean={summary['mean_ms']:.0f} ms  "
+                  + "  ".join(f"p{p}={summary[f'p{p}_ms']:.0f} ms" for p in PERCENTILES))
+    print(f"Throughput: {results['throughput_actions_per_s']:.2f} script runs/s, "
+          f"{results['throughput_sessions_per_s']:.2f} sessions/s "
+          f"({results['elapsed_s']:.2f}s total)")
+    print(f"Session CPU: {results['session_cpu_s']:.1f}s "
+          f"({results['session_cpu_cores']:.2f} of {os.cpu_count()} cores)")
+    print(f"Memory: {results['memory_per_session_mb']:.1f} MB per session")
+    for error in results["errors"]:
+        print(f"ERROR: {error}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(RESULTS_DIR, f"app_load_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {results_path}")
+
+    if args.save_baseline and results["errors"]:
+        print(f"Not saving a baseline: the run had {len(results['errors'])} error(s).")
+    elif args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION: {r['metric']} is {r['value']:.2f} vs baseline "
+                  f"{r['baseline']:.2f} ({r['ratio']:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline.")
+    if results["errors"]:
+        raise SystemExit(1)
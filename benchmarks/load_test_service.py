@@ -0,0 +1,75 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+from statistics import quantiles
+
+# --- Configuration ---
+URL = "http://127.0.0.1:8000"
+CONCURRENCY = 8  # Simultaneous client threads
+REQUESTS_PER_CLIENT = 500
+BATCH_SIZE = 1  # Customers per request (1 = single-customer requests)
+
+
+def make_payload(batch_size):
+    customers = [
+        {"Annual_Income": random.randint(15, 140), "Spending_Score": random.randint(1, 100)}
+        for _ in range(batch_size)
+    ]
+    return customers[0] if batch_size == 1 else {"customers": customers}
+
+
+def post(url, payload):
+    request = urllib.request.Request(
+        url, data=json.dumps(payload).encode(),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_client(url, n_requests, batch_size, latencies, errors):
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        try:
+            post(f"{url}/predict", make_payload(batch_size))
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors.append(1)
+
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the scoring service.")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--requests", type=int, default=REQUESTS_PER_CLIENT,
+                        help="Requests sent by each client")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    latencies, errors = [], []
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(args.url, args.requests, args.batch_size, latencies, errors),
+        )
+        for _ in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"Requests: {len(latencies)} ok, {len(errors)} failed in {elapsed:.2f}s")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} requests/s "
+          f"({len(latencies) * args.batch_size / elapsed:.1f} customers/s)")
+    if len(latencies) > 1:
+        cuts = quantiles([latency * 1000 for latency in latencies], n=100)
+        print(f"Client latency: p50={cuts[49]:.2f} ms, p99={cuts[98]:.2f} ms")
+    with urllib.request.urlopen(f"{args.url}/metrics") as response:
+        print(f"Server metrics: {json.loads(response.read())}")
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+from benchmarks.synthetic_data import write_customers_csv
+import main as pipeline  # Stage settings are taken from the pipeline itself
+import src.data.load_save_data as load_save_data
+from src.data.load_save_data import load_data
+from src.features.preprocessing import preprocess
+from src.models.clustering import sweep_kmeans, sweep_scores, train_kmeans
+from src.models.k_selection import select_k
+from src.models.predict import predict_file
+from src.models.profiles import build_profile
+from src.models.registry import load_registered_model, register_model
+from src.models.similarity import index_customers
+from src.models.stability import cluster_stability
+import src.visualization.visualize as visualize
+
+# --- Configuration ---
+SIZES = [1_000, 10_000, 100_000]  # Row counts to benchmark (up to 10_000_000)
+# The stages main.py runs, in order. load_data is timed twice: "cold" converts
+# the CSV to the columnar cache, "warm" reads that cache.
+STAGES = [
+    "load_data_cold",
+    "load_data_warm",
+    "preprocess_2d",
+    "preprocess_3d",
+    "select_k_2d",
+    "select_k_3d",
+    "train_kmeans",
+    "profile_2d",
+    "cluster_stability",
+    "sweep_kmeans",
+    "save_pairplot",
+    "save_cluster_scatterplot",
+    "save_elbow_plot",
+    "save_silhouette_plot",
+    "assign_clusters",
+    "similarity_index",
+]
+RANDOM_STATE = pipeline.RANDOM_STATE
+RESULTS_DIR = "benchmarks/results"
+BASELINE_PATH = "benchmarks/baseline.json"
+TOLERANCE = 0.25  # Allowed slowdown vs baseline before flagging a regression
+WARM_UP_ROWS = 1_000  # Untimed first pass, so lazy imports are not timed as work
+
+
+
+def measure(func, *args, setup=None, **kwargs):
+    """
+    Run func twice and return (result, wall seconds, peak traced memory in MB).
+
+    Tracing allocations slows Python code down several times, so the time
+    comes from an untraced run and the memory peak from a separate traced one.
+    setup, if given, is called (untimed) before each run so both runs start
+    from the same state.
+    """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 1024 ** 2
+
+
+def benchmark_pipeline(n_rows, stages, work_dir, n_jobs=1, verbose=True):
+    """
+    Run the main.py pipeline stages on n_rows synthetic customers.
+    Returns one record per stage with wall time and peak memory.
+    """
+    csv_path = os.path.join(work_dir, f"customers_{n_rows}.csv")
+    write_customers_csv(csv_path, n_rows, random_state=RANDOM_STATE)
+    records = []
+
+    def run(stage, func, *args, needed=False, setup=None, **kwargs):
+        # Stages that are not benchmarked still run (untimed) when later
+        # ones need their result
+        if stage not in stages:
+            return func(*args, **kwargs) if needed else None
+        result, seconds, peak_mb = measure(func, *args, setup=setup, **kwargs)
+        records.append({"stage": stage, "seconds": seconds, "peak_mb": peak_mb})
+        if verbose:
+            print(f"  {stage:<30} {seconds:9.3f}s {peak_mb:10.1f} MB")
+        return result
+
+    def selected_from(stage):
+        # Whether this stage or any later one is benchmarked
+        return any(later in stages for later in STAGES[STAGES.index(stage):])
+
+    def drop_columnar_cache():
+        cache_path = load_save_data._columnar_cache_path(csv_path)
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+
+    run("load_data_cold", load_data, csv_path, setup=drop_columnar_cache)
+    df = run("load_data_warm", load_data, csv_path, needed=True)
+    if not selected_from("preprocess_2d"):
+        return records
+    X_2d, preprocessor_2d = run(
+        "preprocess_2d", preprocess, csv_path, pipeline.FEATURES_2D_CLUSTERING,
+        **pipeline.PREPROCESSING_2D, needed=True,
+    )
+    X_3d, preprocessor_3d = run(
+        "preprocess_3d", preprocess, csv_path, pipeline.FEATURES_3D_CLUSTERING,
+        **pipeline.PREPROCESSING_3D, needed=True,
+    )
+    if not selected_from("select_k_2d"):
+        return records
+    selection_options = dict(
+        random_state=RANDOM_STATE, engine_options=pipeline.KMEANS_ENGINE_OPTIONS,
+        n_jobs=n_jobs, silhouette_sample_size=pipeline.SILHOUETTE_SAMPLE_SIZE,
+        **pipeline.K_SELECTION,
+    )
+    selection_2d = run("select_k_2d", select_k, X_2d, needed=True, **selection_options)
+    run("select_k_3d", select_k, X_3d, **selection_options)
+    k = selection_2d["k"]
+    model, labels = run(
+        "train_kmeans", train_kmeans, X_2d, k, random_state=RANDOM_STATE,
+        backend=pipeline.TRAINING_BACKEND, engine_options=pipeline.KMEANS_ENGINE_OPTIONS,
+        needed=True,
+    )
+    profile = run(
+        "profile_2d", build_profile, df, X_2d, labels, model.cluster_centers_,
+        preprocessor_2d["numeric_features"], pipeline.PROFILE_FEATURES,
+        pipeline.PROFILE_CATEGORIES, needed=True,
+    )
+    run("cluster_stability", cluster_stability, X_2d, labels, k,
+        n_runs=pipeline.STABILITY_RUNS, method=pipeline.STABILITY_METHOD,
+        random_state=RANDOM_STATE, engine_options=pipeline.KMEANS_ENGINE_OPTIONS,
+        n_jobs=n_jobs, mmap_dir=work_dir)
+    sweep = run(
+        "sweep_kmeans", sweep_kmeans, {"2d": X_2d, "3d": X_3d},
+        pipeline.MAX_K_TO_EVALUATE, random_state=RANDOM_STATE, n_jobs=n_jobs,
+        silhouette=pipeline.SILHOUETTE_METHOD,
+        silhouette_sample_size=pipeline.SILHOUETTE_SAMPLE_SIZE,
+        engine_options=pipeline.KMEANS_ENGINE_OPTIONS,
+        warm_start=pipeline.WARM_START_SWEEP,
+        needed="save_elbow_plot" in stages or "save_silhouette_plot" in stages,
+    )
+
+    run("save_pairplot", visualize.save_pairplot, df, pipeline.FEATURES_PAIRPLOT,
+        "pairplot.png")
+    run("save_cluster_scatterplot", visualize.save_cluster_scatterplot,
+        df.assign(Cluster=labels), "Annual_Income", "Spending_Score", "Cluster",
+        "scatter.png")
+    if sweep:
+        run("save_elbow_plot", visualize.save_elbow_plot,
+            sweep_scores(sweep["2d"], "inertia"), "elbow.png")
+        run("save_silhouette_plot", visualize.save_silhouette_plot,
+            sweep_scores(sweep["2d"], "silhouette"), "silhouette.png",
+            confidence_intervals=sweep_scores(sweep["2d"], "silhouette_ci"))
+
+    # Scoring and indexing use the registered model, as in main.py
+    if not selected_from("assign_clusters"):
+        return records
+    registry_dir = os.path.join(work_dir, "registry")
+    name = f"benchmark_{n_rows}"
+    metadata = register_model(
+        name, model.cluster_centers_, preprocessor_2d["input_features"], RANDOM_STATE,
+        None, cluster_names=profile["cluster_names"], preprocessor=preprocessor_2d,
+        registry_dir=registry_dir,
+    )
+    scoring_model = load_registered_model(name, metadata["version"], registry_dir)
+    processed_path = os.path.join(work_dir, f"clustered_{n_rows}.csv")
+    run("assign_clusters", predict_file, scoring_model, csv_path, processed_path,
+        scoring_model.features, chunksize=pipeline.ASSIGN_CHUNK_SIZE,
+        label_col="Cluster",
+        needed="similarity_index" in stages)
+    run("similarity_index", index_customers, scoring_model, processed_path,
+        os.path.join(work_dir, f"similarity_{n_rows}.joblib"))
+    return records
+
+
+def compare_to_baseline(results, baseline, tolerance=TOLERANCE):
+    """
+    Return the (size, stage) entries that are slower than baseline by more than tolerance.
+    """
+    reference = {
+        (run["n_rows"], stage["stage"]): stage["seconds"]
+        for run in baseline["runs"] for stage in run["stages"]
+    }
+    regressions = []
+    for run in results["runs"]:
+        for stage in run["stages"]:
+            base = reference.get((run["n_rows"], stage["stage"]))
+            if base and stage["seconds"] > base * (1 + tolerance):
+                regressions.append({
+                    "n_rows": run["n_rows"],
+                    "stage": stage["stage"],
+                    "seconds": stage["seconds"],
+                    "baseline_seconds": base,
+                    "ratio": stage["seconds"] / base,
+                })
+    return regressions
+
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark the clustering pipeline on synthetic data "
+        "(run from the repository root: python -m benchmarks.run_benchmarks)."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--stages", nargs="+", default=STAGES, choices=STAGES)
+    parser.add_argument("--n-jobs", type=int, default=1, help="Workers for k sweeps")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store these results as the new baseline")
+    args = parser.parse_args()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "runs": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Keep benchmark figures and columnar caches out of the project tree
+        visualize.FIGURES_DIR = work_dir
+        load_save_data.COLUMNAR_CACHE_DIR = work_dir
+        # Import scikit-learn, matplotlib etc. and warm the worker pool first
+        print(f"Warming up on {WARM_UP_ROWS} rows (untimed)...")
+        benchmark_pipeline(WARM_UP_ROWS, args.stages, work_dir, args.n_jobs, verbose=False)
+        for n_rows in args.sizes:
+            print(f"\nBenchmarking {n_rows} rows:")
+            stages = benchmark_pipeline(n_rows, args.stages, work_dir, args.n_jobs)
+            results["runs"].append({
+                "n_rows": n_rows,
+                "total_seconds": sum(stage["seconds"] for stage in stages),
+                "stages": stages,
+            })
+    # ru_maxrss is in KB on Linux
+    results["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    results_path = os.path.join(
+        RESULTS_DIR, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to: {results_path}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(results, json.load(f), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION: {r['stage']} at {r['n_rows']} rows took "
+                  f"{r['seconds']:.3f}s vs {r['baseline_seconds']:.3f}s ({r['ratio']:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
+        print("No regressions against baseline.")
@@ -0,0 +1,48 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Segments modelled on the k=5 clusters of data/raw/mall_customers.csv:
+# (income mean, spending mean, income std, spending std, share of customers)
+SEGMENTS = [
+    (55, 50, 9, 6, 0.40),
+    (87, 82, 15, 9, 0.20),
+    (26, 79, 8, 10, 0.11),
+    (88, 17, 15, 10, 0.18),
+    (26, 21, 8, 11, 0.11),
+]
+
+
+def generate_customers(n_rows, random_state=42, start_id=1):
+    """
+    Generate synthetic customers with the mall_customers.csv schema.
+    """
+    rng = np.random.default_rng(random_state)
+    shares = np.array([segment[4] for segment in SEGMENTS])
+    segment = rng.choice(len(SEGMENTS), size=n_rows, p=shares / shares.sum())
+    params = np.array([segment_params[:4] for segment_params in SEGMENTS])[segment]
+    income = rng.normal(params[:, 0], params[:, 2])
+    spending = rng.normal(params[:, 1], params[:, 3])
+    # High spenders skew younger, as in the real data
+    age = rng.normal(50 - 0.25 * spending, 10)
+    return pd.DataFrame({
+        "Customer_ID": np.arange(start_id, start_id + n_rows),
+        "Gender": np.where(rng.random(n_rows) < 0.56, "Female", "Male"),
+        "Age": np.clip(np.rint(age), 18, 70).astype(np.int64),
+        "Annual_Income": np.clip(np.rint(income), 15, 140).astype(np.int64),
+        "Spending_Score": np.clip(np.rint(spending), 1, 100).astype(np.int64),
+    })
+
+
+def write_customers_csv(file_path, n_rows, chunksize=1_000_000, random_state=42):
+    """
+    Write n_rows synthetic customers to a CSV file in chunks of bounded size.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w", newline="") as f:
+        for start in range(0, n_rows, chunksize):
+            chunk = generate_customers(
+                min(chunksize, n_rows - start), random_state + start, start_id=start + 1
+            )
+            chunk.to_csv(f, header=start == 0, index=False)
+    return file_path
@@ -0,0 +1,54 @@
+import argparse
+import os
+import warnings
+from src.data.load_save_data import load_data
+from src.models.registry import load_registered_model, selected_model_name, similarity_path
+from src.models.similarity import index_customers, load_similarity_index, similar_customers
+
+# --- Configuration ---
+MODEL_NAME = None  # Registered model; None uses the 2-feature model chosen by main.py
+PROCESSED_DATA_PATH = "data/processed/clustered_customers.csv"  # Customers indexed if needed
+N_NEIGHBORS = 5  # Similar customers returned per input row
+CHUNK_SIZE = 100_000  # Rows looked up per vectorized query
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Find the most similar existing customers for every customer in a CSV file."
+    )
+    parser.add_argument("input_path", help="CSV file with customers to look up")
+    parser.add_argument("output_path", help="CSV file to write the matches to")
+    parser.add_argument("--model", default=MODEL_NAME,
+                        help="Registered model name (default: chosen by main.py)")
+    parser.add_argument("--version", type=int, help="Model version (default: latest)")
+    parser.add_argument("-n", "--neighbors", type=int, default=N_NEIGHBORS,
+                        help="Similar customers per row")
+    parser.add_argument("--same-cluster", action="store_true",
+                        help="Only match customers in the row's predicted cluster")
+    parser.add_argument(
+        "--chunksize", type=int, default=CHUNK_SIZE, help="Rows per chunk"
+    )
+    args = parser.parse_args()
+
+    model = load_registered_model(args.model or selected_model_name(), args.version)
+    index_path = similarity_path(model.name, model.version)
+    if not os.path.exists(index_path):
+        index_customers(model, PROCESSED_DATA_PATH, index_path)
+    index = load_similarity_index(index_path)
+    print(f"Searching {index['n_customers']} customers with {model}")
+
+    # Query rows are numbered across chunks by their position in the input file
+    os.makedirs(os.path.dirname(args.output_path) or ".", exist_ok=True)
+    n_rows = 0
+    with open(args.output_path, "w", newline="") as out:
+        chunks = load_data(args.input_path, chunksize=args.chunksize, usecols=model.features)
+        for chunk in chunks:
+            matches = similar_customers(index, model, chunk, args.neighbors, args.same_cluster)
+            matches["Query"] += n_rows
+            matches.to_csv(out, header=n_rows == 0, index=False)
+            n_rows += len(chunk)
+    print(f"Matched {n_rows} rows, similar customers saved to: {args.output_path}")
+
+    print("\nSimilar customer lookup finished successfully.")
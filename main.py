@@ -1,87 +1,414 @@
+import argparse
 import os
 import warnings
-from src.data.load_save_data import load_data, save_data
+import pandas as pd
+from src.data.load_save_data import load_data
 from src.features.feature_selection import select_features
+from src.features.preprocessing import preprocess
 from src.models.clustering import (
     train_kmeans,
-    calculate_wcss,
-    calculate_silhouette_scores,
+    save_model,
+    sweep_kmeans,
+    sweep_scores,
 )
+from src.models.k_selection import save_k_selection, select_k
+from src.models.predict import predict_file
+from src.models.profiles import build_profile, save_profile
+from src.models.registry import (
+    load_registered_model,
+    profile_path,
+    register_model,
+    similarity_path,
+)
+from src.models.similarity import index_customers
+from src.models.stability import cluster_stability, save_stability
+from src.pipeline.instrumentation import dump_profile, start_profiler, summary_table
+from src.pipeline.resources import (
+    apply_thread_budget,
+    budget_report,
+    estimate_shape,
+    plan_resources,
+    start_monitor,
+    stop_monitor,
+)
+from src.pipeline.stage_cache import hash_file, run_stage
 from src.visualization.visualize import (
+    FIGURES_DIR,
     save_pairplot,
     save_cluster_scatterplot,
     save_elbow_plot,
     save_silhouette_plot,
+    render_figures,
 )
 
 # --- Configuration ---
 RAW_DATA_PATH = "data/raw/mall_customers.csv"
 PROCESSED_DATA_PATH = "data/processed/clustered_customers.csv"
-INITIAL_K = 5  # Initial number of clusters for 2-feature model
+K_SELECTION_PATH = "reports/k_selection.json"  # Chosen k, read by the app
+STABILITY_PATH = "reports/cluster_stability.json"  # Per-cluster stability, read by the app
+CONFIDENCE_PATH = "data/processed/cluster_confidence.csv"  # Per-customer assignment confidence
+# Paths and names are filled in with the chosen k
+MODEL_PATH = "models/kmeans_k{k}_2features.joblib"
+MODEL_NAME_2D = "kmeans_k{k}_2features"  # Registry names (see src/models/registry.py)
+MODEL_NAME_3D = "kmeans_k{k}_3features"
+CLUSTER_COL = "Cluster_2D_k{k}"  # Label column of the processed data
+INITIAL_K = None  # Clusters for the 2-feature model; None selects k automatically
+K_3D = None  # Clusters for the 3-feature model; None selects k automatically
+# Automatic k selection (see src/models/k_selection.py): criterion is "elbow",
+# "silhouette", "calinski_harabasz", "davies_bouldin" or "gap"; search is
+# "adaptive" (stops once the criterion has peaked), "bisection" or "exhaustive"
+K_SELECTION = {"criterion": "silhouette", "search": "adaptive", "k_min": 3, "k_max": 15}
 MAX_K_TO_EVALUATE = 8  # Maximum K for Elbow/Silhouette analysis
 RANDOM_STATE = 42  # Random seed for reproducibility
+TRAINING_BACKEND = "kmeans"  # "kmeans" (full batch) or "minibatch"
+# Full-batch engine, e.g. {"engine": "hamerly", "init": "k-means||", "patience": 2}
+# (see benchmarks/bench_engines.py); empty uses KMeans(k-means++, n_init=10)
+KMEANS_ENGINE_OPTIONS = {}
+WARM_START_SWEEP = False  # Seed each k in the sweep from the k-1 solution
+N_JOBS = -1  # Worker processes for the K sweep (-1 uses all cores)
+SILHOUETTE_METHOD = "auto"  # "auto", "exact", "sampled" or "simplified"
+SILHOUETTE_SAMPLE_SIZE = 10_000  # Rows above which silhouette is sampled
+# Cluster stability (see src/models/stability.py): refits on "bootstrap"
+# samples or "subsample"s, aligned to the 2-feature model's clusters
+STABILITY_METHOD = "bootstrap"
+STABILITY_RUNS = 50
+USE_STAGE_CACHE = True  # Skip stages whose inputs and parameters are unchanged
+ASSIGN_CHUNK_SIZE = 100_000  # Rows per chunk when writing the clustered customer file
+PROFILE_OUTPUT = None  # e.g. "reports/pipeline.prof" to dump a cProfile of the run
+# Resource budget for the whole run (overridable with --threads/--memory-mb).
+# With a budget, worker counts, threads per worker, chunk and silhouette
+# sample sizes are derived from it (see src/pipeline/resources.py) and
+# N_JOBS, ASSIGN_CHUNK_SIZE and SILHOUETTE_SAMPLE_SIZE become upper limits.
+THREAD_BUDGET = None  # Threads across all processes; None is unlimited
+MEMORY_BUDGET_MB = None  # Peak memory of the run in MB; None is unlimited
 
 # Features for analysis
 FEATURES_PAIRPLOT = ["Age", "Annual_Income", "Spending_Score"]
 FEATURES_2D_CLUSTERING = ["Annual_Income", "Spending_Score"]
 FEATURES_3D_CLUSTERING = ["Age", "Annual_Income", "Spending_Score"]
+# Summarised per cluster in each model's profile (stored next to the model)
+PROFILE_FEATURES = ["Age", "Annual_Income", "Spending_Score"]
+PROFILE_CATEGORIES = ["Gender"]
+# Preprocessing before clustering (see src/features/preprocessing.py):
+# scaling is "none", "standard" or "robust"; one_hot lists categorical
+# columns to encode, e.g. ["Gender"]
+PREPROCESSING_2D = {"scaling": "none", "one_hot": []}
+PREPROCESSING_3D = {"scaling": "none", "one_hot": []}
+
+
+def stage(name, func, *args, **kwargs):
+    # Run a pipeline stage through the on-disk stage cache
+    return run_stage(name, func, *args, force=not USE_STAGE_CACHE, **kwargs)
+
+
+def select_k_stage(name, data, plan, fixed_k=None):
+    # Select k automatically, or evaluate only fixed_k when one is configured
+    options = dict(K_SELECTION)
+    if fixed_k is not None:
+        options.update(k_min=fixed_k, k_max=fixed_k)
+    return stage(f"select_k_{name}", select_k, data, random_state=RANDOM_STATE,
+                 engine_options=KMEANS_ENGINE_OPTIONS, n_jobs=plan["n_jobs"],
+                 silhouette_sample_size=plan["silhouette_sample_size"],
+                 silhouette_max_memory_mb=plan["silhouette_max_memory_mb"], **options)
+
+
+def figure_job(name, func, *args, **kwargs):
+    # A figure stage to be run later by render_figures
+    return (stage, (name, func) + args, kwargs)
+
+
+def figure_path(filename):
+    return os.path.join(FIGURES_DIR, filename)
+
 
 # --- Main Execution Block ---
 if __name__ == "__main__":
     warnings.filterwarnings("ignore")  # Suppress warnings
 
+    parser = argparse.ArgumentParser(description="Run the customer segmentation pipeline.")
+    parser.add_argument("--threads", type=int, default=THREAD_BUDGET,
+                        help="Thread budget across all worker processes")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_BUDGET_MB,
+                        help="Memory ceiling for the run in MB")
+    args = parser.parse_args()
+
+    # Size workers, chunks and samples to the budget before any data is loaded
+    n_rows, n_columns = estimate_shape(RAW_DATA_PATH)
+    plan = plan_resources(
+        n_rows,
+        n_columns,
+        max(len(FEATURES_2D_CLUSTERING), len(FEATURES_3D_CLUSTERING)),
+        threads=args.threads,
+        memory_mb=args.memory_mb,
+        n_jobs=N_JOBS,
+        chunk_size=ASSIGN_CHUNK_SIZE,
+        silhouette_sample_size=SILHOUETTE_SAMPLE_SIZE,
+    )
+    if plan["threads"]:
+        apply_thread_budget(plan["threads"], plan["threads_per_worker"])
+    if plan["threads"] or plan["memory_mb"]:
+        print(f"Resource plan for ~{n_rows} rows: {plan['n_jobs']} worker(s) x "
+              f"{plan['threads_per_worker']} thread(s), chunks of {plan['chunk_size']} rows, "
+              f"silhouette sample of {plan['silhouette_sample_size']}"
+              + (f" in distance blocks of {plan['silhouette_max_memory_mb']:.0f} MB"
+                 if plan["silhouette_max_memory_mb"] else ""))
+    monitor = start_monitor()
+    profiler = start_profiler() if PROFILE_OUTPUT else None
+
     # Load raw data
-    df_raw = load_data(RAW_DATA_PATH)
+    df_raw = stage("load_data", load_data, RAW_DATA_PATH, input_files=[RAW_DATA_PATH])
     print("\nRaw Data Info:")
     print(df_raw.head())
     print(df_raw.shape)
     print(df_raw.describe())
 
+    # Figures are collected here and rendered concurrently further down
+    figure_jobs = []
+
     # Generate pairplot for initial visualization
-    save_pairplot(df_raw, FEATURES_PAIRPLOT, "pairplot_features.png")
+    figure_jobs.append(figure_job(
+        "save_pairplot",
+        save_pairplot,
+        df_raw,
+        FEATURES_PAIRPLOT,
+        "pairplot_features.png",
+        outputs=[figure_path("pairplot_features.png")],
+    ))
+
+    # Perform clustering with 2 features (reads only those columns from disk)
+    df_features_2d = stage(
+        "select_features_2d",
+        select_features,
+        RAW_DATA_PATH,
+        FEATURES_2D_CLUSTERING,
+        input_files=[RAW_DATA_PATH],
+    )
+    # Fit the preprocessing once; the model is trained on its float32 output
+    X_2d, preprocessor_2d = stage(
+        "preprocess_2d",
+        preprocess,
+        RAW_DATA_PATH,
+        FEATURES_2D_CLUSTERING,
+        **PREPROCESSING_2D,
+        input_files=[RAW_DATA_PATH],
+    )
+    X_3d, preprocessor_3d = stage(
+        "preprocess_3d",
+        preprocess,
+        RAW_DATA_PATH,
+        FEATURES_3D_CLUSTERING,
+        **PREPROCESSING_3D,
+        input_files=[RAW_DATA_PATH],
+    )
 
-    # Perform clustering with 2 features
-    df_features_2d = select_features(df_raw, FEATURES_2D_CLUSTERING)
+    # Choose the number of clusters for each feature set
+    selection_2d = select_k_stage("2d", X_2d, plan, INITIAL_K)
+    selection_3d = select_k_stage("3d", X_3d, plan, K_3D)
+    k_2d, k_3d = selection_2d["k"], selection_3d["k"]
+    model_path = MODEL_PATH.format(k=k_2d)
+    model_name_2d, model_name_3d = MODEL_NAME_2D.format(k=k_2d), MODEL_NAME_3D.format(k=k_3d)
+    cluster_col = CLUSTER_COL.format(k=k_2d)
+    print(f"\nChosen k: {k_2d} (2 features), {k_3d} (3 features) by {K_SELECTION['criterion']}")
 
-    # Train KMeans model with initial K
-    model_2d, labels_2d = train_kmeans(
-        df_features_2d, n_clusters=INITIAL_K, random_state=RANDOM_STATE
+    # Train KMeans model with the chosen K
+    model_2d, labels_2d = stage(
+        "train_kmeans",
+        train_kmeans,
+        X_2d,
+        n_clusters=k_2d,
+        random_state=RANDOM_STATE,
+        backend=TRAINING_BACKEND,
+        engine_options=KMEANS_ENGINE_OPTIONS,
     )
+    stage("save_model", save_model, model_2d, model_path, outputs=[model_path])
 
-    # Add cluster labels to the dataset
-    df_processed = df_raw.copy()
-    df_processed["Cluster_2D_k5"] = labels_2d
-    print(f"\nCluster counts for k={INITIAL_K} (2 features):")
-    print(df_processed["Cluster_2D_k5"].value_counts())
+    # Profile the clusters in one pass; names are derived from the centroids
+    profile_2d = stage(
+        "profile_2d",
+        build_profile,
+        df_raw,
+        X_2d,
+        labels_2d,
+        model_2d.cluster_centers_,
+        preprocessor_2d["numeric_features"],
+        PROFILE_FEATURES,
+        PROFILE_CATEGORIES,
+    )
+
+    # Register the centroids for fast, NumPy-only scoring in the app and scorers
+    data_hash = hash_file(RAW_DATA_PATH)
+    registered_2d = register_model(
+        model_name_2d,
+        model_2d.cluster_centers_,
+        preprocessor_2d["input_features"],
+        RANDOM_STATE,
+        data_hash,
+        cluster_names=profile_2d["cluster_names"],
+        preprocessor=preprocessor_2d,
+        inertia=float(model_2d.inertia_),
+        level_cuts=profile_2d["level_cuts"],
+        cluster_counts=[cluster["size"] for cluster in profile_2d["clusters"]],
+    )
+    save_profile(profile_2d, profile_path(model_name_2d, registered_2d["version"]),
+                 model=model_name_2d, version=registered_2d["version"])
 
-    # Save scatterplot of 2D clusters
-    save_cluster_scatterplot(
-        df_processed,
+    print(f"\nCluster counts for k={k_2d} (2 features):")
+    print(pd.Series(labels_2d, name=cluster_col).value_counts())
+
+    # Check how stable the 2D clusters are under resampling
+    stability = stage(
+        "cluster_stability",
+        cluster_stability,
+        X_2d,
+        labels_2d,
+        k_2d,
+        n_runs=STABILITY_RUNS,
+        method=STABILITY_METHOD,
+        random_state=RANDOM_STATE,
+        engine_options=KMEANS_ENGINE_OPTIONS,
+        n_jobs=plan["n_jobs"],
+    )
+    save_stability(stability, df_raw["Customer_ID"], STABILITY_PATH, CONFIDENCE_PATH,
+                   model=model_name_2d, version=registered_2d["version"],
+                   cluster_col=cluster_col)
+
+    # Scatterplot of 2D clusters (only the plotted columns are needed)
+    figure_jobs.append(figure_job(
+        "save_cluster_scatterplot",
+        save_cluster_scatterplot,
+        df_features_2d.assign(**{cluster_col: labels_2d}),
         x_col="Annual_Income",
         y_col="Spending_Score",
-        cluster_col="Cluster_2D_k5",
+        cluster_col=cluster_col,
         filename="scatter_clusters_2_features.png",
-    )
+        outputs=[figure_path("scatter_clusters_2_features.png")],
+    ))
 
-    # Evaluate optimal K for 2 features using Elbow and Silhouette methods
-    wcss_2d = calculate_wcss(
-        df_features_2d, MAX_K_TO_EVALUATE, random_state=RANDOM_STATE
+    # Evaluate K for 2 and 3 features with a single parallel sweep (for the plots)
+    sweep = stage(
+        "sweep_kmeans",
+        sweep_kmeans,
+        {"2d": X_2d, "3d": X_3d},
+        MAX_K_TO_EVALUATE,
+        random_state=RANDOM_STATE,
+        n_jobs=plan["n_jobs"],
+        silhouette=SILHOUETTE_METHOD,
+        silhouette_sample_size=plan["silhouette_sample_size"],
+        silhouette_max_memory_mb=plan["silhouette_max_memory_mb"],
+        engine_options=KMEANS_ENGINE_OPTIONS,
+        warm_start=WARM_START_SWEEP,
     )
-    save_elbow_plot(wcss_2d, "elbow_plot_2_features.png")
+    for name, results in sweep.items():
+        print(f"\nSilhouette scores ({name}):")
+        for k, result in results.items():
+            ci = result["silhouette_ci"]
+            ci_text = f" (95% CI {ci[0]:.3f}-{ci[1]:.3f})" if ci else ""
+            print(f"  k={k}: {result['silhouette']:.3f}{ci_text}")
 
-    silhouette_2d = calculate_silhouette_scores(
-        df_features_2d, MAX_K_TO_EVALUATE, random_state=RANDOM_STATE
+    # Profile and register the 3-feature model from its k selection fit
+    profile_3d = stage(
+        "profile_3d",
+        build_profile,
+        df_raw,
+        X_3d,
+        selection_3d["result"]["labels"],
+        selection_3d["result"]["centers"],
+        preprocessor_3d["numeric_features"],
+        PROFILE_FEATURES,
+        PROFILE_CATEGORIES,
     )
-    save_silhouette_plot(silhouette_2d, "silhouette_plot_2_features.png")
+    registered_3d = register_model(
+        model_name_3d,
+        selection_3d["result"]["centers"],
+        preprocessor_3d["input_features"],
+        RANDOM_STATE,
+        data_hash,
+        cluster_names=profile_3d["cluster_names"],
+        preprocessor=preprocessor_3d,
+        inertia=float(selection_3d["result"]["inertia"]),
+        level_cuts=profile_3d["level_cuts"],
+        cluster_counts=[cluster["size"] for cluster in profile_3d["clusters"]],
+    )
+    save_profile(profile_3d, profile_path(model_name_3d, registered_3d["version"]),
+                 model=model_name_3d, version=registered_3d["version"])
+
+    # Record the chosen k for the app
+    save_k_selection({
+        "2d": {**selection_2d, "features": FEATURES_2D_CLUSTERING,
+               "model": model_name_2d, "cluster_col": cluster_col},
+        "3d": {**selection_3d, "features": FEATURES_3D_CLUSTERING, "model": model_name_3d},
+    }, K_SELECTION_PATH)
+
+    # Elbow and Silhouette plots for 2 features
+    figure_jobs.append(figure_job(
+        "save_elbow_plot_2d",
+        save_elbow_plot,
+        sweep_scores(sweep["2d"], "inertia"),
+        "elbow_plot_2_features.png",
+        outputs=[figure_path("elbow_plot_2_features.png")],
+    ))
+    figure_jobs.append(figure_job(
+        "save_silhouette_plot_2d",
+        save_silhouette_plot,
+        sweep_scores(sweep["2d"], "silhouette"),
+        "silhouette_plot_2_features.png",
+        confidence_intervals=sweep_scores(sweep["2d"], "silhouette_ci"),
+        outputs=[figure_path("silhouette_plot_2_features.png")],
+    ))
+
+    # Silhouette plot for 3 features
+    figure_jobs.append(figure_job(
+        "save_silhouette_plot_3d",
+        save_silhouette_plot,
+        sweep_scores(sweep["3d"], "silhouette"),
+        "silhouette_plot_3_features.png",
+        confidence_intervals=sweep_scores(sweep["3d"], "silhouette_ci"),
+        outputs=[figure_path("silhouette_plot_3_features.png")],
+    ))
 
-    # Evaluate optimal K for 3 features using Silhouette method
-    df_features_3d = select_features(df_raw, FEATURES_3D_CLUSTERING)
-    silhouette_3d = calculate_silhouette_scores(
-        df_features_3d, MAX_K_TO_EVALUATE, random_state=RANDOM_STATE
+    # Render all figures in parallel worker processes
+    render_figures(figure_jobs, n_jobs=plan["n_jobs"])
+
+    # Save processed data with cluster labels, streaming the raw file chunk by
+    # chunk so the full table is never copied in memory. The registered model
+    # applies the stored preprocessing to each chunk.
+    scoring_model_2d = load_registered_model(model_name_2d, registered_2d["version"])
+    stage(
+        "assign_clusters",
+        predict_file,
+        scoring_model_2d,
+        RAW_DATA_PATH,
+        PROCESSED_DATA_PATH,
+        scoring_model_2d.features,
+        chunksize=plan["chunk_size"],
+        label_col=cluster_col,
+        input_files=[RAW_DATA_PATH],
+        outputs=[PROCESSED_DATA_PATH],
     )
-    save_silhouette_plot(silhouette_3d, "silhouette_plot_3_features.png")
 
-    # Save processed data with cluster labels
-    save_data(df_processed, PROCESSED_DATA_PATH)
+    # Index the clustered customers for similar-customer lookups in each
+    # model's feature space, stored beside the model version
+    for name, registered in ((model_name_2d, registered_2d), (model_name_3d, registered_3d)):
+        index_path = similarity_path(name, registered["version"])
+        stage(
+            f"similarity_index_{name}",
+            index_customers,
+            load_registered_model(name, registered["version"]),
+            PROCESSED_DATA_PATH,
+            index_path,
+            input_files=[PROCESSED_DATA_PATH],
+            outputs=[index_path],
+        )
+
+    if profiler is not None:
+        dump_profile(profiler, PROFILE_OUTPUT)
+
+    # Per-stage timing summary
+    print("\nPipeline stage summary:")
+    print(summary_table().to_string())
+
+    # Measured usage against the budget
+    print("\nResource usage:")
+    budget_report(plan, stop_monitor(monitor))
 
     print("\nScript finished successfully.")
@@ -0,0 +1,38 @@
+import argparse
+import warnings
+from src.models.predict import predict_file
+from src.models.registry import load_registered_model, selected_model_name
+
+# --- Configuration ---
+MODEL_NAME = None  # Registered model; None uses the 2-feature model chosen by main.py
+CHUNK_SIZE = 100_000  # Rows scored per vectorized predict call
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Assign customers in a CSV file to clusters in bulk."
+    )
+    parser.add_argument("input_path", help="CSV file with customers to score")
+    parser.add_argument("output_path", help="CSV file to write predictions to")
+    parser.add_argument("--model", default=MODEL_NAME,
+                        help="Registered model name (default: chosen by main.py)")
+    parser.add_argument("--version", type=int, help="Model version (default: latest)")
+    parser.add_argument(
+        "--chunksize", type=int, default=CHUNK_SIZE, help="Rows per chunk"
+    )
+    args = parser.parse_args()
+
+    model = load_registered_model(args.model or selected_model_name(), args.version)
+    print(f"Scoring with {model}")
+    predict_file(
+        model,
+        args.input_path,
+        args.output_path,
+        model.features,
+        cluster_names=model.cluster_names or None,
+        chunksize=args.chunksize,
+    )
+
+    print("\nBatch prediction finished successfully.")
@@ -0,0 +1,32 @@
+import argparse
+import warnings
+from src.pipeline.experiments import load_config, run_experiments, summarize_experiments
+from src.pipeline.instrumentation import summary_table
+
+# --- Configuration ---
+CONFIG_PATH = "experiments.json"  # Feature sets, k values, seeds and scalings to sweep
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Sweep clustering experiments (feature set x scaling x k x seed) "
+        "from a config file. Interrupted sweeps resume from their checkpoint."
+    )
+    parser.add_argument("config", nargs="?", default=CONFIG_PATH, help="Experiment config (JSON)")
+    parser.add_argument("--fresh", action="store_true", help="Ignore checkpointed results")
+    parser.add_argument("--n-jobs", type=int, help="Worker processes (overrides the config)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    if args.n_jobs is not None:
+        config["n_jobs"] = args.n_jobs
+    results = run_experiments(config, resume=not args.fresh)
+
+    print("\nBest configurations (mean over seeds):")
+    print(summarize_experiments(results).head(10).round(3).to_string(index=False))
+    print("\nStage timings:")
+    print(summary_table().round(3).to_string())
+
+    print("\nExperiments finished successfully.")
@@ -0,0 +1,127 @@
+import argparse
+import json
+import threading
+import time
+import warnings
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from src.models.predict import build_lookup_table, lookup_clusters
+from src.models.registry import load_registered_model, selected_model_name
+
+# --- Configuration ---
+MODEL_NAME = None  # Registered model; None uses the 2-feature model chosen by main.py
+LOOKUP_FEATURES = ["Annual_Income", "Spending_Score"]  # Models served from the lookup table
+HOST = "127.0.0.1"
+PORT = 8000
+MAX_INCOME = 500  # Largest income (k$) covered by the lookup table
+LATENCY_WINDOW = 10_000  # Number of recent requests kept for percentiles
+
+# --- Latency Metrics ---
+_latencies = deque(maxlen=LATENCY_WINDOW)
+_latency_lock = threading.Lock()
+_request_count = 0
+
+
+def record_latency(seconds):
+    global _request_count
+    with _latency_lock:
+        _latencies.append(seconds)
+        _request_count += 1
+
+
+def latency_metrics():
+    """
+    Return request count and p50/p99 latency (ms) over the recent window.
+    """
+    with _latency_lock:
+        window = np.array(_latencies) * 1000
+        count = _request_count
+    if len(window) == 0:
+        return {"requests": count, "p50_ms": None, "p99_ms": None}
+    p50, p99 = np.percentile(window, [50, 99])
+    return {"requests": count, "p50_ms": round(p50, 4), "p99_ms": round(p99, 4)}
+
+
+# --- Request Handling ---
+class ScoringHandler(BaseHTTPRequestHandler):
+    # Set once at startup: the registered model and, for income/score models,
+    # its precomputed assignment table
+    model = None
+    table = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, latency_metrics())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length))
+            # A single customer or a batch under "customers"
+            customers = payload.get("customers", [payload])
+            columns = {f: [c[f] for c in customers] for f in self.model.features}
+            if self.table is not None:
+                labels = lookup_clusters(self.table, self.model.cluster_centers_,
+                                         columns["Annual_Income"], columns["Spending_Score"],
+                                         transform=self.model.transform)
+            else:
+                labels = self.model.predict(columns)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+        results = [
+            {"cluster": int(label), "name": self.model.cluster_name(label)}
+            for label in labels
+        ]
+        self._send_json(200, results[0] if "customers" not in payload else {"results": results})
+        record_latency(time.perf_counter() - start)
+
+    def log_message(self, format, *args):
+        pass  # Keep the console quiet under load
+
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(description="Serve cluster assignments over HTTP.")
+    parser.add_argument("--model", default=MODEL_NAME,
+                        help="Registered model name (default: chosen by main.py)")
+    parser.add_argument("--version", type=int, help="Model version (default: latest)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+
+    model = load_registered_model(args.model or selected_model_name(), args.version)
+    ScoringHandler.model = model
+    if model.features == LOOKUP_FEATURES:
+        ScoringHandler.table = build_lookup_table(model.cluster_centers_, max_income=MAX_INCOME,
+                                                  transform=model.transform)
+        print(f"Loaded {model}, lookup table {ScoringHandler.table.shape}")
+    else:
+        print(f"Loaded {model}, scoring by nearest centroid")
+
+    server = ThreadingHTTPServer((args.host, args.port), ScoringHandler)
+    print(f"Serving predictions on http://{args.host}:{args.port} "
+          "(POST /predict, GET /metrics, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
@@ -0,0 +1,105 @@
+import os
+import threading
+
+# Process-wide cache shared by every session of the app.
+# Entries are keyed on (loader name, absolute path) and remember the file
+# signature they were built from, so a rewritten file is reloaded on next use.
+_cache = {}
+_stats = {"hits": 0, "misses": 0}
+_lock = threading.Lock()
+# Loads in progress, so concurrent callers wait for one load instead of repeating it
+_loading = {}
+_preload_thread = None
+
+
+def file_signature(file_path):
+    """
+    Return a cheap signature (mtime, size) identifying a file's current version.
+    """
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def cached_load(file_path, loader):
+    """
+    Load a file with `loader`, reusing the result until the file changes.
+
+    The returned object is shared between callers and must not be mutated.
+    """
+    key = (f"{loader.__module__}.{loader.__qualname__}", os.path.abspath(file_path))
+    signature = file_signature(file_path)
+    while True:
+        with _lock:
+            entry = _cache.get(key)
+            if entry is not None and entry[0] == signature:
+                _stats["hits"] += 1
+                return entry[1]
+            loading = _loading.get(key)
+            if loading is None:
+                _stats["misses"] += 1
+                loading = _loading[key] = threading.Event()
+                break
+        # Another thread is loading this file: wait for it, then look again
+        loading.wait()
+    # Load outside the lock so slow reads don't block other cached lookups
+    try:
+        value = loader(file_path)
+        with _lock:
+            _cache[key] = (signature, value)
+    finally:
+        with _lock:
+            del _loading[key]
+        loading.set()
+    return value
+
+
+def preload(jobs):
+    """
+    Warm the cache in a background thread, once per process.
+
+    jobs is a list of (file_path, loader) pairs, loaded in order with
+    cached_load. Callers that need an entry while it is loading wait for it
+    rather than loading it again. Failures are only printed here, so they
+    surface where the entry is actually used. Returns the warm-up thread.
+    """
+    global _preload_thread
+    with _lock:
+        if _preload_thread is not None:
+            return _preload_thread
+
+        def warm_up():
+            for file_path, loader in jobs:
+                try:
+                    cached_load(file_path, loader)
+                except Exception as e:
+                    print(f"Preload of {file_path} failed: {e}")
+
+        _preload_thread = threading.Thread(target=warm_up, name="cache-preload", daemon=True)
+        _preload_thread.start()
+    return _preload_thread
+
+
+def read_bytes(file_path):
+    """
+    Read a file's raw contents (used to cache figures).
+    """
+    with open(file_path, "rb") as f:
+        return f.read()
+
+
+def cache_stats():
+    """
+    Return hit/miss counters and the number of cached entries.
+    """
+    with _lock:
+        return {**_stats, "entries": len(_cache)}
+
+
+def clear_cache():
+    """
+    Drop all cached entries and reset the counters.
+    """
+    with _lock:
+        _cache.clear()
+        _stats["hits"] = 0
+        _stats["misses"] = 0
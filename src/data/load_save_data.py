@@ -1,20 +1,140 @@
-import pandas as pd
+import hashlib
+import json
 import os
+import threading
+from src.data.cache import file_signature
+from src.pipeline.instrumentation import instrumented
 
-def load_data(file_path):
+# pandas is imported inside the readers so importing this module stays cheap
+# Columnar copies of CSV files are cached here for fast, memory-mapped reads
+COLUMNAR_CACHE_DIR = "data/interim/columnar"
+FILE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".feather": "feather"}
+
+def _file_format(file_path):
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext not in FILE_FORMATS:
+        raise ValueError(f"Unsupported file format '{ext}' for {file_path}")
+    return FILE_FORMATS[ext]
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _columnar_cache_path(csv_path):
+    # Suffix with a hash of the full path so same-named files don't collide
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    path_hash = hashlib.sha1(os.path.abspath(csv_path).encode()).hexdigest()[:8]
+    return os.path.join(COLUMNAR_CACHE_DIR, f"{name}-{path_hash}.feather")
+
+def _write_feather(df, file_path):
+    # Uncompressed so the file can be memory-mapped without decoding;
+    # written to a temp file first so readers never see a partial file
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp{os.getpid()}-{threading.get_ident()}"
+    df.to_feather(tmp_path, compression="uncompressed")
+    os.replace(tmp_path, file_path)
+
+def _source_path(cache_path):
+    # Records the signature of the CSV a columnar cache was built from
+    return f"{cache_path}.source.json"
+
+def _write_columnar_cache(df, csv_path, signature):
+    # The signature is written after the data, so a cache is only trusted
+    # once both match
+    cache_path = _columnar_cache_path(csv_path)
+    _write_feather(df, cache_path)
+    tmp_path = f"{_source_path(cache_path)}.tmp{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "w") as f:
+        json.dump(list(signature), f)
+    os.replace(tmp_path, _source_path(cache_path))
+    return cache_path
+
+def _is_fresh(cache_path, source_path):
+    # Fresh only if built from the CSV's current version (mtime and size,
+    # as in src.data.cache), so a replaced CSV is reconverted even when it
+    # carries an older mtime
+    try:
+        with open(_source_path(cache_path)) as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return os.path.exists(cache_path) and recorded == list(file_signature(source_path))
+
+def csv_to_columnar(csv_path):
+    """
+    Return a Feather copy of a CSV file, converting it only when the CSV has changed.
+    """
+    cache_path = _columnar_cache_path(csv_path)
+    if not _is_fresh(cache_path, csv_path):
+        import pandas as pd
+        print(f"Converting {csv_path} to columnar cache: {cache_path}")
+        # Taken before reading, so a CSV rewritten meanwhile is not marked fresh
+        signature = file_signature(csv_path)
+        _write_columnar_cache(pd.read_csv(csv_path), csv_path, signature)
+    return cache_path
+
+def _read_feather(file_path, chunksize=None, usecols=None):
+    # Memory-map the file so column data is read lazily and without copies
+    import pyarrow.feather as feather
+    table = feather.read_table(file_path, columns=usecols, memory_map=True)
+    if chunksize is None:
+        return table.to_pandas(split_blocks=True)
+    return (
+        table.slice(start, chunksize).to_pandas(split_blocks=True)
+        for start in range(0, table.num_rows, chunksize)
+    )
+
+def _read_parquet(file_path, chunksize=None, usecols=None):
+    import pandas as pd
+    if chunksize is None:
+        return pd.read_parquet(file_path, columns=usecols)
+    import pyarrow.parquet as pq
+    batches = pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=usecols)
+    return (batch.to_pandas() for batch in batches)
+
+@instrumented
+def load_data(file_path, chunksize=None, usecols=None, use_columnar_cache=True):
     """
-    Load data from a CSV file.
+    Load data from a CSV, Parquet or Feather file.
+    If chunksize is given, return an iterator over DataFrames of that many rows.
+    usecols restricts the columns read from disk. CSV files are read through
+    a memory-mapped Feather cache when pyarrow is available.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Data file not found at {file_path}")
     print(f"Loading data from: {file_path}")
-    return pd.read_csv(file_path)
+    file_format = _file_format(file_path)
+    if file_format == "csv" and use_columnar_cache and _has_pyarrow():
+        # Chunked reads use an up-to-date cache but never trigger a conversion,
+        # which would load the whole CSV into memory
+        if chunksize is None or _is_fresh(_columnar_cache_path(file_path), file_path):
+            file_path, file_format = csv_to_columnar(file_path), "feather"
+    if file_format == "feather":
+        return _read_feather(file_path, chunksize, usecols)
+    if file_format == "parquet":
+        return _read_parquet(file_path, chunksize, usecols)
+    import pandas as pd
+    return pd.read_csv(file_path, chunksize=chunksize, usecols=usecols)
 
+@instrumented
 def save_data(df, file_path):
     """
-    Save a DataFrame to a CSV file.
+    Save a DataFrame to a CSV, Parquet or Feather file.
     """
     # Create directory if it doesn't exist
     os.makedirs(os.path.dirname(file_path), exist_ok=True)
     print(f"Saving data to: {file_path}")
-    df.to_csv(file_path, index=False)
\ No newline at end of file
+    file_format = _file_format(file_path)
+    if file_format == "parquet":
+        df.to_parquet(file_path, index=False)
+    elif file_format == "feather":
+        _write_feather(df.reset_index(drop=True), file_path)
+    else:
+        df.to_csv(file_path, index=False)
+        # Refresh the columnar cache now rather than re-parsing on next load
+        if _has_pyarrow():
+            _write_columnar_cache(df.reset_index(drop=True), file_path,
+                                  file_signature(file_path))
\ No newline at end of file
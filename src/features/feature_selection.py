@@ -1,13 +1,20 @@
-import pandas as pd
+import os
+from src.data.load_save_data import load_data
+from src.pipeline.instrumentation import instrumented
 
+@instrumented
 def select_features(df, feature_names):
     """
     Select specified columns from the DataFrame.
+    If df is a file path, only the requested columns are read from disk.
     """
     print(f"Selecting features: {feature_names}")
+    if isinstance(df, (str, os.PathLike)):
+        return load_data(df, usecols=feature_names)[feature_names]
     # Check if all requested features exist in the DataFrame
     if not all(feature in df.columns for feature in feature_names):
         missing = [f for f in feature_names if f not in df.columns]
         raise ValueError(f"Features not found in DataFrame: {missing}")
-    # Return a copy of the selected columns
-    return df[feature_names].copy()
\ No newline at end of file
+    # Return the selected columns; with copy-on-write they share memory with df
+    # until either is modified
+    return df[feature_names]
\ No newline at end of file
@@ -0,0 +1,108 @@
+import json
+import os
+import numpy as np
+from src.features.feature_selection import select_features
+from src.pipeline.instrumentation import instrumented
+
+SCALINGS = ("none", "standard", "robust")
+
+# A fitted preprocessor is a small JSON-serialisable dict of parameters, so it
+# can be stored next to a registered model and applied with NumPy alone.
+
+
+def fit_preprocessor(df, numeric_features, scaling="none", one_hot=()):
+    """
+    Fit scaling parameters for numeric_features and categories for one_hot columns.
+
+    scaling is "none", "standard" (mean / standard deviation) or "robust"
+    (median / interquartile range). Constant columns are left unscaled.
+    """
+    if scaling not in SCALINGS:
+        raise ValueError(f"Unknown scaling: {scaling}. Choose from {SCALINGS}")
+    numeric_features, one_hot = list(numeric_features), list(one_hot)
+    values = np.column_stack([np.asarray(df[f], dtype=np.float64) for f in numeric_features])
+    if scaling == "standard":
+        center, scale = values.mean(axis=0), values.std(axis=0)
+    elif scaling == "robust":
+        q25, center, q75 = np.percentile(values, [25, 50, 75], axis=0)
+        scale = q75 - q25
+    else:
+        center, scale = np.zeros(len(numeric_features)), np.ones(len(numeric_features))
+    scale = np.where(scale > 0, scale, 1.0)
+
+    categories = {col: sorted(np.unique(np.asarray(df[col])).tolist()) for col in one_hot}
+    return {
+        "input_features": numeric_features + one_hot,
+        "numeric_features": numeric_features,
+        "scaling": scaling,
+        "center": center.tolist(),
+        "scale": scale.tolist(),
+        "one_hot": categories,
+        "output_features": numeric_features + [
+            f"{col}_{category}" for col, cats in categories.items() for category in cats
+        ],
+    }
+
+
+def transform(data, params):
+    """
+    Apply a fitted preprocessor and return a C-contiguous float32 array.
+
+    data is a DataFrame or dict of columns, or a 2-D array with columns in
+    params["input_features"] order. Each column is cast straight into the
+    preallocated output and scaled in place, so no intermediate copies are
+    made. Unseen categories encode as all zeros.
+    """
+    if not (hasattr(data, "columns") or isinstance(data, dict)):
+        array = np.asarray(data)
+        data = {f: array[:, i] for i, f in enumerate(params["input_features"])}
+    n_rows = len(data[params["input_features"][0]])
+    out = np.empty((n_rows, len(params["output_features"])), dtype=np.float32)
+
+    n_numeric = len(params["numeric_features"])
+    for j, feature in enumerate(params["numeric_features"]):
+        out[:, j] = data[feature]
+    if params["scaling"] != "none":
+        numeric = out[:, :n_numeric]
+        numeric -= np.asarray(params["center"], dtype=np.float32)
+        numeric /= np.asarray(params["scale"], dtype=np.float32)
+
+    j = n_numeric
+    for col, categories in params["one_hot"].items():
+        values = np.asarray(data[col])
+        for category in categories:
+            out[:, j] = values == category
+            j += 1
+    return out
+
+
+@instrumented
+def preprocess(df, numeric_features, scaling="none", one_hot=()):
+    """
+    Select, fit and transform features in one pass.
+
+    df may be a DataFrame or a file path (only the needed columns are read).
+    Returns the float32 feature matrix and the fitted preprocessor.
+    """
+    print(f"Preprocessing features: {list(numeric_features)} (scaling={scaling}, "
+          f"one-hot={list(one_hot)})")
+    df = select_features(df, list(numeric_features) + list(one_hot))
+    params = fit_preprocessor(df, numeric_features, scaling, one_hot)
+    return transform(df, params), params
+
+
+def save_preprocessor(params, file_path):
+    """
+    Save a fitted preprocessor as JSON.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as f:
+        json.dump(params, f, indent=2)
+
+
+def load_preprocessor(file_path):
+    """
+    Load a preprocessor saved with save_preprocessor.
+    """
+    with open(file_path) as f:
+        return json.load(f)
@@ -1,40 +1,259 @@
+import os
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score
+import joblib
+from joblib import Parallel, delayed
+from src.data.load_save_data import load_data
+from src.pipeline.instrumentation import instrumented
 
-def train_kmeans(data, n_clusters, random_state=42):
+# scikit-learn (and the engine and silhouette modules built on it) is imported
+# when a model is first fitted, so importing this module stays cheap.
+BACKENDS = ("kmeans", "minibatch")
+
+def _make_kmeans(n_clusters, random_state, backend="kmeans", batch_size=1024):
+    """
+    Build an unfitted estimator for the requested training backend.
+    """
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+    if backend == "kmeans":
+        return KMeans(n_clusters=n_clusters, init='k-means++', n_init=10, random_state=random_state)
+    if backend == "minibatch":
+        return MiniBatchKMeans(
+            n_clusters=n_clusters, init='k-means++', n_init=3,
+            batch_size=batch_size, random_state=random_state,
+        )
+    raise ValueError(f"Unknown training backend: {backend}. Choose from {BACKENDS}")
+
+def fit_full_batch(data, n_clusters, random_state, engine_options=None, warm_centers=None):
+    """
+    Fit a full-batch KMeans, routing non-default engine options to src.models.engines.
+
+    engine_options may set "engine" ("lloyd", "elkan", "hamerly"), "init"
+    ("k-means++", "k-means||"), "n_init" and "patience" (early stopping
+    across restarts). Without options this is the standard KMeans fit.
+    """
+    from sklearn.cluster import KMeans
+    from src.models.engines import fit_kmeans
+    options = dict(engine_options or {})
+    engine = options.get("engine", "lloyd")
+    standard = (options.get("init", "k-means++") == "k-means++"
+                and options.get("patience") is None and engine in ("lloyd", "elkan"))
+    if standard and warm_centers is None:
+        kmeans = KMeans(n_clusters=n_clusters, init='k-means++', n_init=options.get("n_init", 10),
+                        algorithm=engine, random_state=random_state)
+        return kmeans.fit(data)
+    return fit_kmeans(data, n_clusters, random_state=random_state,
+                      warm_centers=warm_centers, **options)
+
+@instrumented
+def train_kmeans(data, n_clusters, random_state=42, backend="kmeans", batch_size=1024,
+                 engine_options=None):
     """
     Train a KMeans model and return the model and cluster labels.
+    backend="minibatch" trains with MiniBatchKMeans, which supports later updates;
+    engine_options selects the full-batch engine (see fit_full_batch).
     """
-    print(f"Training KMeans model with n_clusters={n_clusters}...")
-    kmeans = KMeans(n_clusters=n_clusters, init='k-means++', n_init=10, random_state=random_state)
-    kmeans.fit(data)
+    print(f"Training KMeans model with n_clusters={n_clusters} ({backend} backend)...")
+    if backend == "kmeans":
+        kmeans = fit_full_batch(data, n_clusters, random_state, engine_options)
+    else:
+        kmeans = _make_kmeans(n_clusters, random_state, backend, batch_size)
+        kmeans.fit(data)
     labels = kmeans.labels_
     print("KMeans training complete.")
     return kmeans, labels
 
-def calculate_wcss(data, max_k, random_state=42):
+@instrumented
+def train_kmeans_streaming(file_path, feature_names, n_clusters, chunksize=100_000,
+                           random_state=42, batch_size=1024, transform=None):
+    """
+    Train a MiniBatchKMeans model on a CSV file read chunk by chunk.
+    Only one chunk of the selected features is held in memory at a time;
+    each chunk is fed to the model in mini-batches of batch_size rows.
+    transform, if given, maps each chunk to the model's feature space
+    (e.g. a fitted preprocessor).
+    """
+    print(f"Training streaming KMeans model with n_clusters={n_clusters}...")
+    kmeans = _make_kmeans(n_clusters, random_state, "minibatch", batch_size)
+    for chunk in load_data(file_path, chunksize=chunksize, usecols=feature_names):
+        chunk = chunk[feature_names] if transform is None else transform(chunk)
+        for start in range(0, len(chunk), batch_size):
+            kmeans.partial_fit(chunk[start:start + batch_size])
+    print("Streaming KMeans training complete.")
+    return kmeans
+
+def minibatch_from_centers(centers, counts, random_state=None, feature_names=None):
+    """
+    Build a MiniBatchKMeans that continues from fitted centroids.
+
+    The model is seeded with the centroids weighted by their cluster sizes
+    (counts), so later partial_fit updates extend the old solution as
+    running means.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    centers = np.asarray(centers, dtype=np.float64)
+    minibatch = MiniBatchKMeans(
+        n_clusters=len(centers), init=centers, n_init=1, random_state=random_state,
+    )
+    minibatch.partial_fit(pd.DataFrame(centers, columns=feature_names), sample_weight=counts)
+    return minibatch
+
+def _to_minibatch(model):
+    """
+    Convert a fitted full-batch KMeans into an equivalent MiniBatchKMeans.
+    """
+    counts = np.bincount(model.labels_, minlength=model.n_clusters)
+    return minibatch_from_centers(model.cluster_centers_, counts, model.random_state,
+                                  getattr(model, "feature_names_in_", None))
+
+@instrumented
+def update_kmeans(model, data):
+    """
+    Incrementally update a fitted model with new rows instead of retraining.
+    """
+    if not hasattr(model, "partial_fit"):
+        model = _to_minibatch(model)
+    if isinstance(data, np.ndarray):
+        # partial_fit needs rows of the same precision as the fitted centroids
+        data = data.astype(model.cluster_centers_.dtype, copy=False)
+    print(f"Updating KMeans model with {len(data)} new rows...")
+    model.partial_fit(data)
+    return model
+
+def save_model(model, file_path):
+    """
+    Save a trained model to disk.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    print(f"Saving model to: {file_path}")
+    joblib.dump(model, file_path)
+
+def load_model(file_path):
+    """
+    Load a trained model from disk.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Model file not found at {file_path}")
+    print(f"Loading model from: {file_path}")
+    return joblib.load(file_path)
+
+def _fit_k(data, k, random_state, silhouette="auto", silhouette_sample_size=10_000,
+           engine_options=None, warm_centers=None, silhouette_max_memory_mb=None):
+    """
+    Fit a single KMeans configuration and return its inertia, silhouette and labels.
+    """
+    kmeans = fit_full_batch(data, k, random_state, engine_options, warm_centers)
+    labels = kmeans.labels_
+    result = {
+        "inertia": kmeans.inertia_,  # WCSS score
+        "n_iter": kmeans.n_iter_,
+        "centers": kmeans.cluster_centers_,
+        "silhouette": None,
+        "silhouette_ci": None,
+        "labels": labels,
+    }
+    if silhouette:
+        from src.models.silhouette import score_silhouette
+        score = score_silhouette(
+            data, labels, method=silhouette, sample_size=silhouette_sample_size,
+            centers=kmeans.cluster_centers_, random_state=random_state,
+            max_memory_mb=silhouette_max_memory_mb,
+        )
+        result["silhouette"] = score["score"]
+        result["silhouette_ci"] = score["ci"]
+    return result
+
+def _fit_k_chain(data, ks, random_state, silhouette, silhouette_sample_size, engine_options,
+                 silhouette_max_memory_mb=None):
+    """
+    Fit increasing k in sequence, warm-starting each k from the k-1 centers.
+    """
+    results, warm_centers = [], None
+    for k in ks:
+        result = _fit_k(data, k, random_state, silhouette, silhouette_sample_size,
+                        engine_options, warm_centers, silhouette_max_memory_mb)
+        warm_centers = result["centers"]
+        results.append(result)
+    return results
+
+@instrumented
+def sweep_kmeans(feature_sets, max_k, random_state=42, n_jobs=None,
+                 silhouette="auto", silhouette_sample_size=10_000,
+                 engine_options=None, warm_start=False, silhouette_max_memory_mb=None):
+    """
+    Fit KMeans once for every (feature set, k) with k from 3 to max_k.
+
+    Configurations run in parallel across a process pool of n_jobs workers
+    (-1 uses all cores). silhouette selects the scoring method ("auto",
+    "exact", "sampled", "simplified") or False to skip it; the sampled
+    method also reports a confidence interval in "silhouette_ci" (the
+    simplified silhouette is a different metric and has none).
+    silhouette_max_memory_mb caps each worker's blocks of silhouette
+    distances (None keeps the scorer's default).
+    engine_options selects the KMeans engine (see fit_full_batch). With
+    warm_start, each k is seeded from the k-1 solution, so the k values of a
+    feature set run in sequence and only feature sets run in parallel.
+    Returns {name: {k: {"inertia", "n_iter", "centers", "silhouette",
+    "silhouette_ci", "labels"}}}.
+    """
+    ks = list(range(3, max_k + 1))
+    print(f"Sweeping k from 3 to {max_k} for feature sets {list(feature_sets)} "
+          f"({len(ks) * len(feature_sets)} fits, n_jobs={n_jobs})...")
+    sweep = {name: {} for name in feature_sets}
+    if warm_start:
+        chains = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_k_chain)(
+                data, ks, random_state, silhouette, silhouette_sample_size, engine_options,
+                silhouette_max_memory_mb,
+            )
+            for data in feature_sets.values()
+        )
+        for name, results in zip(feature_sets, chains):
+            sweep[name] = dict(zip(ks, results))
+        print("K sweep complete.")
+        return sweep
+
+    configs = [(name, k) for name in feature_sets for k in ks]
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_k)(
+            feature_sets[name], k, random_state, silhouette, silhouette_sample_size,
+            engine_options, silhouette_max_memory_mb=silhouette_max_memory_mb,
+        )
+        for name, k in configs
+    )
+    for (name, k), result in zip(configs, results):
+        sweep[name][k] = result
+    print("K sweep complete.")
+    return sweep
+
+def sweep_scores(sweep_results, metric):
+    """
+    Extract {k: value} for one metric ("inertia", "silhouette" or
+    "silhouette_ci") from a sweep.
+    """
+    return {k: result[metric] for k, result in sweep_results.items()}
+
+@instrumented
+def calculate_wcss(data, max_k, random_state=42, n_jobs=None):
     """
     Calculate WCSS (Within-Cluster Sum of Squares) for k values from 3 to max_k.
     """
     print(f"Calculating WCSS for k from 3 to {max_k}...")
-    wcss_scores = {}
-    for i in range(3, max_k + 1):
-        kmeans = KMeans(n_clusters=i, init='k-means++', n_init=10, random_state=random_state)
-        kmeans.fit(data)
-        wcss_scores[i] = kmeans.inertia_  # WCSS score
+    sweep = sweep_kmeans({"data": data}, max_k, random_state, n_jobs, silhouette=False)
+    wcss_scores = sweep_scores(sweep["data"], "inertia")
     print("WCSS calculation complete.")
     return wcss_scores
 
-def calculate_silhouette_scores(data, max_k, random_state=42):
+@instrumented
+def calculate_silhouette_scores(data, max_k, random_state=42, n_jobs=None,
+                                method="auto", sample_size=10_000):
     """
     Calculate Silhouette scores for k values from 3 to max_k.
+
+    Large datasets are scored on a stratified sample (see src.models.silhouette).
     """
     print(f"Calculating Silhouette scores for k from 3 to {max_k}...")
-    silhouette_scores = {}
-    for i in range(3, max_k + 1):
-        kmeans = KMeans(n_clusters=i, init='k-means++', n_init=10, random_state=random_state)
-        labels = kmeans.fit_predict(data)
-        silhouette_scores[i] = silhouette_score(data, labels)
+    sweep = sweep_kmeans({"data": data}, max_k, random_state, n_jobs, method, sample_size)
+    silhouette_scores = sweep_scores(sweep["data"], "silhouette")
     print("Silhouette score calculation complete.")
     return silhouette_scores
\ No newline at end of file
@@ -0,0 +1,168 @@
+import numpy as np
+from sklearn.cluster import KMeans, kmeans_plusplus
+from sklearn.metrics import pairwise_distances_argmin_min
+from sklearn.metrics.pairwise import euclidean_distances
+
+# Lloyd and Elkan run through scikit-learn; Hamerly is implemented below.
+ENGINES = ("lloyd", "elkan", "hamerly")
+INITS = ("k-means++", "k-means||")
+
+
+def _nearest_sq_dist(X, centers):
+    # Squared distance from each point to its nearest center (chunked by sklearn)
+    _, dist = pairwise_distances_argmin_min(X, centers)
+    return dist ** 2
+
+
+def kmeans_parallel_init(X, n_clusters, oversampling=None, rounds=5, random_state=None):
+    """
+    Scalable k-means|| seeding (Bahmani et al., 2012).
+
+    Each round oversamples about `oversampling` (default 2k) candidates in
+    proportion to their squared distance from the current candidates. The
+    candidates, weighted by how many points they attract, are then reduced
+    to n_clusters centers with weighted k-means++.
+    """
+    rng = np.random.default_rng(random_state)
+    X = np.asarray(X, dtype=float)
+    oversampling = oversampling or 2 * n_clusters
+    candidates = X[[rng.integers(len(X))]]
+    sq_dist = _nearest_sq_dist(X, candidates)
+    for _ in range(rounds):
+        cost = sq_dist.sum()
+        if cost == 0:
+            break
+        chosen = rng.random(len(X)) < np.minimum(1, oversampling * sq_dist / cost)
+        if chosen.any():
+            candidates = np.vstack([candidates, X[chosen]])
+            sq_dist = np.minimum(sq_dist, _nearest_sq_dist(X, X[chosen]))
+    if len(candidates) <= n_clusters:
+        extra = X[rng.choice(len(X), n_clusters - len(candidates) + 1, replace=False)]
+        candidates = np.vstack([candidates, extra])
+    labels, _ = pairwise_distances_argmin_min(X, candidates)
+    weights = np.bincount(labels, minlength=len(candidates))
+    reducer = KMeans(n_clusters=n_clusters, init="k-means++", n_init=1,
+                     random_state=int(rng.integers(2 ** 31 - 1)))
+    return reducer.fit(candidates, sample_weight=weights).cluster_centers_
+
+
+def hamerly_kmeans(X, centers, max_iter=300, tol=1e-4):
+    """
+    Hamerly's triangle-inequality accelerated k-means (Hamerly, 2010).
+
+    Each point keeps an upper bound on the distance to its own center and a
+    lower bound on the distance to the second closest one. Points whose
+    bounds prove the assignment cannot change skip distance computations.
+    Returns (centers, labels, n_iter).
+    """
+    X = np.asarray(X, dtype=float)
+    centers = np.array(centers, dtype=float)
+    n, k = len(X), len(centers)
+    rows = np.arange(n)
+    # Same convergence threshold scaling as scikit-learn
+    tol = tol * np.var(X, axis=0).mean()
+
+    dist = euclidean_distances(X, centers)
+    labels = dist.argmin(axis=1)
+    upper = dist[rows, labels]
+    dist[rows, labels] = np.inf
+    lower = dist.min(axis=1)
+
+    for n_iter in range(1, max_iter + 1):
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, X)
+        new_centers = centers.copy()
+        nonempty = counts > 0
+        new_centers[nonempty] = sums[nonempty] / counts[nonempty, None]
+        shift = np.linalg.norm(new_centers - centers, axis=1)
+        centers = new_centers
+        if (shift ** 2).sum() <= tol:
+            break
+
+        # Moving centers loosen the bounds
+        upper += shift[labels]
+        order = np.argsort(shift)
+        largest = shift[order[-1]]
+        second = shift[order[-2]] if k > 1 else 0.0
+        lower -= np.where(labels == order[-1], second, largest)
+
+        center_dist = euclidean_distances(centers)
+        np.fill_diagonal(center_dist, np.inf)
+        half_gap = center_dist.min(axis=1) / 2
+        bound = np.maximum(half_gap[labels], lower)
+
+        # Tighten the upper bound only where the cheap test fails
+        check = np.flatnonzero(upper > bound)
+        if check.size:
+            upper[check] = np.linalg.norm(X[check] - centers[labels[check]], axis=1)
+            check = check[upper[check] > bound[check]]
+        if check.size:
+            dist = euclidean_distances(X[check], centers)
+            idx = np.arange(len(check))
+            new_labels = dist.argmin(axis=1)
+            upper[check] = dist[idx, new_labels]
+            dist[idx, new_labels] = np.inf
+            lower[check] = dist.min(axis=1)
+            labels[check] = new_labels
+    return centers, labels, n_iter
+
+
+def _initial_centers(X, n_clusters, init, rng, warm_centers=None):
+    seed = int(rng.integers(2 ** 31 - 1))
+    if warm_centers is not None:
+        # Keep the (k-1)-solution and add one center by D^2 sampling
+        sq_dist = _nearest_sq_dist(X, warm_centers)
+        total = sq_dist.sum()
+        new = rng.choice(len(X), p=sq_dist / total) if total > 0 else rng.integers(len(X))
+        return np.vstack([warm_centers, X[[new]]])
+    if init == "k-means||":
+        return kmeans_parallel_init(X, n_clusters, random_state=seed)
+    if init == "k-means++":
+        return kmeans_plusplus(X, n_clusters, random_state=seed)[0]
+    raise ValueError(f"Unknown init: {init}. Choose from {INITS}")
+
+
+def _fit_from(data, X, centers, engine, max_iter):
+    # Every engine ends in a fitted KMeans so models stay interchangeable
+    if engine == "hamerly":
+        centers, _, n_iter = hamerly_kmeans(X, centers, max_iter=max_iter)
+        # A final Lloyd pass from the converged centers (usually one iteration)
+        # fills in the standard fitted attributes
+        model = KMeans(n_clusters=len(centers), init=centers, n_init=1).fit(data)
+        model.n_iter_ += n_iter
+        return model
+    if engine in ("lloyd", "elkan"):
+        return KMeans(n_clusters=len(centers), init=centers, n_init=1,
+                      max_iter=max_iter, algorithm=engine).fit(data)
+    raise ValueError(f"Unknown engine: {engine}. Choose from {ENGINES}")
+
+
+def fit_kmeans(data, n_clusters, engine="lloyd", init="k-means++", n_init=10,
+               patience=None, min_improvement=1e-4, warm_centers=None,
+               max_iter=300, random_state=42):
+    """
+    Fit KMeans with a selectable engine and seeding, keeping the best of n_init restarts.
+
+    With patience set, restarts stop early once that many consecutive runs
+    fail to improve the best inertia by more than min_improvement (relative).
+    warm_centers seeds every restart with a (k-1)-cluster solution plus one
+    new center. The returned KMeans model records restarts run in n_restarts_.
+    """
+    X = np.asarray(data, dtype=float)
+    rng = np.random.default_rng(random_state)
+    best, stale, restarts = None, 0, 0
+    for _ in range(n_init):
+        centers = _initial_centers(X, n_clusters, init, rng, warm_centers)
+        model = _fit_from(data, X, centers, engine, max_iter)
+        restarts += 1
+        if best is None or model.inertia_ < best.inertia_ * (1 - min_improvement):
+            best, stale = model, 0
+        else:
+            stale += 1
+            if model.inertia_ < best.inertia_:
+                best = model
+        if patience is not None and stale >= patience:
+            break
+    best.n_restarts_ = restarts
+    return best
@@ -0,0 +1,226 @@
+import json
+import os
+import numpy as np
+from joblib import Parallel, delayed
+from src.models.clustering import fit_full_batch
+from src.pipeline.instrumentation import instrumented
+
+CRITERIA = ("elbow", "silhouette", "calinski_harabasz", "davies_bouldin", "gap")
+SEARCHES = ("adaptive", "bisection", "exhaustive")
+# Criteria whose best k is the highest (or lowest) score
+MAXIMIZE = {"silhouette": True, "calinski_harabasz": True, "davies_bouldin": False}
+# ks fitted per step of the adaptive search. Fixed rather than tied to the
+# worker count, so the ks fitted (and the k chosen) are the same on any machine.
+ADAPTIVE_BATCH_SIZE = 3
+
+
+def _reference_log_inertia(data, k, n_references, random_state, sample_size):
+    """
+    Mean and spread of log(inertia) for k clusters on uniform reference data
+    drawn from the data's bounding box (Tibshirani et al., 2001).
+    """
+    from sklearn.cluster import KMeans
+    rng = np.random.default_rng(random_state)
+    data = np.asarray(data, dtype=float)
+    if len(data) > sample_size:
+        data = data[rng.choice(len(data), sample_size, replace=False)]
+    low, high = data.min(axis=0), data.max(axis=0)
+    log_inertia = []
+    for _ in range(n_references):
+        reference = rng.uniform(low, high, size=data.shape)
+        kmeans = KMeans(n_clusters=k, n_init=3, random_state=int(rng.integers(2 ** 31 - 1)))
+        log_inertia.append(np.log(kmeans.fit(reference).inertia_))
+    return np.mean(log_inertia), np.std(log_inertia) * np.sqrt(1 + 1 / n_references)
+
+
+def evaluate_k(data, k, criterion, random_state=42, engine_options=None,
+               silhouette_sample_size=10_000, n_references=10, silhouette_max_memory_mb=None):
+    """
+    Fit KMeans with k clusters and score it with criterion.
+
+    Returns {"k", "inertia", "score", "score_se", "centers", "labels"};
+    score_se is the gap statistic's standard error (None otherwise). Large
+    data is scored on samples (silhouette, gap reference sets), and
+    silhouette_max_memory_mb caps the silhouette's distance blocks.
+    """
+    # scikit-learn is only needed once a fit runs, so importing this module stays cheap
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+    from src.models.silhouette import score_silhouette
+    kmeans = fit_full_batch(data, k, random_state, engine_options)
+    labels = kmeans.labels_
+    result = {"k": k, "inertia": kmeans.inertia_, "score": None, "score_se": None,
+              "centers": kmeans.cluster_centers_, "labels": labels}
+    if criterion == "silhouette":
+        result["score"] = score_silhouette(
+            data, labels, sample_size=silhouette_sample_size,
+            centers=kmeans.cluster_centers_, random_state=random_state,
+            max_memory_mb=silhouette_max_memory_mb,
+        )["score"]
+    elif criterion == "calinski_harabasz":
+        result["score"] = calinski_harabasz_score(data, labels)
+    elif criterion == "davies_bouldin":
+        result["score"] = davies_bouldin_score(data, labels)
+    elif criterion == "gap":
+        reference, se = _reference_log_inertia(
+            data, k, n_references, random_state, silhouette_sample_size
+        )
+        # Compare at the reference sample size (inertia grows with row count)
+        sample_fraction = min(1.0, silhouette_sample_size / len(data))
+        result["score"] = reference - np.log(kmeans.inertia_ * sample_fraction)
+        result["score_se"] = se
+    elif criterion != "elbow":
+        raise ValueError(f"Unknown criterion: {criterion}. Choose from {CRITERIA}")
+    return result
+
+
+def knee_point(ks, inertias):
+    """
+    Return the k at the knee of a decreasing inertia curve (Kneedle).
+
+    The curve is normalised to [0, 1] and the knee is the point furthest
+    below the straight line joining its ends.
+    """
+    ks, inertias = np.asarray(ks, dtype=float), np.asarray(inertias, dtype=float)
+    if len(ks) < 3:
+        return int(ks[-1])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertias - inertias[-1]) / max(inertias[0] - inertias[-1], 1e-12)
+    return int(ks[np.argmax((1 - x) - y)])
+
+
+def choose_k(results, criterion, min_drop=0.1):
+    """
+    Pick k from evaluated results ({k: result}) for a criterion.
+
+    elbow: the knee of the inertia curve, cut off where adding a cluster
+    stops reducing inertia by at least min_drop (relative).
+    gap: the smallest k with gap(k) >= gap(k+1) - se(k+1).
+    Others: the best score. Returns None if the data cannot decide yet.
+    """
+    ks = sorted(results)
+    if criterion == "elbow":
+        inertias = [results[k]["inertia"] for k in ks]
+        drops = [1 - b / a for a, b in zip(inertias, inertias[1:])]
+        # Points after the curve has flattened don't move the knee
+        end = next((i + 1 for i, drop in enumerate(drops) if drop < min_drop), len(ks))
+        return knee_point(ks[:end + 1], inertias[:end + 1])
+    if criterion == "gap":
+        for k, k_next in zip(ks, ks[1:]):
+            if k_next == k + 1 and (
+                results[k]["score"] >= results[k_next]["score"] - results[k_next]["score_se"]
+            ):
+                return k
+        return None
+    best = max if MAXIMIZE[criterion] else min
+    return best(ks, key=lambda k: results[k]["score"])
+
+
+def _is_settled(results, criterion, patience, min_drop):
+    # True once further k cannot change the choice: the gap rule is met, the
+    # inertia curve has flattened, or the best score is `patience` ks behind
+    ks = sorted(results)
+    if criterion == "gap":
+        return choose_k(results, criterion) is not None
+    if criterion == "elbow":
+        inertias = [results[k]["inertia"] for k in ks]
+        drops = [1 - b / a for a, b in zip(inertias, inertias[1:])]
+        return len(drops) >= patience and all(d < min_drop for d in drops[-patience:])
+    return ks[-1] - choose_k(results, criterion) >= patience
+
+
+@instrumented
+def select_k(data, criterion="silhouette", k_min=2, k_max=15, search="adaptive",
+             patience=2, min_drop=0.1, random_state=42, engine_options=None,
+             silhouette_sample_size=10_000, n_references=10, n_jobs=None,
+             silhouette_max_memory_mb=None, batch_size=ADAPTIVE_BATCH_SIZE):
+    """
+    Choose the number of clusters automatically.
+
+    criterion is "elbow", "silhouette", "calinski_harabasz", "davies_bouldin"
+    or "gap". search controls which k are fitted:
+      - "exhaustive" fits every k in [k_min, k_max];
+      - "adaptive" fits increasing k, batch_size at a time, and stops once
+        the choice is settled: `patience` ks past the best score, the gap rule
+        met, or inertia flattening (drop < min_drop) for `patience` ks;
+      - "bisection" assumes a unimodal score and narrows [k_min, k_max] by
+        ternary search, fitting O(log range) ks (score criteria only).
+    The ks of each batch are fitted in parallel across n_jobs workers; the
+    ks fitted do not depend on n_jobs.
+    Returns {"k", "criterion", "search", "scores", "inertia", "evaluated",
+    "stopped_early", "result"} where result holds the chosen fit's
+    centers and labels.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"Unknown criterion: {criterion}. Choose from {CRITERIA}")
+    if search not in SEARCHES:
+        raise ValueError(f"Unknown search: {search}. Choose from {SEARCHES}")
+    if search == "bisection" and criterion not in MAXIMIZE:
+        raise ValueError(f"Bisection search needs a score criterion, not '{criterion}'")
+    k_max = min(k_max, len(data) - 1)
+    print(f"Selecting k in [{k_min}, {k_max}] by {criterion} ({search} search)...")
+    results = {}
+
+    def evaluate(ks):
+        ks = [k for k in ks if k not in results]
+        fits = Parallel(n_jobs=n_jobs)(
+            delayed(evaluate_k)(data, k, criterion, random_state, engine_options,
+                                silhouette_sample_size, n_references, silhouette_max_memory_mb)
+            for k in ks
+        )
+        results.update({fit["k"]: fit for fit in fits})
+
+    def score(k):
+        evaluate([k])
+        sign = 1 if MAXIMIZE[criterion] else -1
+        return sign * results[k]["score"]
+
+    if search == "exhaustive":
+        evaluate(range(k_min, k_max + 1))
+    elif search == "bisection":
+        low, high = k_min, k_max
+        while high - low > 2:
+            third = (high - low) // 3
+            m1, m2 = low + third, high - third
+            evaluate([m1, m2])
+            if score(m1) < score(m2):
+                low = m1 + 1
+            else:
+                high = m2
+        evaluate(range(low, high + 1))
+    else:
+        for start in range(k_min, k_max + 1, batch_size):
+            evaluate(range(start, min(start + batch_size, k_max + 1)))
+            if _is_settled(results, criterion, patience, min_drop):
+                break
+
+    k = choose_k(results, criterion, min_drop)
+    if k is None:  # Gap rule never met in range: fall back to the largest gap
+        k = max(results, key=lambda k: results[k]["score"])
+    evaluated = sorted(results)
+    print(f"Selected k={k} after fitting {len(evaluated)} of {k_max - k_min + 1} values of k.")
+    return {
+        "k": k,
+        "criterion": criterion,
+        "search": search,
+        "scores": {k: results[k]["score"] for k in evaluated},
+        "inertia": {k: results[k]["inertia"] for k in evaluated},
+        "evaluated": evaluated,
+        "stopped_early": len(evaluated) < k_max - k_min + 1,
+        "result": results[k],
+    }
+
+
+def save_k_selection(selections, file_path):
+    """
+    Save {name: select_k result (plus any extra keys)} as JSON for the app.
+
+    The chosen fit's centers and labels are left out.
+    """
+    summary = {
+        name: {key: value for key, value in selection.items() if key != "result"}
+        for name, selection in selections.items()
+    }
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as f:
+        json.dump(summary, f, indent=2, default=float)
+    print(f"k selection saved to: {file_path}")
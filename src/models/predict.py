@@ -0,0 +1,125 @@
+import os
+import numpy as np
+from src.data.load_save_data import load_data
+from src.pipeline.instrumentation import instrumented
+
+# Cluster names are derived from each model's centroids when it is profiled
+# (see src/models/profiles.py) and stored with the registered model.
+
+
+def iter_predictions(model, source, feature_names, cluster_names=None,
+                     chunksize=100_000, label_col="Cluster"):
+    """
+    Read a CSV (path or file-like) in chunks and yield each chunk with its
+    predicted clusters.
+
+    Each chunk is scored with a single vectorized predict call, so memory
+    stays bounded by the chunk size rather than the file size.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        chunks = load_data(source, chunksize=chunksize)
+    else:
+        import pandas as pd
+        chunks = pd.read_csv(source, chunksize=chunksize)
+    for chunk in chunks:
+        missing = [f for f in feature_names if f not in chunk.columns]
+        if missing:
+            raise ValueError(f"Features not found in input file: {missing}")
+        chunk[label_col] = model.predict(chunk[feature_names])
+        if cluster_names is not None:
+            chunk["Cluster_Name"] = chunk[label_col].map(cluster_names)
+        yield chunk
+
+
+@instrumented
+def predict_file(model, input_path, output_path, feature_names,
+                 cluster_names=None, chunksize=100_000, label_col="Cluster"):
+    """
+    Score every row of a data file and write it out with its labels, chunk by chunk.
+
+    Only one chunk is held in memory at a time, so peak memory does not grow
+    with the file. The output is written to a temporary file and moved into
+    place at the end, so readers never see a partial file; if scoring fails,
+    the temporary file is removed. Returns the number of rows written.
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"Data file not found at {input_path}")
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    print(f"Scoring {input_path} in chunks of {chunksize} rows...")
+    n_rows = 0
+    tmp_path = f"{output_path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, "w", newline="") as out:
+            chunks = iter_predictions(
+                model, input_path, feature_names, cluster_names, chunksize, label_col
+            )
+            for chunk in chunks:
+                chunk.to_csv(out, header=n_rows == 0, index=False)
+                n_rows += len(chunk)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    print(f"Scored {n_rows} rows, predictions saved to: {output_path}")
+    return n_rows
+
+
+def nearest_centroid(points, centers):
+    """
+    Assign each point to its nearest centroid with a vectorized NumPy kernel.
+
+    Raises ValueError for points with missing (NaN) or infinite features,
+    which have no nearest centroid.
+    """
+    points = np.asarray(points, dtype=float)
+    centers = np.asarray(centers, dtype=float)
+    invalid = ~np.isfinite(points).all(axis=-1)
+    if invalid.any():
+        rows = np.flatnonzero(invalid)
+        raise ValueError(f"Input contains missing or infinite feature values "
+                         f"({len(rows)} row(s), first at position {rows[0]})")
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 doesn't change the argmin
+    dist = -2 * points @ centers.T + (centers ** 2).sum(axis=1)
+    return dist.argmin(axis=1)
+
+
+def build_lookup_table(centers, max_income=500, max_score=100, transform=None):
+    """
+    Precompute the cluster of every integer (income, spending score) pair.
+
+    transform maps raw (income, score) rows to the centroids' feature space
+    (e.g. a registered model's preprocessing). Returns a
+    (max_income + 1, max_score + 1) array indexed by [income, score].
+    """
+    incomes, scores = np.meshgrid(
+        np.arange(max_income + 1), np.arange(max_score + 1), indexing="ij"
+    )
+    grid = np.column_stack([incomes.ravel(), scores.ravel()])
+    if transform is not None:
+        grid = transform(grid)
+    labels = nearest_centroid(grid, centers)
+    return labels.astype(np.uint8).reshape(incomes.shape)
+
+
+def lookup_clusters(table, centers, incomes, scores, transform=None):
+    """
+    Assign clusters from the lookup table, falling back to the nearest-centroid
+    kernel (after transform, as in build_lookup_table) for inputs that are
+    non-integer or outside the table's range.
+    """
+    points = np.column_stack([incomes, scores]).astype(float)
+    rounded = np.rint(points).astype(np.int64)
+    in_table = (
+        (points == rounded).all(axis=1)
+        & (rounded >= 0).all(axis=1)
+        & (rounded[:, 0] < table.shape[0])
+        & (rounded[:, 1] < table.shape[1])
+    )
+    labels = np.empty(len(points), dtype=np.int64)
+    labels[in_table] = table[rounded[in_table, 0], rounded[in_table, 1]]
+    if not in_table.all():
+        outside = points[~in_table]
+        if transform is not None:
+            outside = transform(outside)
+        labels[~in_table] = nearest_centroid(outside, centers)
+    return labels
@@ -0,0 +1,189 @@
+import json
+import os
+import numpy as np
+from src.pipeline.instrumentation import instrumented
+
+# Cluster names are derived from where each centroid sits relative to the
+# customers: below the lower tercile of a feature is "Low", above the upper
+# tercile "High", otherwise "Average".
+LEVELS = ("Low", "Average", "High")
+FEATURE_LABELS = {"Annual_Income": "Income", "Spending_Score": "Spending"}
+LEVEL_LABELS = {"Age": ("Younger", "Middle-aged", "Older")}
+# Segment names for income and spending levels, e.g. ("High", "High")
+PERSONAS = {
+    ("Low", "Low"): "Careful Spenders",
+    ("Average", "Average"): "Standard",
+    ("High", "High"): "Target Group",
+    ("Low", "High"): "Careless",
+    ("High", "Low"): "Sensible Savers",
+}
+PROFILE_QUANTILES = {"q25": 25, "median": 50, "q75": 75}
+
+
+def level_cuts(data, feature_names):
+    """
+    Return {feature: [lower tercile, upper tercile]} of the columns of data.
+    """
+    cuts = np.percentile(np.asarray(data, dtype=np.float64), [100 / 3, 200 / 3], axis=0)
+    return {feature: cuts[:, j].tolist() for j, feature in enumerate(feature_names)}
+
+
+def _level(value, cuts):
+    return LEVELS[int(value > cuts[0]) + int(value > cuts[1])]
+
+
+def name_clusters(centers, cuts):
+    """
+    Name each cluster from its centroid's level on every feature in cuts.
+
+    centers has one column per feature in cuts (in order); extra columns,
+    such as one-hot encoded categories, are ignored. Returns {label: name},
+    e.g. "Target Group (High Income, High Spending)".
+    """
+    names = {}
+    for label, center in enumerate(np.asarray(centers, dtype=np.float64)):
+        levels = {feature: _level(center[j], c) for j, (feature, c) in enumerate(cuts.items())}
+        parts = [
+            LEVEL_LABELS[feature][LEVELS.index(level)] if feature in LEVEL_LABELS
+            else f"{level} {FEATURE_LABELS.get(feature, feature)}"
+            for feature, level in levels.items()
+        ]
+        name = ", ".join(parts)
+        persona = PERSONAS.get((levels.get("Annual_Income"), levels.get("Spending_Score")))
+        names[label] = f"{persona} ({name})" if persona else name
+    # Clusters at the same levels are told apart by their label
+    for label, name in names.items():
+        if list(names.values()).count(name) > 1:
+            names[label] = f"{name} #{label}"
+    return names
+
+
+def _describe(values):
+    # Count, mean, spread and quantiles of each column of a 2-D array
+    quantiles = np.percentile(values, list(PROFILE_QUANTILES.values()), axis=0)
+    stats = {
+        "mean": values.mean(axis=0),
+        "std": values.std(axis=0, ddof=1) if len(values) > 1 else np.zeros(values.shape[1]),
+        "min": values.min(axis=0),
+        **dict(zip(PROFILE_QUANTILES, quantiles)),
+        "max": values.max(axis=0),
+    }
+    return stats
+
+
+def _category_shares(values):
+    categories, counts = np.unique(values, return_counts=True)
+    return {str(category): count / len(values) for category, count in zip(categories, counts)}
+
+
+def cluster_profiles(df, labels, n_clusters, features, category_cols=()):
+    """
+    Aggregate customers per cluster in one grouping pass.
+
+    Rows are sorted by label once and every cluster's slice is summarised:
+    size and share, mean, std, min, quartiles and max of each feature, and
+    the share of each category of category_cols (e.g. Gender). The same
+    summary of all customers is returned under "overall".
+    """
+    labels = np.asarray(labels, dtype=np.intp)
+    values = np.column_stack([np.asarray(df[f], dtype=np.float64) for f in features])
+    categories = {col: np.asarray(df[col]) for col in category_cols}
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(n_clusters + 1))
+
+    def summarise(rows):
+        stats = _describe(values[rows])
+        return {
+            "size": int(len(rows)),
+            "share": len(rows) / len(labels),
+            "features": {
+                feature: {stat: float(column[j]) for stat, column in stats.items()}
+                for j, feature in enumerate(features)
+            },
+            "categories": {col: _category_shares(cats[rows]) for col, cats in categories.items()},
+        }
+
+    clusters = []
+    for label in range(n_clusters):
+        rows = order[bounds[label]:bounds[label + 1]]
+        clusters.append({"cluster": label, **(summarise(rows) if len(rows) else {"size": 0})})
+    return {"clusters": clusters, "overall": summarise(order)}
+
+
+@instrumented
+def build_profile(df, data, labels, centers, numeric_features, features, category_cols=()):
+    """
+    Build a model's cluster profile: names derived from the centroids and
+    per-cluster aggregates of the customers' raw features.
+
+    data and centers are in the model's feature space; their first columns
+    are numeric_features. features and category_cols are the raw columns
+    of df to summarise.
+    """
+    print(f"Profiling {len(centers)} clusters on {list(features)} and {list(category_cols)}...")
+    n_numeric = len(numeric_features)
+    cuts = level_cuts(np.asarray(data)[:, :n_numeric], numeric_features)
+    names = name_clusters(np.asarray(centers)[:, :n_numeric], cuts)
+    profile = cluster_profiles(df, labels, len(centers), features, category_cols)
+    for cluster in profile["clusters"]:
+        cluster["name"] = names[cluster["cluster"]]
+    return {
+        "n_customers": len(labels),
+        "features": list(features),
+        "category_cols": list(category_cols),
+        "level_cuts": cuts,
+        "cluster_names": names,
+        **profile,
+    }
+
+
+def overall_table(profile):
+    """
+    Return a describe()-style DataFrame of all customers' features.
+    """
+    import pandas as pd
+    overall = profile["overall"]
+    table = pd.DataFrame(overall["features"])
+    table.loc["count"] = overall["size"]
+    table = table.rename(index={"q25": "25%", "median": "50%", "q75": "75%"})
+    return table.loc[["count", "mean", "std", "min", "25%", "50%", "75%", "max"]]
+
+
+def cluster_table(profile):
+    """
+    Return one row per cluster: name, size, share, feature means and
+    medians and category shares (e.g. Gender_Female).
+    """
+    import pandas as pd
+    rows = []
+    for cluster in profile["clusters"]:
+        row = {"Cluster": cluster["cluster"], "Name": cluster.get("name"),
+               "Customers": cluster["size"], "Share": cluster.get("share", 0.0)}
+        for feature, stats in cluster.get("features", {}).items():
+            row[f"{feature}_mean"] = stats["mean"]
+            row[f"{feature}_median"] = stats["median"]
+        for col, shares in cluster.get("categories", {}).items():
+            row.update({f"{col}_{category}": share for category, share in shares.items()})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("Cluster")
+
+
+def save_profile(profile, file_path, **extra):
+    """
+    Save a cluster profile as JSON. Extra keyword arguments (e.g. the model
+    name and version) are stored with it.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as f:
+        json.dump({**extra, **profile}, f, indent=2)
+    print(f"Cluster profile saved to: {file_path}")
+
+
+def load_profile(file_path):
+    """
+    Load a profile saved with save_profile; cluster_names keys are ints again.
+    """
+    with open(file_path) as f:
+        profile = json.load(f)
+    profile["cluster_names"] = {int(k): v for k, v in profile["cluster_names"].items()}
+    return profile
@@ -0,0 +1,206 @@
+import json
+import os
+from datetime import datetime
+import numpy as np
+from src.features.preprocessing import load_preprocessor, save_preprocessor, transform
+from src.models.predict import nearest_centroid
+
+# Registered models are stored as models/registry/<name>/v<version>/ with a
+# metadata.json, a centroids.npy array, for models trained on transformed
+# features a preprocessor.json and, once its clusters are profiled, a
+# profile.json (see src/models/profiles.py) and, once its customers are
+# indexed, a similarity.joblib (see src/models/similarity.py). Scoring a
+# registered model only needs NumPy, so loading one does not import
+# scikit-learn.
+REGISTRY_DIR = "models/registry"
+K_SELECTION_PATH = "reports/k_selection.json"  # Models chosen by main.py
+METADATA_FILE = "metadata.json"
+CENTROIDS_FILE = "centroids.npy"
+PREPROCESSOR_FILE = "preprocessor.json"
+PROFILE_FILE = "profile.json"
+SIMILARITY_FILE = "similarity.joblib"
+
+
+class CentroidModel:
+    """
+    A registered clustering model: its centroids, metadata and preprocessor.
+
+    predict applies the stored preprocessor (if any) and assigns rows to the
+    nearest centroid with NumPy, so the model can be used wherever a fitted
+    KMeans would be (e.g. predict_file) on raw input features.
+    """
+
+    def __init__(self, metadata, centers, preprocessor=None):
+        self.metadata = metadata
+        self.cluster_centers_ = centers
+        self.preprocessor = preprocessor
+        self.name = metadata["name"]
+        self.version = metadata["version"]
+        self.features = metadata["features"]
+        self.n_clusters = metadata["n_clusters"]
+        self.cluster_names = {int(k): v for k, v in (metadata.get("cluster_names") or {}).items()}
+
+    def transform(self, data):
+        """
+        Map raw input features (DataFrame, dict of columns or array in
+        self.features order) to the space the centroids live in.
+        """
+        if self.preprocessor is not None:
+            return transform(data, self.preprocessor)
+        if hasattr(data, "columns") or isinstance(data, dict):
+            return np.column_stack([np.asarray(data[f], dtype=float) for f in self.features])
+        return data
+
+    def predict(self, data):
+        return nearest_centroid(self.transform(data), self.cluster_centers_)
+
+    def cluster_name(self, label):
+        return self.cluster_names.get(int(label), f"Cluster {label}")
+
+    def __repr__(self):
+        return f"CentroidModel({self.name!r}, version={self.version}, k={self.n_clusters})"
+
+
+def list_models(registry_dir=REGISTRY_DIR):
+    """
+    Return {name: [versions]} for every registered model, versions ascending.
+    """
+    if not os.path.isdir(registry_dir):
+        return {}
+    models = {name: list_versions(name, registry_dir) for name in sorted(os.listdir(registry_dir))}
+    return {name: versions for name, versions in models.items() if versions}
+
+
+def list_versions(name, registry_dir=REGISTRY_DIR):
+    """
+    Return the registered versions of a model in ascending order.
+    """
+    model_dir = os.path.join(registry_dir, name)
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(
+        int(entry[1:]) for entry in os.listdir(model_dir)
+        if entry.startswith("v") and entry[1:].isdigit()
+        and os.path.exists(os.path.join(model_dir, entry, METADATA_FILE))
+    )
+
+
+def selected_model_name(feature_set="2d", selection_path=K_SELECTION_PATH):
+    """
+    Return the name of the model main.py chose k for and registered for a
+    feature set ("2d" or "3d").
+    """
+    if not os.path.exists(selection_path):
+        raise FileNotFoundError(f"No k selection at {selection_path}; run main.py first")
+    with open(selection_path) as f:
+        return json.load(f)[feature_set]["model"]
+
+
+def metadata_path(name, version=None, registry_dir=REGISTRY_DIR):
+    """
+    Return the metadata file of a model version (the latest if version is None).
+    """
+    versions = list_versions(name, registry_dir)
+    if not versions:
+        raise FileNotFoundError(f"No registered model named '{name}' in {registry_dir}")
+    version = versions[-1] if version is None else int(version)
+    if version not in versions:
+        raise FileNotFoundError(f"Model '{name}' has no version {version} (found {versions})")
+    return os.path.join(registry_dir, name, f"v{version}", METADATA_FILE)
+
+
+def profile_path(name, version=None, registry_dir=REGISTRY_DIR):
+    """
+    Return the cluster profile file of a model version (the latest if version is None).
+    """
+    return os.path.join(os.path.dirname(metadata_path(name, version, registry_dir)), PROFILE_FILE)
+
+
+def similarity_path(name, version=None, registry_dir=REGISTRY_DIR):
+    """
+    Return the similarity index file of a model version (the latest if version is None).
+    """
+    return os.path.join(os.path.dirname(metadata_path(name, version, registry_dir)),
+                        SIMILARITY_FILE)
+
+
+def read_model(path, mmap=True):
+    """
+    Load a registered model from its metadata file.
+
+    Centroids are memory-mapped read-only by default.
+    """
+    with open(path) as f:
+        metadata = json.load(f)
+    version_dir = os.path.dirname(path)
+    centers = np.load(os.path.join(version_dir, CENTROIDS_FILE), mmap_mode="r" if mmap else None)
+    preprocessor_path = os.path.join(version_dir, PREPROCESSOR_FILE)
+    preprocessor = load_preprocessor(preprocessor_path) if os.path.exists(preprocessor_path) else None
+    return CentroidModel(metadata, centers, preprocessor)
+
+
+def load_registered_model(name, version=None, registry_dir=REGISTRY_DIR, mmap=True):
+    """
+    Load a registered model by name (and version, defaulting to the latest).
+    """
+    return read_model(metadata_path(name, version, registry_dir), mmap)
+
+
+def register_model(name, centers, features, random_state, data_hash,
+                   cluster_names=None, preprocessor=None, registry_dir=REGISTRY_DIR, **extra):
+    """
+    Store centroids and metadata as a new version of a named model.
+
+    features are the raw input columns. A fitted preprocessor (see
+    src.features.preprocessing) is stored with the model and applied when
+    scoring, so it is never refitted. If the latest version already holds
+    the same centroids, features, seed, data hash, cluster names,
+    preprocessor and cluster counts, it is reused instead of writing a duplicate. Extra keyword
+    arguments (e.g. inertia, or cluster_counts: the number of customers
+    behind each centroid, which incremental updates are weighted by) are
+    stored in the metadata.
+    Returns the metadata of the stored version.
+    """
+    centers = np.ascontiguousarray(centers, dtype=np.float64)
+    n_dims = len(preprocessor["output_features"]) if preprocessor else len(features)
+    if centers.ndim != 2 or centers.shape[1] != n_dims:
+        raise ValueError(f"Centroids of shape {centers.shape} do not match features {features}")
+
+    versions = list_versions(name, registry_dir)
+    if versions:
+        latest = load_registered_model(name, registry_dir=registry_dir, mmap=False)
+        unchanged = (
+            latest.features == list(features)
+            and latest.metadata["random_state"] == random_state
+            and latest.metadata["data_hash"] == data_hash
+            and latest.cluster_names == {int(k): v for k, v in (cluster_names or {}).items()}
+            and latest.preprocessor == preprocessor
+            and latest.metadata.get("cluster_counts") == extra.get("cluster_counts")
+            and np.array_equal(latest.cluster_centers_, centers)
+        )
+        if unchanged:
+            print(f"Model '{name}' unchanged, keeping version {latest.version}")
+            return latest.metadata
+
+    version = versions[-1] + 1 if versions else 1
+    metadata = {
+        "name": name,
+        "version": version,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "features": list(features),
+        "n_clusters": len(centers),
+        "random_state": random_state,
+        "data_hash": data_hash,
+        "cluster_names": {str(k): v for k, v in (cluster_names or {}).items()},
+        **extra,
+    }
+    version_dir = os.path.join(registry_dir, name, f"v{version}")
+    os.makedirs(version_dir, exist_ok=True)
+    np.save(os.path.join(version_dir, CENTROIDS_FILE), centers)
+    if preprocessor is not None:
+        save_preprocessor(preprocessor, os.path.join(version_dir, PREPROCESSOR_FILE))
+    # Metadata is written last: a version only counts once it exists
+    with open(os.path.join(version_dir, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Registered model '{name}' version {version} in {version_dir}")
+    return metadata
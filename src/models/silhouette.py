@@ -0,0 +1,197 @@
+from statistics import NormalDist
+import numpy as np
+
+# Memory ceiling for a single block of pairwise distances
+DEFAULT_MAX_MEMORY_MB = 256
+
+
+def stratified_sample(labels, sample_size, random_state=42):
+    """
+    Draw sample indices from each cluster in proportion to its size.
+
+    Every cluster contributes at least two points (or all of them if smaller).
+    """
+    rng = np.random.default_rng(random_state)
+    labels = np.asarray(labels)
+    n = len(labels)
+    indices = []
+    for cluster in np.unique(labels):
+        members = np.flatnonzero(labels == cluster)
+        size = max(2, int(round(sample_size * len(members) / n)))
+        size = min(size, len(members))
+        indices.append(rng.choice(members, size=size, replace=False))
+    return np.sort(np.concatenate(indices))
+
+
+def _distance_block(rows, rows_sq, cols, cols_sq):
+    # Euclidean distances between two sets of points, built in place in the
+    # one array the product allocates: ||x||^2 - 2 x.y + ||y||^2
+    dist = rows @ cols.T
+    dist *= -2
+    dist += rows_sq[:, None]
+    dist += cols_sq[None, :]
+    np.maximum(dist, 0, out=dist)
+    return np.sqrt(dist, out=dist)
+
+
+def _cluster_distance_sums(points, data, codes, n_clusters, max_memory_mb):
+    """
+    Sum the distances from each point to the members of every cluster.
+
+    codes are the clusters of data as integers in [0, n_clusters). Distances
+    are computed in blocks of at most max_memory_mb, built in place and
+    reduced per cluster without further block-sized temporaries.
+    """
+    # Group the data by cluster so each cluster's columns of a block are
+    # contiguous and can be summed with a single reduceat
+    order = np.argsort(codes, kind="stable")
+    data = data[order]
+    bounds = np.searchsorted(codes[order], np.arange(n_clusters + 1))
+    del order
+    max_cells = max(1, int(max_memory_mb * 1024 ** 2 / 8))
+    n_points, n_data = len(points), len(data)
+    col_block = min(n_data, max_cells)
+    row_block = max(1, min(n_points, max_cells // col_block))
+    sums = np.zeros((n_points, n_clusters))
+    data_sq = np.einsum("ij,ij->i", data, data)
+    for r in range(0, n_points, row_block):
+        rows = points[r:r + row_block]
+        rows_sq = np.einsum("ij,ij->i", rows, rows)
+        for c in range(0, n_data, col_block):
+            cols = slice(c, c + col_block)
+            dist = _distance_block(rows, rows_sq, data[cols], data_sq[cols])
+            # Where each cluster's columns start and end within this block
+            starts = np.clip(bounds[:-1], c, c + col_block) - c
+            ends = np.clip(bounds[1:], c, c + col_block) - c
+            present = ends > starts
+            sums[r:r + row_block, present] += np.add.reduceat(dist, starts[present], axis=1)
+            del dist  # Release the block before the next one is allocated
+    return sums
+
+
+def sampled_silhouette_values(data, labels, sample_idx,
+                              max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+    """
+    Exact silhouette values for the sampled points, measured against all points.
+    """
+    data = np.asarray(data, dtype=float)
+    clusters, codes = np.unique(labels, return_inverse=True)
+    counts = np.bincount(codes, minlength=len(clusters))
+
+    sums = _cluster_distance_sums(data[sample_idx], data, codes, len(clusters),
+                                  max_memory_mb)
+    own = codes[sample_idx]
+    rows = np.arange(len(sample_idx))
+    own_counts = counts[own]
+    # Mean intra-cluster distance excludes the point itself
+    a = sums[rows, own] / np.maximum(own_counts - 1, 1)
+    mean_dist = sums / counts
+    mean_dist[rows, own] = np.inf
+    b = mean_dist.min(axis=1)
+    values = (b - a) / np.maximum(a, b)
+    # Singleton clusters have a silhouette of 0 by convention
+    values[own_counts == 1] = 0
+    return np.nan_to_num(values)
+
+
+def simplified_silhouette_values(data, labels, centers,
+                                 max_memory_mb=DEFAULT_MAX_MEMORY_MB):
+    """
+    Centroid-based silhouette: distance to own centroid vs nearest other centroid.
+    """
+    data = np.asarray(data, dtype=float)
+    centers = np.asarray(centers, dtype=float)
+    labels = np.asarray(labels)
+    # Per row: its distances to every centroid plus about six vectors of
+    # per-row values (squared norm, index, a, b and their combinations)
+    block = max(1, int(max_memory_mb * 1024 ** 2 / (8 * (len(centers) + 6))))
+    centers_sq = np.einsum("ij,ij->i", centers, centers)
+    values = np.empty(len(data))
+    for start in range(0, len(data), block):
+        rows = data[start:start + block]
+        own = labels[start:start + block]
+        dist = _distance_block(rows, np.einsum("ij,ij->i", rows, rows), centers, centers_sq)
+        idx = np.arange(len(rows))
+        a = dist[idx, own]
+        dist[idx, own] = np.inf
+        b = dist.min(axis=1)
+        values[start:start + block] = (b - a) / np.maximum(a, b)
+    return np.nan_to_num(values)
+
+
+def _stratified_mean_ci(values, strata, weights, confidence):
+    """
+    Stratified mean of values with a normal-approximation confidence interval.
+    """
+    mean, var = 0.0, 0.0
+    for stratum, weight in weights.items():
+        v = values[strata == stratum]
+        mean += weight * v.mean()
+        if len(v) > 1:
+            var += weight ** 2 * v.var(ddof=1) / len(v)
+    margin = NormalDist().inv_cdf(0.5 + confidence / 2) * np.sqrt(var)
+    return mean, (mean - margin, mean + margin)
+
+
+def approximate_silhouette(data, labels, method="sampled", sample_size=10_000,
+                           centers=None, max_memory_mb=DEFAULT_MAX_MEMORY_MB,
+                           confidence=0.95, random_state=42):
+    """
+    Estimate the silhouette score of a clustering on large datasets.
+
+    method="sampled" scores a stratified per-cluster sample exactly against
+    all points with blockwise distances; method="simplified" uses centroid
+    distances for every point (requires centers). Returns a dict with the
+    score, the metric it is a value of, its confidence interval and the
+    number of points scored.
+
+    The simplified silhouette is a different metric, not an estimate of the
+    silhouette (it is typically higher), so it has no interval around the
+    silhouette and its "ci" is None.
+    """
+    labels = np.asarray(labels)
+    clusters, counts = np.unique(labels, return_counts=True)
+    weights = dict(zip(clusters, counts / len(labels)))
+    if method == "sampled":
+        sample_idx = stratified_sample(labels, sample_size, random_state)
+        values = sampled_silhouette_values(data, labels, sample_idx, max_memory_mb)
+        strata = labels[sample_idx]
+    elif method == "simplified":
+        if centers is None:
+            raise ValueError("Cluster centers are required for the simplified silhouette")
+        values = simplified_silhouette_values(
+            data, labels, np.asarray(centers), max_memory_mb
+        )
+        return {"score": float(values.mean()), "metric": "simplified_silhouette",
+                "ci": None, "n_samples": len(values)}
+    else:
+        raise ValueError(f"Unknown silhouette method: {method}")
+    score, (low, high) = _stratified_mean_ci(values, strata, weights, confidence)
+    return {"score": float(score), "metric": "silhouette", "ci": (float(low), float(high)),
+            "n_samples": len(values)}
+
+
+def score_silhouette(data, labels, method="auto", sample_size=10_000,
+                     centers=None, random_state=42, max_memory_mb=None):
+    """
+    Silhouette score using the exact metric for small data, approximations otherwise.
+
+    method="auto" is exact when the data has at most sample_size rows and
+    sampled beyond that. Exact scores are returned with a None interval.
+    No block of pairwise distances exceeds max_memory_mb (None uses
+    DEFAULT_MAX_MEMORY_MB), whichever method runs.
+    """
+    max_memory_mb = max_memory_mb or DEFAULT_MAX_MEMORY_MB
+    if method == "auto":
+        method = "exact" if len(data) <= sample_size else "sampled"
+    if method == "exact":
+        from sklearn import config_context
+        from sklearn.metrics import silhouette_score
+        # scikit-learn sizes its distance chunks by working_memory (in MB)
+        with config_context(working_memory=max_memory_mb):
+            score = float(silhouette_score(data, labels))
+        return {"score": score, "metric": "silhouette", "ci": None, "n_samples": len(data)}
+    return approximate_silhouette(
+        data, labels, method=method, sample_size=sample_size,
+        centers=centers, max_memory_mb=max_memory_mb, random_state=random_state,
+    )
@@ -0,0 +1,130 @@
+import os
+import numpy as np
+from src.data.load_save_data import load_data
+from src.models.predict import nearest_centroid
+from src.pipeline.instrumentation import instrumented
+
+# Similar customers are found with KD-trees over a registered model's feature
+# space (after its preprocessing), built once per model version and stored
+# beside it (see similarity_path in src/models/registry.py). One tree covers
+# every customer and one per cluster answers same-cluster lookups, so a query
+# visits O(log n) nodes instead of scanning the customer file.
+ID_COL = "Customer_ID"
+LEAF_SIZE = 16  # Points per KD-tree leaf
+
+
+@instrumented
+def build_similarity_index(model, customers, id_col=ID_COL, leafsize=LEAF_SIZE):
+    """
+    Index customers for nearest-neighbour lookups with a registered model.
+
+    customers holds id_col and the model's raw features, e.g. the processed
+    customer file. Rows are mapped to the model's feature space and assigned
+    to its clusters. Returns the index as a dict of arrays and KD-trees.
+    """
+    from scipy.spatial import cKDTree
+    print(f"Indexing {len(customers)} customers for similarity lookups with {model}...")
+    points = np.ascontiguousarray(model.transform(customers[model.features]), dtype=np.float64)
+    labels = nearest_centroid(points, model.cluster_centers_)
+    cluster_rows = [np.flatnonzero(labels == cluster) for cluster in range(model.n_clusters)]
+    return {
+        "model": model.name,
+        "version": model.version,
+        "n_customers": len(points),
+        "customer_ids": np.asarray(customers[id_col]),
+        "labels": labels,
+        "tree": cKDTree(points, leafsize=leafsize),
+        "cluster_rows": cluster_rows,
+        "cluster_trees": [cKDTree(points[rows], leafsize=leafsize) if len(rows) else None
+                          for rows in cluster_rows],
+    }
+
+
+def save_similarity_index(index, file_path):
+    """
+    Save a similarity index, replacing any previous one atomically.
+    """
+    import joblib
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    tmp_path = f"{file_path}.tmp{os.getpid()}"
+    joblib.dump(index, tmp_path)
+    os.replace(tmp_path, file_path)
+    print(f"Similarity index saved to: {file_path}")
+
+
+def load_similarity_index(file_path):
+    import joblib
+    return joblib.load(file_path)
+
+
+@instrumented
+def index_customers(model, customers_path, index_path, id_col=ID_COL):
+    """
+    Build a model's similarity index from a customer file and save it.
+
+    Returns the number of customers indexed.
+    """
+    customers = load_data(customers_path, usecols=[id_col] + model.features)
+    index = build_similarity_index(model, customers, id_col)
+    save_similarity_index(index, index_path)
+    return index["n_customers"]
+
+
+def query_index(index, points, n_neighbors=5, labels=None):
+    """
+    Find the n_neighbors indexed customers nearest to each point.
+
+    points are in the model's feature space. With labels, each point is only
+    matched with customers of the cluster it is labelled with. Returns
+    (rows, distances) of shape (len(points), n_neighbors), nearest first;
+    rows index the index's arrays and are -1 (distance inf) where fewer than
+    n_neighbors customers are available.
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    rows = np.full((len(points), n_neighbors), -1, dtype=np.intp)
+    distances = np.full((len(points), n_neighbors), np.inf)
+    if labels is None:
+        groups = [(np.arange(len(points)), index["tree"], None)]
+    else:
+        # Points of the same cluster are queried together against its tree
+        labels = np.asarray(labels)
+        groups = [(np.flatnonzero(labels == cluster), tree, index["cluster_rows"][cluster])
+                  for cluster, tree in enumerate(index["cluster_trees"])]
+    for queries, tree, members in groups:
+        if len(queries) == 0 or tree is None:
+            continue
+        k = min(n_neighbors, tree.n)
+        found_distances, found = tree.query(points[queries], k=k)
+        # A single neighbour comes back without its own axis
+        found = found.reshape(len(queries), k)
+        distances[queries, :k] = found_distances.reshape(len(queries), k)
+        rows[queries, :k] = found if members is None else members[found]
+    return rows, distances
+
+
+def similar_customers(index, model, data, n_neighbors=5, same_cluster=False, id_col=ID_COL):
+    """
+    Find the existing customers most similar to each row of data.
+
+    data holds the model's raw features (DataFrame, dict of columns or array,
+    as for model.predict). With same_cluster, matches are restricted to the
+    cluster each row is assigned to. Returns one row per match: Query (the
+    position of the row in data), Rank (1 is the most similar), id_col,
+    Cluster and Distance in the model's feature space.
+    """
+    import pandas as pd
+    if (index["model"], index["version"]) != (model.name, model.version):
+        raise ValueError(f"Similarity index was built for {index['model']} version "
+                         f"{index['version']}, not {model}")
+    points = model.transform(data)
+    labels = nearest_centroid(points, model.cluster_centers_) if same_cluster else None
+    rows, distances = query_index(index, points, n_neighbors, labels)
+    found = rows >= 0
+    query, rank = np.nonzero(found)
+    return pd.DataFrame({
+        "Query": query,
+        "Rank": rank + 1,
+        id_col: index["customer_ids"][rows[found]],
+        "Cluster": index["labels"][rows[found]],
+        "Distance": distances[found],
+    })
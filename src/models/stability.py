@@ -0,0 +1,165 @@
+import json
+import os
+import numpy as np
+from src.models.clustering import fit_full_batch
+from src.models.predict import nearest_centroid
+from src.pipeline.instrumentation import instrumented
+
+METHODS = ("bootstrap", "subsample")
+MMAP_DIR = "data/interim/stability"  # Shared feature matrix for the resampling workers
+# Mean Jaccard bands for interpreting cluster stability (Hennig, 2007)
+STABILITY_LEVELS = [(0.85, "highly stable"), (0.75, "stable"), (0.6, "weak"), (0.0, "unstable")]
+
+
+def align_labels(reference, labels, n_clusters):
+    """
+    Match the clusters of labels to those of reference with the Hungarian
+    algorithm, maximising the number of points they share.
+
+    Returns mapping, where mapping[label] is the matching reference cluster.
+    """
+    from scipy.optimize import linear_sum_assignment
+    overlap = np.zeros((n_clusters, n_clusters), dtype=np.int64)
+    np.add.at(overlap, (labels, reference), 1)
+    rows, cols = linear_sum_assignment(-overlap)
+    mapping = np.empty(n_clusters, dtype=np.intp)
+    mapping[rows] = cols
+    return mapping
+
+
+def jaccard_by_cluster(reference, aligned, n_clusters):
+    """
+    Jaccard similarity of each reference cluster with its aligned counterpart.
+    """
+    scores = np.zeros(n_clusters)
+    for cluster in range(n_clusters):
+        in_reference, in_aligned = reference == cluster, aligned == cluster
+        union = np.count_nonzero(in_reference | in_aligned)
+        scores[cluster] = np.count_nonzero(in_reference & in_aligned) / union if union else 0.0
+    return scores
+
+
+def _resample_fit(data, reference, n_clusters, seed, method, subsample_fraction,
+                  engine_options):
+    # Refit on a resample, then label every point with the run's centroids so
+    # runs can be compared point by point
+    rng = np.random.default_rng(seed)
+    n = len(data)
+    if method == "bootstrap":
+        sample = rng.integers(0, n, n)
+    else:
+        sample = rng.choice(n, int(round(n * subsample_fraction)), replace=False)
+    kmeans = fit_full_batch(data[np.sort(sample)], n_clusters, seed, engine_options)
+    labels = nearest_centroid(data, kmeans.cluster_centers_)
+    # Clusters are matched and scored on the customers that were resampled
+    in_sample = np.zeros(n, dtype=bool)
+    in_sample[sample] = True
+    mapping = align_labels(reference[in_sample], labels[in_sample], n_clusters)
+    aligned = mapping[labels]
+    return {
+        "jaccard": jaccard_by_cluster(reference[in_sample], aligned[in_sample], n_clusters),
+        "labels": aligned.astype(np.int16),
+    }
+
+
+def _shared_matrix(data, mmap_dir):
+    # Write the feature matrix once; workers receive the memory map by file
+    # reference instead of a pickled copy of the data
+    os.makedirs(mmap_dir, exist_ok=True)
+    path = os.path.join(mmap_dir, f"features-{os.getpid()}.npy")
+    np.save(path, np.ascontiguousarray(data))
+    return path, np.load(path, mmap_mode="r")
+
+
+def stability_level(jaccard):
+    return next(level for threshold, level in STABILITY_LEVELS if jaccard >= threshold)
+
+
+@instrumented
+def cluster_stability(data, reference_labels, n_clusters, n_runs=50, method="bootstrap",
+                      subsample_fraction=0.8, random_state=42, engine_options=None,
+                      n_jobs=None, mmap_dir=MMAP_DIR):
+    """
+    Measure how stable clusters are under resampling.
+
+    Each of n_runs refits KMeans on a bootstrap sample (or a subsample of
+    subsample_fraction without replacement), in parallel across n_jobs
+    workers that share one memory-mapped copy of data. Every run's clusters
+    are aligned to reference_labels by Hungarian matching. Returns
+    {"clusters": per-cluster Jaccard mean/std/min and stability level,
+    "confidence": per-point share of runs agreeing with its reference
+    cluster, "modal_cluster": per-point most frequent aligned cluster, ...}.
+    """
+    from joblib import Parallel, delayed
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method: {method}. Choose from {METHODS}")
+    reference = np.asarray(reference_labels, dtype=np.intp)
+    print(f"Assessing stability of {n_clusters} clusters with {n_runs} {method} refits...")
+    seeds = np.random.default_rng(random_state).integers(2 ** 31 - 1, size=n_runs)
+    path, shared = _shared_matrix(data, mmap_dir)
+    try:
+        runs = Parallel(n_jobs=n_jobs, return_as="generator")(
+            delayed(_resample_fit)(shared, reference, n_clusters, int(seed), method,
+                                   subsample_fraction, engine_options)
+            for seed in seeds
+        )
+        # Tally aligned votes per point as runs finish, not all labels at once
+        votes = np.zeros((len(reference), n_clusters), dtype=np.int32)
+        jaccard = []
+        for run in runs:
+            votes[np.arange(len(reference)), run["labels"]] += 1
+            jaccard.append(run["jaccard"])
+    finally:
+        del shared
+        os.remove(path)
+
+    jaccard = np.array(jaccard)
+    clusters = [
+        {
+            "cluster": cluster,
+            "size": int(np.count_nonzero(reference == cluster)),
+            "jaccard_mean": float(jaccard[:, cluster].mean()),
+            "jaccard_std": float(jaccard[:, cluster].std()),
+            "jaccard_min": float(jaccard[:, cluster].min()),
+            "stability": stability_level(jaccard[:, cluster].mean()),
+        }
+        for cluster in range(n_clusters)
+    ]
+    for c in clusters:
+        print(f"  Cluster {c['cluster']}: Jaccard {c['jaccard_mean']:.3f} "
+              f"(+/- {c['jaccard_std']:.3f}), {c['stability']}")
+    return {
+        "method": method,
+        "n_runs": n_runs,
+        "subsample_fraction": subsample_fraction if method == "subsample" else None,
+        "clusters": clusters,
+        "confidence": votes[np.arange(len(reference)), reference] / n_runs,
+        "modal_cluster": votes.argmax(axis=1),
+    }
+
+
+def save_stability(stability, customer_ids, summary_path, confidence_path, **extra):
+    """
+    Save the per-cluster summary as JSON and per-customer confidence as CSV.
+
+    Extra keyword arguments (e.g. the model name) are stored in the summary.
+    """
+    import pandas as pd
+    confidence = stability["confidence"]
+    summary = {
+        **extra,
+        **{key: value for key, value in stability.items()
+           if key not in ("confidence", "modal_cluster")},
+        "mean_confidence": float(confidence.mean()),
+        "low_confidence_share": float(np.mean(confidence < 0.8)),
+    }
+    for path in (summary_path, confidence_path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    pd.DataFrame({
+        "Customer_ID": np.asarray(customer_ids),
+        "Modal_Cluster": stability["modal_cluster"],
+        "Confidence": confidence.round(4),
+    }).to_csv(confidence_path, index=False)
+    print(f"Cluster stability saved to: {summary_path} and {confidence_path}")
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import time
+from itertools import combinations
+from src.data.load_save_data import load_data
+from src.features.preprocessing import preprocess
+from src.pipeline.instrumentation import instrumented
+
+# Settings used when an experiment config file leaves them out
+DEFAULT_CONFIG = {
+    "data_path": "data/raw/mall_customers.csv",
+    "columns": ["Age", "Annual_Income", "Spending_Score"],  # Columns to combine
+    "categorical": [],  # Columns among them to one-hot encode, e.g. ["Gender"]
+    "min_features": 2,
+    "max_features": None,  # None allows every column at once
+    "feature_sets": None,  # Explicit list of feature sets instead of combinations
+    "k": [3, 4, 5, 6, 7, 8],
+    "seeds": [42],
+    "scaling": ["none"],  # "none", "standard" and/or "robust"
+    "engine_options": {},
+    "silhouette_sample_size": 10_000,
+    "n_jobs": -1,
+    "checkpoint_dir": "data/interim/experiments",
+    "results_path": "reports/experiments.csv",
+}
+METRICS = ["inertia", "silhouette", "calinski_harabasz", "davies_bouldin", "n_iter", "seconds"]
+
+
+def load_config(file_path):
+    """
+    Read an experiment config (JSON) and fill in defaults.
+    """
+    with open(file_path) as f:
+        config = json.load(f)
+    unknown = set(config) - set(DEFAULT_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown experiment settings: {sorted(unknown)}")
+    return {**DEFAULT_CONFIG, **config}
+
+
+def feature_sets(config):
+    """
+    Return the feature sets to evaluate: the explicit list, or every
+    combination of min_features to max_features columns.
+    """
+    if config["feature_sets"]:
+        return [tuple(features) for features in config["feature_sets"]]
+    columns = config["columns"]
+    largest = config["max_features"] or len(columns)
+    return [
+        combo
+        for size in range(config["min_features"], largest + 1)
+        for combo in combinations(columns, size)
+    ]
+
+
+def job_id(job, data_hash, engine_options, silhouette_sample_size):
+    """
+    Identify a job by everything that affects its result, for checkpointing.
+    """
+    key = json.dumps([data_hash, list(job["features"]), job["scaling"], job["k"],
+                      job["seed"], engine_options, silhouette_sample_size], sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def evaluate_job(data, job, engine_options=None, silhouette_sample_size=10_000):
+    """
+    Fit one (feature set, scaling, k, seed) configuration and return its metrics.
+    """
+    # Imported here so the pool's workers import scikit-learn only when used
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score
+    from src.models.clustering import fit_full_batch
+    from src.models.silhouette import score_silhouette
+
+    start = time.perf_counter()
+    kmeans = fit_full_batch(data, job["k"], job["seed"], engine_options)
+    labels = kmeans.labels_
+    silhouette = score_silhouette(
+        data, labels, sample_size=silhouette_sample_size,
+        centers=kmeans.cluster_centers_, random_state=job["seed"],
+    )["score"]
+    return {
+        **job,
+        "features": "+".join(job["features"]),
+        "n_features": len(job["features"]),
+        "inertia": float(kmeans.inertia_),
+        "silhouette": float(silhouette),
+        "calinski_harabasz": float(calinski_harabasz_score(data, labels)),
+        "davies_bouldin": float(davies_bouldin_score(data, labels)),
+        "n_iter": int(kmeans.n_iter_),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _read_checkpoint(path):
+    # Completed jobs by id. A line cut short by an interruption is dropped
+    # from the file so new results are appended after the last whole line.
+    done, lines = {}, []
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if line.endswith("\n"):
+                done[result["job_id"]] = result
+                lines.append(line)
+    if sum(map(len, lines)) != os.path.getsize(path):
+        with open(path, "w") as f:
+            f.writelines(lines)
+    return done
+
+
+@instrumented
+def run_experiments(config, resume=True):
+    """
+    Evaluate every (feature set x scaling x k x seed) job of a config.
+
+    The data is loaded once and each (feature set, scaling) matrix is built
+    once and shared by all of its k and seed jobs, which run across a
+    process pool of config["n_jobs"] workers. Each finished job is appended
+    to a checkpoint file as it completes, so an interrupted run resumes
+    where it stopped. Returns the consolidated results DataFrame, also
+    written to config["results_path"].
+    """
+    import pandas as pd
+    from joblib import Parallel, delayed
+    from src.pipeline.stage_cache import hash_file
+
+    sets = feature_sets(config)
+    engine_options = config["engine_options"]
+    data_hash = hash_file(config["data_path"])
+    jobs = [
+        {"features": features, "scaling": scaling, "k": k, "seed": seed}
+        for features in sets for scaling in config["scaling"]
+        for k in config["k"] for seed in config["seeds"]
+    ]
+    for job in jobs:
+        job["job_id"] = job_id(job, data_hash, engine_options,
+                               config["silhouette_sample_size"])
+
+    os.makedirs(config["checkpoint_dir"], exist_ok=True)
+    checkpoint_path = os.path.join(config["checkpoint_dir"], "results.jsonl")
+    if not resume and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    done = _read_checkpoint(checkpoint_path)
+    pending = [job for job in jobs if job["job_id"] not in done]
+    print(f"Running {len(pending)} of {len(jobs)} experiment jobs "
+          f"({len(sets)} feature sets, {len(jobs) - len(pending)} already done)...")
+
+    if pending:
+        # Shared work: one load of the needed columns, one matrix per (features, scaling)
+        needed = sorted({column for job in pending for column in job["features"]})
+        df = load_data(config["data_path"], usecols=needed)
+        matrices = {}
+        for job in pending:
+            key = (job["features"], job["scaling"])
+            if key not in matrices:
+                numeric = [f for f in job["features"] if f not in config["categorical"]]
+                one_hot = [f for f in job["features"] if f in config["categorical"]]
+                matrices[key], _ = preprocess(df, numeric, job["scaling"], one_hot)
+        del df
+
+        results = Parallel(n_jobs=config["n_jobs"], return_as="generator_unordered")(
+            delayed(evaluate_job)(matrices[(job["features"], job["scaling"])], job,
+                                  engine_options, config["silhouette_sample_size"])
+            for job in pending
+        )
+        with open(checkpoint_path, "a") as checkpoint:
+            for i, result in enumerate(results, 1):
+                checkpoint.write(json.dumps(result) + "\n")
+                checkpoint.flush()
+                done[result["job_id"]] = result
+                if i % 50 == 0 or i == len(pending):
+                    print(f"  {i}/{len(pending)} jobs finished")
+
+    # Only jobs of the current config go into the table
+    table = pd.DataFrame([done[job["job_id"]] for job in jobs])
+    columns = ["features", "n_features", "scaling", "k", "seed"] + METRICS + ["job_id"]
+    table = table[columns].sort_values(["n_features", "features", "scaling", "k", "seed"])
+    os.makedirs(os.path.dirname(config["results_path"]) or ".", exist_ok=True)
+    table.to_csv(config["results_path"], index=False)
+    print(f"Experiment results saved to: {config['results_path']}")
+    return table
+
+
+def summarize_experiments(results):
+    """
+    Aggregate experiment results over seeds: mean and spread of each metric
+    per (feature set, scaling, k), best silhouette first.
+    """
+    grouped = results.groupby(["features", "scaling", "k"])
+    summary = grouped.agg(
+        runs=("seed", "size"),
+        silhouette=("silhouette", "mean"),
+        silhouette_std=("silhouette", "std"),
+        calinski_harabasz=("calinski_harabasz", "mean"),
+        davies_bouldin=("davies_bouldin", "mean"),
+        inertia=("inertia", "mean"),
+        seconds=("seconds", "mean"),
+    )
+    return summary.sort_values("silhouette", ascending=False).reset_index()
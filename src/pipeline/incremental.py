@@ -0,0 +1,325 @@
+import hashlib
+import io
+import json
+import os
+import numpy as np
+from src.data.cache import file_signature
+from src.data.load_save_data import load_data
+from src.models.predict import nearest_centroid
+from src.pipeline.instrumentation import instrumented
+
+# Incremental re-segmentation keeps its state next to the other interim data:
+# how far into the raw file customers have been assigned, the Customer_IDs
+# seen so far and running per-cluster statistics of the processed file.
+STATE_DIR = "data/interim/segmentation"
+STATE_FILE = "state.json"
+IDS_FILE = "customer_ids.bin"  # Append-only int64 Customer_IDs already assigned
+ID_COL = "Customer_ID"
+TAIL_BYTES = 1 << 16  # Bytes before the last assigned offset hashed to detect rewrites
+
+
+def _tail_hash(file_path, end):
+    # Hash of the bytes just before `end`, to check the file was only appended to
+    with open(file_path, "rb") as f:
+        f.seek(max(0, end - TAIL_BYTES))
+        return hashlib.sha256(f.read(end - max(0, end - TAIL_BYTES))).hexdigest()
+
+
+def _ends_with_newline(file_path):
+    # Rows appended to a file without a final newline join its last row
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b"\n", b"\r")
+
+
+def cluster_stats(data, labels, centers):
+    """
+    Return per-cluster running statistics of assigned points: count, feature
+    sums, sums of squares and squared distance to the centroid (sse).
+
+    Statistics of separate batches add up (see merge_stats), so the
+    clusters can be summarised without revisiting earlier rows.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    centers = np.asarray(centers, dtype=np.float64)
+    k = len(centers)
+    labels = np.asarray(labels, dtype=np.intp)
+    sq_dist = ((data - centers[labels]) ** 2).sum(axis=1)
+
+    def per_cluster(weights):
+        return np.bincount(labels, weights=weights, minlength=k)
+
+    return {
+        "count": np.bincount(labels, minlength=k).tolist(),
+        "sum": np.column_stack([per_cluster(col) for col in data.T]).tolist(),
+        "sumsq": np.column_stack([per_cluster(col ** 2) for col in data.T]).tolist(),
+        "sse": per_cluster(sq_dist).tolist(),
+    }
+
+
+def merge_stats(stats, other):
+    """
+    Add the statistics of a new batch to running statistics.
+    """
+    return {key: (np.asarray(stats[key]) + np.asarray(other[key])).tolist() for key in stats}
+
+
+def cluster_drift(stats, centers, baseline):
+    """
+    Measure how far the assigned customers have drifted from the centroids.
+
+    centroid_shift is the largest distance between a centroid and the mean
+    of its customers (where a refit would move it), in units of the RMS
+    customer-to-centroid distance at fit time. inertia_increase is the
+    relative growth of inertia per customer since the fit.
+    """
+    counts = np.asarray(stats["count"], dtype=np.float64)
+    centers = np.asarray(centers, dtype=np.float64)
+    means = np.asarray(stats["sum"]) / np.maximum(counts, 1)[:, None]
+    shifts = np.where(counts > 0, np.linalg.norm(means - centers, axis=1), 0.0)
+    baseline_mse = max(baseline["inertia"] / max(baseline["n_rows"], 1), 1e-12)
+    mse = float(np.sum(stats["sse"])) / max(counts.sum(), 1)
+    return {
+        "centroid_shift": float(shifts.max() / np.sqrt(baseline_mse)),
+        "inertia_increase": mse / baseline_mse - 1,
+    }
+
+
+def load_state(state_dir=STATE_DIR):
+    """
+    Return the saved incremental state, or None if there is none.
+    """
+    path = os.path.join(state_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_state(state, state_dir):
+    path = os.path.join(state_dir, STATE_FILE)
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _new_state(model, data, labels, ids, raw_path, raw_bytes, processed_path,
+               cluster_col, state_dir):
+    # Start a state from every customer in the processed file
+    os.makedirs(state_dir, exist_ok=True)
+    ids = np.asarray(ids, dtype=np.int64)
+    ids.tofile(os.path.join(state_dir, IDS_FILE))
+    stats = cluster_stats(data, labels, model.cluster_centers_)
+    state = {
+        "model": model.name,
+        "version": model.version,
+        "cluster_col": cluster_col,
+        "raw_path": raw_path,
+        # None until an update has read the raw file up to a known offset
+        "raw_bytes": raw_bytes,
+        "raw_tail_hash": _tail_hash(raw_path, raw_bytes) if raw_bytes is not None else None,
+        "processed_signature": list(file_signature(processed_path)),
+        "n_rows": len(ids),
+        "max_customer_id": int(ids.max()) if len(ids) else None,
+        "baseline": {"n_rows": len(ids), "inertia": float(np.sum(stats["sse"]))},
+        "stats": stats,
+    }
+    _save_state(state, state_dir)
+    return state
+
+
+def _is_current(state, model, processed_path, cluster_col):
+    # The state describes this model's labels in the processed file as it is now
+    return (
+        state is not None
+        and (state["model"], state["version"], state["cluster_col"])
+        == (model.name, model.version, cluster_col)
+        and os.path.exists(processed_path)
+        and list(file_signature(processed_path)) == state["processed_signature"]
+    )
+
+
+@instrumented
+def build_state(model, raw_path, processed_path, cluster_col, state_dir=STATE_DIR):
+    """
+    Compute the incremental state from an existing processed file.
+
+    Used the first time, and whenever the processed file or model changed
+    outside of incremental updates (e.g. after main.py). Reads the whole
+    processed file once.
+    """
+    print(f"Building incremental state from {processed_path}...")
+    df = load_data(processed_path, usecols=[ID_COL, cluster_col] + model.features)
+    return _new_state(
+        model, model.transform(df), df[cluster_col].to_numpy(), df[ID_COL].to_numpy(),
+        raw_path, None, processed_path, cluster_col, state_dir,
+    )
+
+
+def new_customers(raw_path, state, state_dir=STATE_DIR):
+    """
+    Return the raw rows whose Customer_ID has not been assigned yet, and the
+    raw file size they were read up to.
+
+    If the file has only been appended to since the last update, just the
+    bytes past the recorded offset are parsed and IDs are checked against
+    earlier ones only when they are not all new maxima. Otherwise the whole
+    file is read and compared by Customer_ID. Raises ValueError if the file
+    cannot be parsed, e.g. when rows were appended to a file that did not
+    end with a newline.
+    """
+    import pandas as pd
+
+    size = os.path.getsize(raw_path)
+    offset = state["raw_bytes"]
+    appended = (offset is not None and offset <= size
+                and _tail_hash(raw_path, offset) == state["raw_tail_hash"])
+    joined = False  # New bytes continue the previously last row
+    if appended:
+        with open(raw_path, "rb") as f:
+            header = f.readline()
+            f.seek(max(offset - 1, 0))
+            last_byte, new_bytes = f.read(1), f.read()
+        if not new_bytes.strip():
+            return pd.DataFrame(), size
+        # New rows must start on a new line, not continue the old last row
+        appended = last_byte == b"\n" or new_bytes[:1] in (b"\n", b"\r")
+        joined = not appended
+    if appended:
+        df = pd.read_csv(io.BytesIO(header + new_bytes.lstrip(b"\r\n")))
+    else:
+        if offset is not None:
+            print(f"{raw_path} was not only appended to; comparing all {ID_COL}s...")
+        try:
+            df = load_data(raw_path)
+        except pd.errors.ParserError as e:
+            cause = (" It did not end with a newline, so the first appended row was "
+                     "joined onto its last row." if joined else "")
+            raise ValueError(f"Cannot parse {raw_path}: {str(e).strip()}.{cause} "
+                             "Fix the malformed line and end the file with a newline.") from e
+
+    ids = df[ID_COL].to_numpy(dtype=np.int64)
+    new = np.ones(len(df), dtype=bool)
+    if state["max_customer_id"] is None or not (ids > state["max_customer_id"]).all():
+        known = np.fromfile(os.path.join(state_dir, IDS_FILE), dtype=np.int64)
+        new = ~np.isin(ids, known)
+    df = df[new]
+    return df[~df[ID_COL].duplicated()], size
+
+
+@instrumented
+def update_segments(model, raw_path, processed_path, cluster_col, state_dir=STATE_DIR,
+                    max_centroid_shift=0.25, max_inertia_increase=0.2):
+    """
+    Assign customers appended to raw_path since the last update to the
+    existing centroids and append them to processed_path.
+
+    The running cluster statistics and inertia are updated with the new rows
+    only, so the cost is proportional to the new data. Returns {"new_rows",
+    "drift", "needs_refit"}; needs_refit is True once a centroid has moved
+    more than max_centroid_shift (see cluster_drift) or inertia per customer
+    has grown by more than max_inertia_increase.
+    """
+    state = load_state(state_dir)
+    if not _is_current(state, model, processed_path, cluster_col):
+        state = build_state(model, raw_path, processed_path, cluster_col, state_dir)
+
+    df, raw_bytes = new_customers(raw_path, state, state_dir)
+    if len(df):
+        print(f"Assigning {len(df)} new customers to {model}...")
+        data = model.transform(df[model.features])
+        labels = nearest_centroid(data, model.cluster_centers_)
+        df[cluster_col] = labels
+        with open(processed_path) as f:
+            columns = f.readline().strip().split(",")
+        if "Cluster_Name" in columns:
+            df["Cluster_Name"] = [model.cluster_name(label) for label in labels]
+        # Processed rows first: if interrupted, the state is rebuilt from this file
+        with open(processed_path, "a", newline="") as f:
+            df[columns].to_csv(f, header=False, index=False)
+        ids = df[ID_COL].to_numpy(dtype=np.int64)
+        with open(os.path.join(state_dir, IDS_FILE), "ab") as f:
+            ids.tofile(f)
+        state["stats"] = merge_stats(state["stats"], cluster_stats(data, labels, model.cluster_centers_))
+        state["n_rows"] += len(df)
+        if state["max_customer_id"] is not None:
+            ids = np.append(ids, state["max_customer_id"])
+        state["max_customer_id"] = int(ids.max())
+    if not _ends_with_newline(raw_path):
+        print(f"Warning: {raw_path} does not end with a newline; rows appended to it "
+              "must start with one, or they will be joined onto its last row.")
+    state["raw_bytes"] = raw_bytes
+    state["raw_tail_hash"] = _tail_hash(raw_path, raw_bytes)
+    state["processed_signature"] = list(file_signature(processed_path))
+    _save_state(state, state_dir)
+
+    drift = cluster_drift(state["stats"], model.cluster_centers_, state["baseline"])
+    needs_refit = (drift["centroid_shift"] > max_centroid_shift
+                   or drift["inertia_increase"] > max_inertia_increase)
+    print(f"{state['n_rows']} customers assigned; centroid shift "
+          f"{drift['centroid_shift']:.3f} (max {max_centroid_shift}), inertia increase "
+          f"{drift['inertia_increase']:.1%} (max {max_inertia_increase:.0%})")
+    return {"new_rows": len(df), "drift": drift, "needs_refit": needs_refit}
+
+
+@instrumented
+def refit_segments(model, raw_path, processed_path, cluster_col, state_dir=STATE_DIR,
+                   engine_options=None, chunksize=100_000):
+    """
+    Refit a registered model on the whole raw file and reassign every customer.
+
+    The preprocessing is refitted with the model's settings, the centroids
+    are profiled and registered as a new version, and processed_path is
+    rewritten.
+    Returns the refitted registered model.
+    """
+    from src.features.preprocessing import preprocess
+    from src.models.clustering import train_kmeans
+    from src.models.predict import predict_file
+    from src.models.profiles import build_profile, load_profile, save_profile
+    from src.models.registry import load_registered_model, profile_path, register_model
+    from src.pipeline.stage_cache import hash_file
+
+    random_state = model.metadata["random_state"]
+    df = load_data(raw_path)
+    preprocessor = None
+    if model.preprocessor is not None:
+        settings = model.preprocessor
+        numeric_features = settings["numeric_features"]
+        data, preprocessor = preprocess(df, numeric_features, settings["scaling"],
+                                        list(settings["one_hot"]))
+    else:
+        numeric_features = model.features
+        data = model.transform(df)
+    kmeans, _ = train_kmeans(data, model.n_clusters, random_state=random_state,
+                             engine_options=engine_options)
+    # Refitted labels need not line up with the old ones, so the clusters are
+    # profiled and named afresh, summarising the same columns as before
+    old_profile = profile_path(model.name, model.version)
+    if os.path.exists(old_profile):
+        old = load_profile(old_profile)
+        features, category_cols = old["features"], old["category_cols"]
+    else:
+        features, category_cols = numeric_features, []
+    profile = build_profile(df, data, kmeans.labels_, kmeans.cluster_centers_,
+                            numeric_features, features, category_cols)
+    metadata = register_model(
+        model.name, kmeans.cluster_centers_, model.features, random_state,
+        hash_file(raw_path), cluster_names=profile["cluster_names"],
+        preprocessor=preprocessor, inertia=float(kmeans.inertia_), source="refit",
+        level_cuts=profile["level_cuts"],
+        cluster_counts=[cluster["size"] for cluster in profile["clusters"]],
+    )
+    refitted = load_registered_model(model.name, metadata["version"])
+    save_profile(profile, profile_path(model.name, refitted.version),
+                 model=model.name, version=refitted.version)
+    predict_file(refitted, raw_path, processed_path, refitted.features,
+                 chunksize=chunksize, label_col=cluster_col)
+
+    _new_state(refitted, data, kmeans.labels_, df[ID_COL].to_numpy(), raw_path,
+               os.path.getsize(raw_path), processed_path, cluster_col, state_dir)
+    return refitted
@@ -0,0 +1,148 @@
+import cProfile
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Most recent stage records, shared by the pipeline and the app
+MAX_RECORDS = 1000
+_records = deque(maxlen=MAX_RECORDS)
+_lock = threading.Lock()
+
+
+def peak_rss_mb():
+    """
+    Return the process's peak resident set size in MB (None if unavailable).
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _row_count(args, kwargs):
+    # Rows of the first DataFrame/array argument (or dict of them), if any
+    for value in list(args) + list(kwargs.values()):
+        values = value.values() if isinstance(value, dict) else [value]
+        rows = [v.shape[0] for v in values if hasattr(v, "shape") and len(v.shape) > 0]
+        if rows:
+            return max(rows)
+    return None
+
+
+def _kmeans_stats(result):
+    # Iterations to convergence and restarts of a returned KMeans model
+    candidates = result if isinstance(result, tuple) else (result,)
+    for value in candidates:
+        if hasattr(value, "n_iter_") and hasattr(value, "cluster_centers_"):
+            # n_restarts_ is set by engines that stop restarting early
+            n_init = getattr(value, "n_restarts_", getattr(value, "_n_init", None))
+            return value.n_iter_, n_init
+    return None, None
+
+
+def record(stage, seconds, rows=None, n_iter=None, n_init=None):
+    """
+    Append a stage record to the shared log.
+    """
+    with _lock:
+        _records.append({
+            "stage": stage,
+            "seconds": seconds,
+            "rows": rows,
+            "peak_rss_mb": peak_rss_mb(),
+            "kmeans_n_iter": n_iter,
+            "kmeans_n_init": n_init,
+        })
+
+
+def instrumented(func):
+    """
+    Decorator recording duration, input rows, peak RSS and KMeans stats of each call.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        n_iter, n_init = _kmeans_stats(result)
+        record(func.__name__, time.perf_counter() - start,
+               _row_count(args, kwargs), n_iter, n_init)
+        return result
+    return wrapper
+
+
+@contextmanager
+def timed(stage, rows=None):
+    """
+    Context manager recording the duration of a block as a stage.
+    """
+    start = time.perf_counter()
+    yield
+    record(stage, time.perf_counter() - start, rows)
+
+
+def get_records():
+    """
+    Return a copy of the recorded stages, oldest first.
+    """
+    with _lock:
+        return list(_records)
+
+
+def extend_records(records):
+    """
+    Add records collected elsewhere (e.g. in a worker process) to the log.
+    """
+    with _lock:
+        _records.extend(records)
+
+
+def reset_records():
+    with _lock:
+        _records.clear()
+
+
+def summary_table(records=None):
+    """
+    Aggregate stage records into a DataFrame with call counts and timings.
+    """
+    import pandas as pd
+    df = pd.DataFrame(records if records is not None else get_records())
+    if df.empty:
+        return df
+    summary = df.groupby("stage", sort=False).agg(
+        calls=("seconds", "size"),
+        total_s=("seconds", "sum"),
+        mean_s=("seconds", "mean"),
+        max_rows=("rows", "max"),
+        peak_rss_mb=("peak_rss_mb", "max"),
+        kmeans_n_iter=("kmeans_n_iter", "max"),
+        kmeans_n_init=("kmeans_n_init", "max"),
+    )
+    return summary.sort_values("total_s", ascending=False)
+
+
+def start_profiler():
+    """
+    Start a cProfile profiler for the rest of the run.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def dump_profile(profiler, output_path):
+    """
+    Stop a profiler and dump its stats to output_path.
+    """
+    profiler.disable()
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    profiler.dump_stats(output_path)
+    print(f"Profile saved to: {output_path} (view with: python -m pstats {output_path})")
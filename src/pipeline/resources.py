@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+from src.pipeline.instrumentation import peak_rss_mb
+
+try:
+    import psutil  # Optional: measures worker processes too
+except ImportError:
+    psutil = None
+
+# Environment variables that size the thread pools of BLAS/OpenMP libraries.
+# joblib's process workers inherit them from this process.
+THREAD_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+               "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+# Rough memory costs used to size the run under a memory ceiling
+WORKER_OVERHEAD_MB = 150  # A worker process with NumPy and scikit-learn imported
+BYTES_PER_CELL = 100  # One cell of a DataFrame read from CSV, with parsing overhead
+MIN_CHUNK_SIZE = 1_000
+MIN_SILHOUETTE_SAMPLE = 1_000
+
+
+def current_rss_mb():
+    """
+    Return this process's resident set size in MB.
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except OSError:
+        return peak_rss_mb() or 0.0
+
+
+def estimate_shape(file_path, sample_bytes=1 << 20):
+    """
+    Estimate the data rows and columns of a CSV file from its first MB,
+    without parsing it.
+    """
+    size = os.path.getsize(file_path)
+    with open(file_path, "rb") as f:
+        sample = f.read(sample_bytes)
+    n_columns = sample.split(b"\n", 1)[0].count(b",") + 1
+    lines = max(sample.count(b"\n"), 1)
+    if len(sample) == size:
+        n_rows = max(lines - 1 + (not sample.endswith(b"\n")), 0)
+    else:
+        n_rows = int(size / (len(sample) / lines))
+    return n_rows, n_columns
+
+
+def plan_resources(n_rows, n_columns, n_features, threads=None, memory_mb=None,
+                   n_jobs=-1, chunk_size=100_000, silhouette_sample_size=10_000):
+    """
+    Choose worker counts, threads per worker, chunk and silhouette sample
+    sizes and the silhouette distance block size that fit a thread budget
+    and memory ceiling.
+
+    n_columns is the width of the raw table and n_features of the largest
+    feature matrix. Without a budget the given settings are kept. With one,
+    workers are capped by the thread budget and by the memory left after
+    the data held by the main process, and each worker gets an equal share
+    of the threads. Chunk and sample sizes only ever shrink.
+    """
+    cpus = os.cpu_count() or 1
+    threads = threads or None
+    plan = {
+        "threads": threads,
+        "memory_mb": memory_mb,
+        "n_jobs": n_jobs,
+        "threads_per_worker": None,
+        "chunk_size": chunk_size,
+        "silhouette_sample_size": silhouette_sample_size,
+        "silhouette_max_memory_mb": None,  # None keeps the scorer's default block size
+    }
+    max_workers = threads or (cpus if n_jobs == -1 else n_jobs)
+    workers = max(1, min(max_workers, cpus if n_jobs == -1 else n_jobs))
+
+    if memory_mb:
+        baseline_mb = current_rss_mb()
+        table_mb = n_rows * n_columns * BYTES_PER_CELL / 1024 ** 2
+        matrix_mb = n_rows * n_features * 8 / 1024 ** 2
+        # The raw table and both feature matrices stay in the main process
+        free_mb = memory_mb - baseline_mb - table_mb - 4 * matrix_mb
+        if free_mb <= 0:
+            print(f"Warning: {memory_mb} MB leaves no room beyond the data "
+                  f"({baseline_mb + table_mb + 4 * matrix_mb:.0f} MB); using minimal settings.")
+            free_mb = 0
+        # Each worker holds its interpreter, a copy of the features and a
+        # silhouette distance block
+        block_mb = max(1.0, min(64.0, free_mb / 8))
+        plan["silhouette_max_memory_mb"] = block_mb
+        worker_mb = WORKER_OVERHEAD_MB + 2 * matrix_mb + block_mb
+        workers = max(1, min(workers, int(free_mb // worker_mb)))
+        # Exact silhouette of s points needs an s x s distance matrix
+        plan["silhouette_sample_size"] = max(
+            MIN_SILHOUETTE_SAMPLE,
+            min(silhouette_sample_size, int((block_mb * 1024 ** 2 / 8) ** 0.5)),
+        )
+        # A chunk of the raw table, its predictions and CSV text
+        chunk_mb = max(free_mb / 10, 1.0)
+        plan["chunk_size"] = max(
+            MIN_CHUNK_SIZE,
+            min(chunk_size, int(chunk_mb * 1024 ** 2 / (3 * n_columns * BYTES_PER_CELL))),
+        )
+        plan.update(baseline_mb=baseline_mb, data_mb=table_mb + 4 * matrix_mb,
+                    worker_mb=worker_mb)
+    if threads or memory_mb:
+        plan["n_jobs"] = workers
+        plan["threads_per_worker"] = max(1, (threads or cpus) // workers)
+    return plan
+
+
+def apply_thread_budget(threads, threads_per_worker):
+    """
+    Limit the thread pools of this process to threads and those of joblib
+    worker processes to threads_per_worker.
+
+    Worker pools are set through the environment they inherit. In this
+    process the BLAS/OpenMP pools (and pyarrow's CSV reader) are limited
+    directly, so scikit-learn is loaded first to bring up its OpenMP runtime.
+    """
+    for var in THREAD_VARS:
+        os.environ[var] = str(threads_per_worker)
+    import sklearn.cluster  # noqa: F401
+    from threadpoolctl import threadpool_limits
+    threadpool_limits(limits=threads)
+    try:
+        import pyarrow
+        pyarrow.set_cpu_count(threads)
+    except ImportError:
+        pass
+
+
+def _cpu_seconds():
+    # Without psutil, workers are only counted once they have exited and
+    # been reaped (children_*)
+    times = os.times()
+    cpu = times.user + times.system
+    return cpu if psutil is not None else cpu + times.children_user + times.children_system
+
+
+def _sample_usage(usage, worker_cpu):
+    total = current_rss_mb()
+    if psutil is not None:
+        children = psutil.Process().children(recursive=True)
+        for child in children:
+            try:
+                total += child.memory_info().rss / 1024 ** 2
+                cpu = child.cpu_times()
+                worker_cpu[child.pid] = cpu.user + cpu.system
+            except psutil.Error:  # Exited between listing and reading
+                pass
+        usage["peak_workers"] = max(usage["peak_workers"], len(children))
+    usage["peak_rss_mb"] = max(usage["peak_rss_mb"], total)
+
+
+def start_monitor(interval=0.2):
+    """
+    Start sampling the memory of this process and its workers for the rest
+    of the run. Worker processes are only seen when psutil is installed.
+    """
+    monitor = {
+        "usage": {"peak_rss_mb": 0.0, "peak_workers": 0, "workers_measured": psutil is not None},
+        "worker_cpu": {},
+        "stop": threading.Event(),
+        "start": time.perf_counter(),
+        "start_cpu": _cpu_seconds(),
+    }
+
+    def sample():
+        while not monitor["stop"].wait(interval):
+            _sample_usage(monitor["usage"], monitor["worker_cpu"])
+
+    monitor["thread"] = threading.Thread(target=sample, daemon=True)
+    monitor["thread"].start()
+    return monitor
+
+
+def stop_monitor(monitor):
+    """
+    Stop a monitor and return its usage: elapsed_s, cpu_s, mean_cores (CPU
+    seconds per wall second), peak_rss_mb (this process plus its workers)
+    and peak_workers.
+    """
+    monitor["stop"].set()
+    monitor["thread"].join()
+    usage = monitor["usage"]
+    _sample_usage(usage, monitor["worker_cpu"])
+    elapsed = time.perf_counter() - monitor["start"]
+    # Workers' CPU time is the last value sampled from each
+    cpu = _cpu_seconds() - monitor["start_cpu"] + sum(monitor["worker_cpu"].values())
+    usage.update(
+        elapsed_s=elapsed,
+        cpu_s=cpu,
+        mean_cores=cpu / elapsed if elapsed else 0.0,
+        peak_rss_mb=max(usage["peak_rss_mb"], peak_rss_mb() or 0.0),
+    )
+    return usage
+
+
+def budget_report(plan, usage):
+    """
+    Print measured usage against the plan's budget.
+
+    Returns the usage with "within_memory" and "within_threads" (None when
+    there is no such limit) and "within_budget".
+    """
+    report = dict(usage)
+    report["within_memory"] = (usage["peak_rss_mb"] <= plan["memory_mb"]
+                               if plan["memory_mb"] else None)
+    # A little slack for the interpreter's own housekeeping threads
+    report["within_threads"] = (usage["mean_cores"] <= plan["threads"] * 1.05
+                                if plan["threads"] else None)
+    report["within_budget"] = all(
+        ok for ok in (report["within_memory"], report["within_threads"]) if ok is not None
+    )
+    scope = "process and workers" if usage["workers_measured"] else "main process only"
+    memory_limit = f" / {plan['memory_mb']} MB" if plan["memory_mb"] else ""
+    thread_limit = f" / {plan['threads']} threads" if plan["threads"] else ""
+    print(f"  Peak memory: {usage['peak_rss_mb']:.0f} MB{memory_limit} ({scope})")
+    print(f"  Mean cores in use: {usage['mean_cores']:.2f}{thread_limit} "
+          f"({usage['cpu_s']:.1f} CPU s over {usage['elapsed_s']:.1f} s)")
+    if plan["memory_mb"] or plan["threads"]:
+        verdict = "within" if report["within_budget"] else "OVER"
+        print(f"  Run stayed {verdict} budget.")
+    return report
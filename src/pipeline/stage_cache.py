@@ -0,0 +1,172 @@
+import ast
+import functools
+import hashlib
+import inspect
+import json
+import os
+import joblib
+import pandas as pd
+from src.data.cache import file_signature
+from src.pipeline.instrumentation import timed
+
+# On-disk cache of pipeline stage results
+CACHE_DIR = "data/interim/pipeline_cache"
+# Execution settings that change how a stage runs but not what it returns;
+# they are left out of its key so a new resource budget reuses cached results.
+# A stage whose result depends on one of them (e.g. on the worker count) must
+# not be passed it under this name.
+EXECUTION_KWARGS = ("n_jobs", "chunksize", "silhouette_max_memory_mb")
+# Directory holding the src package, for resolving src modules to files
+PROJECT_ROOT = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+
+def hash_file(file_path, block_size=1 << 20):
+    """
+    Return the SHA-256 hash of a file's contents, read in blocks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _module_file(module_name):
+    # Source file of a src module, found without importing it
+    path = os.path.join(PROJECT_ROOT, *module_name.split("."))
+    for candidate in (f"{path}.py", os.path.join(path, "__init__.py")):
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def _src_imports(file_path):
+    # src modules imported anywhere in a file, including inside functions
+    with open(file_path) as f:
+        tree = ast.parse(f.read())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names
+                         if alias.name.split(".")[0] == "src")
+        elif (isinstance(node, ast.ImportFrom) and node.level == 0
+              and node.module and node.module.split(".")[0] == "src"):
+            # "from src.models import silhouette" may name a module too
+            names.add(node.module)
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def _code_hash(file_path):
+    # Hash a file and every src module it imports, transitively. Computed
+    # once per process: stage code does not change while a run executes.
+    files, pending = set(), [file_path]
+    while pending:
+        path = pending.pop()
+        if path in files:
+            continue
+        files.add(path)
+        pending.extend(filter(None, map(_module_file, _src_imports(path))))
+    digest = hashlib.sha256()
+    for path in sorted(files):
+        digest.update(os.path.relpath(path, PROJECT_ROOT).encode())
+        digest.update(hash_file(path).encode())
+    return digest.hexdigest()
+
+
+def _stage_code(func):
+    # Include the stage's code in its key so editing it, or any src module
+    # it (indirectly) uses, invalidates the cached result
+    func = inspect.unwrap(func)
+    try:
+        file_path = inspect.getsourcefile(func)
+    except TypeError:
+        file_path = None
+    name = f"{func.__module__}.{func.__qualname__}"
+    if file_path is None:
+        return name
+    return name, _code_hash(os.path.abspath(file_path))
+
+
+def _content(obj):
+    # Reduce DataFrames to their content so the hash ignores pandas internals
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        if isinstance(obj, pd.DataFrame):
+            columns = list(obj.columns)
+        else:
+            columns = obj.name
+        return (type(obj).__name__, columns, str(obj.dtypes),
+                pd.util.hash_pandas_object(obj).to_numpy())
+    if isinstance(obj, dict):
+        return {key: _content(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_content(value) for value in obj)
+    return obj
+
+
+def stage_key(func, args, kwargs, input_files=()):
+    """
+    Hash a stage's code (its module and the src modules that module
+    imports), arguments, parameters and input file contents.
+    """
+    files = {path: hash_file(path) for path in input_files}
+    kwargs = {key: value for key, value in kwargs.items()
+              if key not in EXECUTION_KWARGS}
+    return joblib.hash(
+        (_stage_code(func), _content(args), _content(kwargs), files)
+    )
+
+
+def _outputs_unchanged(recorded):
+    return all(
+        os.path.exists(path) and list(file_signature(path)) == signature
+        for path, signature in recorded.items()
+    )
+
+
+def run_stage(name, func, *args, input_files=(), outputs=(), force=False,
+              cache_dir=CACHE_DIR, **kwargs):
+    """
+    Run func(*args, **kwargs) as a named pipeline stage, reusing a cached
+    result.
+
+    The stage is skipped and its stored return value reloaded when its key
+    (see stage_key) matches the last run and every file it wrote in
+    `outputs` is still on disk unmodified. Otherwise it is rerun and cached.
+    """
+    key = stage_key(func, args, kwargs, input_files)
+    manifest_path = os.path.join(cache_dir, f"{name}.json")
+    result_path = os.path.join(cache_dir, f"{name}.joblib")
+
+    if not force and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if (manifest["key"] == key and os.path.exists(result_path)
+                and _outputs_unchanged(manifest["outputs"])):
+            print(f"[cache] Skipping stage '{name}' (inputs unchanged)")
+            with timed(f"{name} (cached)"):
+                return joblib.load(result_path)
+
+    print(f"[cache] Running stage '{name}'")
+    result = func(*args, **kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    joblib.dump(result, result_path)
+    manifest = {
+        "key": key,
+        "outputs": {path: list(file_signature(path)) for path in outputs},
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    return result
+
+
+def clear_stage_cache(cache_dir=CACHE_DIR):
+    """
+    Remove all cached stage results.
+    """
+    if os.path.isdir(cache_dir):
+        for filename in os.listdir(cache_dir):
+            os.remove(os.path.join(cache_dir, filename))
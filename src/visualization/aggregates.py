@@ -0,0 +1,76 @@
+import numpy as np
+from src.data.load_save_data import load_data
+
+# Aggregates are built in one streaming pass over the clustered customer file,
+# so the explorer never sends or re-reads raw rows. pandas is imported on
+# first use to keep the app's imports fast.
+
+
+def compute_bin_counts(file_path, x_col, y_col, cluster_col, bin_size=1,
+                       chunksize=1_000_000):
+    """
+    Count customers per (x bin, y bin, cluster), reading only those columns.
+    """
+    import pandas as pd
+    columns = [x_col, y_col, cluster_col]
+    parts = []
+    for chunk in load_data(file_path, chunksize=chunksize, usecols=columns):
+        binned = pd.DataFrame({
+            x_col: np.floor(chunk[x_col] / bin_size) * bin_size,
+            y_col: np.floor(chunk[y_col] / bin_size) * bin_size,
+            cluster_col: chunk[cluster_col],
+        })
+        parts.append(binned.groupby(columns).size())
+    counts = pd.concat(parts).groupby(level=[0, 1, 2]).sum()
+    return counts.rename("count").reset_index()
+
+
+def query_bins(bin_counts, x_col, y_col, cluster_col, x_range=None, y_range=None,
+               clusters=None, bin_size=1):
+    """
+    Filter precomputed bins to a zoom window and cluster set, optionally coarsening them.
+
+    bin_size must be a multiple of the size the counts were computed with.
+    Returned bins are positioned at their centres for plotting.
+    """
+    df = bin_counts
+    if x_range is not None:
+        df = df[df[x_col].between(*x_range)]
+    if y_range is not None:
+        df = df[df[y_col].between(*y_range)]
+    if clusters is not None:
+        df = df[df[cluster_col].isin(clusters)]
+    df = df.assign(**{
+        x_col: np.floor(df[x_col] / bin_size) * bin_size + bin_size / 2,
+        y_col: np.floor(df[y_col] / bin_size) * bin_size + bin_size / 2,
+    })
+    return df.groupby([x_col, y_col, cluster_col], as_index=False)["count"].sum()
+
+
+def compute_cluster_summary(file_path, cluster_col, columns, chunksize=1_000_000):
+    """
+    Per-cluster count, mean, (population) std, min and max of columns in one
+    streaming pass.
+    """
+    import pandas as pd
+    counts, sums, squares, mins, maxs = [], [], [], [], []
+    for chunk in load_data(file_path, chunksize=chunksize, usecols=columns + [cluster_col]):
+        grouped = chunk.groupby(cluster_col)[columns]
+        counts.append(grouped.size())
+        sums.append(grouped.sum())
+        squares.append((chunk[columns] ** 2).groupby(chunk[cluster_col]).sum())
+        mins.append(grouped.min())
+        maxs.append(grouped.max())
+
+    n = pd.concat(counts).groupby(level=0).sum()
+    mean = pd.concat(sums).groupby(level=0).sum().div(n, axis=0)
+    var = pd.concat(squares).groupby(level=0).sum().div(n, axis=0) - mean ** 2
+    low = pd.concat(mins).groupby(level=0).min()
+    high = pd.concat(maxs).groupby(level=0).max()
+    summary = pd.DataFrame({"count": n})
+    for col in columns:
+        summary[f"{col}_mean"] = mean[col]
+        summary[f"{col}_std"] = np.sqrt(var[col].clip(lower=0))
+        summary[f"{col}_min"] = low[col]
+        summary[f"{col}_max"] = high[col]
+    return summary
@@ -1,37 +1,83 @@
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 import os
+from src.pipeline.instrumentation import instrumented, get_records, reset_records, extend_records
 
-# Ensure the output directory for figures exists
+# Output directory for figures, created when the first figure is saved
 FIGURES_DIR = "reports/figures"
-os.makedirs(FIGURES_DIR, exist_ok=True)
 
-def save_pairplot(df, columns, filename):
+# Above this many rows, scatter plots are downsampled and pairplots binned
+MAX_PLOT_POINTS = 50_000
+HEXBIN_GRIDSIZE = 50
+
+# Figures are built with the object-oriented Figure API rather than pyplot,
+# so they hold no global state and can be rendered in parallel processes.
+# matplotlib and seaborn are imported on first use to keep imports fast.
+
+def _new_figure(**kwargs):
+    from matplotlib.figure import Figure
+    return Figure(**kwargs)
+
+def _save_figure(fig, filename):
+    os.makedirs(FIGURES_DIR, exist_ok=True)
+    save_path = os.path.join(FIGURES_DIR, filename)
+    fig.savefig(save_path)
+    return save_path
+
+def _downsample(df, max_points, stratify_col=None, random_state=42):
+    # Sample rows (per group, proportionally, if stratify_col is given)
+    if len(df) <= max_points:
+        return df
+    frac = max_points / len(df)
+    if stratify_col is None:
+        return df.sample(frac=frac, random_state=random_state)
+    return df.groupby(stratify_col, group_keys=False).sample(frac=frac, random_state=random_state)
+
+@instrumented
+def save_pairplot(df, columns, filename, max_points=MAX_PLOT_POINTS):
     """
     Generate and save a pairplot for specified columns.
+    Large datasets are drawn as hexbin densities instead of individual points.
     """
     print(f"Generating pairplot for columns: {columns}")
-    plt.figure()  # Avoid overlap with other plots
-    sns.pairplot(df[columns])
-    save_path = os.path.join(FIGURES_DIR, filename)
-    plt.savefig(save_path)
-    plt.close()  # Free memory
+    n = len(columns)
+    fig = _new_figure(figsize=(2.5 * n, 2.5 * n), layout="tight")
+    axes = fig.subplots(n, n, squeeze=False)
+    binned = len(df) > max_points
+    for i, y_col in enumerate(columns):
+        for j, x_col in enumerate(columns):
+            ax = axes[i, j]
+            if i == j:
+                ax.hist(df[x_col], bins=20)
+            elif binned:
+                ax.hexbin(df[x_col], df[y_col], gridsize=HEXBIN_GRIDSIZE, mincnt=1, bins="log")
+            else:
+                ax.scatter(df[x_col], df[y_col], s=10)
+            if i == n - 1:
+                ax.set_xlabel(x_col)
+            if j == 0:
+                ax.set_ylabel(y_col)
+    save_path = _save_figure(fig, filename)
     print(f"Pairplot saved to: {save_path}")
 
-def save_cluster_scatterplot(df, x_col, y_col, cluster_col, filename):
+@instrumented
+def save_cluster_scatterplot(df, x_col, y_col, cluster_col, filename, max_points=MAX_PLOT_POINTS):
     """
     Generate and save a scatterplot of clusters.
+    Large datasets are downsampled per cluster to max_points.
     """
     print(f"Generating cluster scatterplot ({x_col} vs {y_col})")
-    plt.figure(figsize=(10, 6))
-    sns.scatterplot(x=x_col, y=y_col, data=df, hue=cluster_col, palette='colorblind')
-    plt.title(f'{y_col} vs {x_col} by Cluster')
-    save_path = os.path.join(FIGURES_DIR, filename)
-    plt.savefig(save_path)
-    plt.close()
+    title = f'{y_col} vs {x_col} by Cluster'
+    if len(df) > max_points:
+        title += f' (sample of {max_points} from {len(df)})'
+        df = _downsample(df, max_points, stratify_col=cluster_col)
+    import seaborn as sns
+    fig = _new_figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.scatterplot(x=x_col, y=y_col, data=df, hue=cluster_col, palette='colorblind', ax=ax)
+    ax.set_title(title)
+    save_path = _save_figure(fig, filename)
     print(f"Cluster scatterplot saved to: {save_path}")
 
+@instrumented
 def save_elbow_plot(wcss_scores, filename):
     """
     Generate and save an Elbow plot from WCSS scores.
@@ -39,31 +85,61 @@ def save_elbow_plot(wcss_scores, filename):
     print("Generating Elbow plot...")
     k_values = list(wcss_scores.keys())
     scores = list(wcss_scores.values())
-    plt.figure(figsize=(8, 5))
-    plt.plot(k_values, scores, marker='o')
-    plt.xlabel('Number of Clusters (k)')
-    plt.ylabel('WCSS Score')
-    plt.title('Elbow Method For Optimal k')
-    plt.xticks(k_values)
-    save_path = os.path.join(FIGURES_DIR, filename)
-    plt.savefig(save_path)
-    plt.close()
+    fig = _new_figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.plot(k_values, scores, marker='o')
+    ax.set_xlabel('Number of Clusters (k)')
+    ax.set_ylabel('WCSS Score')
+    ax.set_title('Elbow Method For Optimal k')
+    ax.set_xticks(k_values)
+    save_path = _save_figure(fig, filename)
     print(f"Elbow plot saved to: {save_path}")
 
-def save_silhouette_plot(silhouette_scores, filename):
+@instrumented
+def save_silhouette_plot(silhouette_scores, filename, confidence_intervals=None):
     """
     Generate and save a Silhouette plot from silhouette scores.
+    Approximate scores are drawn with their confidence intervals as error bars.
     """
     print("Generating Silhouette plot...")
     k_values = list(silhouette_scores.keys())
     scores = list(silhouette_scores.values())
-    plt.figure(figsize=(8, 5))
-    plt.plot(k_values, scores, marker='o')
-    plt.xlabel('Number of Clusters (k)')
-    plt.ylabel('Silhouette Score')
-    plt.title('Silhouette Method For Optimal k')
-    plt.xticks(k_values)
-    save_path = os.path.join(FIGURES_DIR, filename)
-    plt.savefig(save_path)
-    plt.close()
-    print(f"Silhouette plot saved to: {save_path}")
\ No newline at end of file
+    fig = _new_figure(figsize=(8, 5))
+    ax = fig.subplots()
+    ax.plot(k_values, scores, marker='o')
+    if confidence_intervals and all(confidence_intervals.get(k) for k in k_values):
+        lower = [scores[i] - confidence_intervals[k][0] for i, k in enumerate(k_values)]
+        upper = [confidence_intervals[k][1] - scores[i] for i, k in enumerate(k_values)]
+        ax.errorbar(k_values, scores, yerr=[lower, upper], fmt='none', capsize=4)
+    ax.set_xlabel('Number of Clusters (k)')
+    ax.set_ylabel('Silhouette Score')
+    ax.set_title('Silhouette Method For Optimal k')
+    ax.set_xticks(k_values)
+    save_path = _save_figure(fig, filename)
+    print(f"Silhouette plot saved to: {save_path}")
+
+def _render_job(func, args, kwargs, parent_pid, figures_dir):
+    # In a worker process, return its stage records so the parent can keep them
+    if os.getpid() == parent_pid:
+        return func(*args, **kwargs), []
+    global FIGURES_DIR
+    FIGURES_DIR = figures_dir
+    reset_records()
+    return func(*args, **kwargs), get_records()
+
+def render_figures(jobs, n_jobs=None):
+    """
+    Render figures concurrently in a process pool.
+
+    jobs is a list of (func, args, kwargs) tuples, e.g. (save_elbow_plot,
+    (wcss, "elbow.png"), {}). Returns each job's result in order.
+    """
+    from joblib import Parallel, delayed
+    print(f"Rendering {len(jobs)} figures (n_jobs={n_jobs})...")
+    outputs = Parallel(n_jobs=n_jobs)(
+        delayed(_render_job)(func, args, kwargs, os.getpid(), FIGURES_DIR)
+        for func, args, kwargs in jobs
+    )
+    for _, records in outputs:
+        extend_records(records)
+    return [result for result, _ in outputs]
\ No newline at end of file
@@ -0,0 +1,95 @@
+import argparse
+import os
+import warnings
+from src.data.load_save_data import load_data
+from src.models.clustering import (
+    minibatch_from_centers,
+    save_model,
+    train_kmeans_streaming,
+    update_kmeans,
+)
+from src.models.profiles import load_profile, name_clusters
+from src.models.registry import (
+    load_registered_model,
+    profile_path,
+    register_model,
+    selected_model_name,
+)
+from src.pipeline.stage_cache import hash_file
+
+# --- Configuration ---
+MODEL_NAME = None  # Registered model to update; None uses the 2-feature model chosen by main.py
+MODEL_PATH = "models/{name}.joblib"  # Where the updated estimator is saved
+RANDOM_STATE = 42
+CHUNK_SIZE = 100_000  # Rows read from the CSV at a time
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Refresh the saved KMeans model from a CSV file without "
+        "loading it all into memory."
+    )
+    parser.add_argument("data_path", help="CSV file with customers to learn from")
+    parser.add_argument("--model", default=MODEL_NAME,
+                        help="Registered model name (default: chosen by main.py)")
+    parser.add_argument(
+        "--chunksize", type=int, default=CHUNK_SIZE, help="Rows per chunk"
+    )
+    parser.add_argument(
+        "--retrain",
+        action="store_true",
+        help="Train a new mini-batch model instead of updating the saved one",
+    )
+    args = parser.parse_args()
+
+    # Reuse the registered model's fitted preprocessing rather than refitting it
+    model_name = args.model or selected_model_name()
+    registered = load_registered_model(model_name)
+    features = registered.features
+    if args.retrain:
+        model = train_kmeans_streaming(
+            args.data_path,
+            features,
+            n_clusters=registered.n_clusters,
+            chunksize=args.chunksize,
+            random_state=RANDOM_STATE,
+            transform=registered.transform,
+        )
+    else:
+        # Fold the new customers into the latest registered centroids (which a
+        # drift refit may have replaced), weighted by the customers behind each
+        # one, including those folded in by earlier updates
+        counts = registered.metadata.get("cluster_counts")
+        profile_file = profile_path(model_name, registered.version)
+        if counts is None and os.path.exists(profile_file):
+            # Versions registered before counts were recorded
+            counts = [cluster["size"] for cluster in load_profile(profile_file)["clusters"]]
+        elif counts is None:
+            print(f"No cluster counts for {registered}; weighting its centroids equally.")
+            counts = [1] * registered.n_clusters
+        model = minibatch_from_centers(registered.cluster_centers_, counts, RANDOM_STATE)
+        chunks = load_data(args.data_path, chunksize=args.chunksize, usecols=features)
+        for chunk in chunks:
+            model = update_kmeans(model, registered.transform(chunk))
+    save_model(model, MODEL_PATH.format(name=model_name))
+    # Name the moved centroids against the same feature levels as the registered model
+    level_cuts = registered.metadata.get("level_cuts")
+    cluster_names = name_clusters(model.cluster_centers_, level_cuts) if level_cuts else None
+    # Publish the new centroids as the next registry version for the app and scorers
+    register_model(
+        model_name,
+        model.cluster_centers_,
+        features,
+        RANDOM_STATE,
+        hash_file(args.data_path),
+        cluster_names=cluster_names,
+        preprocessor=registered.preprocessor,
+        source="retrain" if args.retrain else "update",
+        level_cuts=level_cuts,
+        # Running per-cluster weights, so the next update continues from them
+        cluster_counts=model._counts.tolist(),
+    )
+
+    print("\nModel update finished successfully.")
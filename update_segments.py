@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import warnings
+from src.models.registry import load_registered_model, similarity_path
+from src.models.similarity import index_customers
+from src.pipeline.incremental import refit_segments, update_segments
+from src.pipeline.instrumentation import summary_table
+
+# --- Configuration ---
+RAW_DATA_PATH = "data/raw/mall_customers.csv"
+PROCESSED_DATA_PATH = "data/processed/clustered_customers.csv"
+K_SELECTION_PATH = "reports/k_selection.json"  # Model and label column chosen by main.py
+# Drift thresholds that trigger a full refit (see src/pipeline/incremental.py)
+MAX_CENTROID_SHIFT = 0.25  # Centroid to customer-mean distance, in RMS cluster radii
+MAX_INERTIA_INCREASE = 0.2  # Relative growth of inertia per customer since the fit
+CHUNK_SIZE = 100_000  # Rows per chunk when a refit rewrites the processed file
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Assign customers appended to the raw data to the existing clusters "
+        "and update the processed file in place, refitting only when the clusters drift."
+    )
+    parser.add_argument("--refit", action="store_true", help="Refit even without drift")
+    parser.add_argument("--no-refit", action="store_true", help="Only report drift, never refit")
+    args = parser.parse_args()
+
+    with open(K_SELECTION_PATH) as f:
+        selection = json.load(f)["2d"]
+    model = load_registered_model(selection["model"])
+    cluster_col = selection["cluster_col"]
+
+    try:
+        result = update_segments(
+            model, RAW_DATA_PATH, PROCESSED_DATA_PATH, cluster_col,
+            max_centroid_shift=MAX_CENTROID_SHIFT, max_inertia_increase=MAX_INERTIA_INCREASE,
+        )
+    except ValueError as e:
+        # e.g. a raw file whose appended rows cannot be parsed
+        raise SystemExit(f"Error: {e}")
+    refitted = args.refit or (result["needs_refit"] and not args.no_refit)
+    if refitted:
+        print("\nDrift threshold crossed; refitting on all customers..." if not args.refit
+              else "\nRefitting on all customers...")
+        model = refit_segments(model, RAW_DATA_PATH, PROCESSED_DATA_PATH, cluster_col,
+                               chunksize=CHUNK_SIZE)
+        print(f"Refitted model registered as {model}")
+    elif result["needs_refit"]:
+        print("\nDrift threshold crossed; run with --refit to refit the model.")
+
+    # Reindex so similar-customer lookups see the new customers and labels
+    index_path = similarity_path(model.name, model.version)
+    if result["new_rows"] or refitted or not os.path.exists(index_path):
+        index_customers(model, PROCESSED_DATA_PATH, index_path)
+
+    print("\nStage timings:")
+    print(summary_table().round(3).to_string())
+
+    print("\nSegment update finished successfully.")
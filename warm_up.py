@@ -0,0 +1,44 @@
+import argparse
+import compileall
+import os
+import time
+import warnings
+from src.data.load_save_data import csv_to_columnar
+
+# --- Configuration ---
+# CSV files the app reads; their columnar caches are built ahead of traffic
+DATA_FILES = [
+    "data/raw/mall_customers.csv",
+    "data/processed/clustered_customers.csv",
+    "data/processed/cluster_confidence.csv",
+]
+SOURCE_PATHS = ["src", "app_streamlit.py"]
+
+# --- Main Execution Block ---
+if __name__ == "__main__":
+    warnings.filterwarnings("ignore")  # Suppress warnings
+
+    parser = argparse.ArgumentParser(
+        description="Prepare a fresh app replica before it takes traffic: byte-compile "
+        "the sources and build the columnar data caches (run before streamlit run)."
+    )
+    parser.add_argument("--data", nargs="+", default=DATA_FILES, help="CSV files to convert")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for path in SOURCE_PATHS:
+        if os.path.isdir(path):
+            compileall.compile_dir(path, quiet=1)
+        else:
+            compileall.compile_file(path, quiet=1)
+    print(f"Byte-compiled {SOURCE_PATHS} in {time.perf_counter() - start:.2f}s")
+
+    for path in args.data:
+        if not os.path.exists(path):
+            print(f"Skipping missing data file: {path}")
+            continue
+        start = time.perf_counter()
+        cache_path = csv_to_columnar(path)
+        print(f"Columnar cache for {path} ready in {time.perf_counter() - start:.2f}s: {cache_path}")
+
+    print("\nWarm-up finished successfully.")